@@ -1,8 +1,32 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
+import json
+import logging
+from fastapi import APIRouter, Depends, Request, Response
+from typing import List
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from app.common.res import Res  # 假设你的 Res 类在这里
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
+from app.core.config import settings
+from app.core.write_behind import log_writer
+from app.core.context import RequestContext
+from app.deps import check_rate_limit, get_ctx, get_ctx_required, provide_service_optional, rate_limit, require_perm
+from app.core.rate_limit import rate_limiter
+from app.core.security import password_hasher
+from app.core.token_cache import token_cache
 from app.services.agent.style_transfer_service import StyleTransferService
 from app.workflows.scenario_manager import scenario_manager
+from app.services.agent.result_cache import result_cache
+from app.services.agent.similarity_cache import similarity_cache
+from app.services.agent.single_flight import translate_flight
+from app.services.agent.usage_counter import usage_counter
+from app.workflows.admission import llm_admission
+from app.workflows.config import get_llm_http, llm_pool_stats
+from app.workflows.json_repair import parser_stats
+from app.workflows.runtime import ai_runtime
+from app.workflows.token_budget import token_budget
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/agent", tags=["AI Agent"])
 
@@ -12,9 +36,14 @@ class TransferRequest(BaseModel):
     intent_id: str
     tone_id: str
 
-@router.post("/translate")
-async def translate_text(req: TransferRequest):
-    svc = StyleTransferService(db=None)
+class BatchTransferRequest(BaseModel):
+    items: List[TransferRequest] = Field(..., min_length=1, max_length=settings.batch_max_items)
+
+@router.post("/translate", dependencies=[Depends(rate_limit("translate"))])
+async def translate_text(
+    req: TransferRequest,
+    svc: StyleTransferService = Depends(provide_service_optional(StyleTransferService)),
+):
     result = await svc.translate(
         text=req.text,
         scene_id=req.scene_id,
@@ -24,10 +53,100 @@ async def translate_text(req: TransferRequest):
     # 使用 Res.success 包装，数据放入 body 字段
     return Res.success(body=result)
 
+@router.post("/translate/batch")
+async def translate_batch(
+    req: BatchTransferRequest,
+    ctx: RequestContext = Depends(get_ctx),
+    svc: StyleTransferService = Depends(provide_service_optional(StyleTransferService)),
+):
+    """
+    批量翻译：按输入顺序返回逐条结果，单条失败 status 为 ERROR 并带 error，不影响其它条目
+    限流按条目数计数；预估 token 超过当日剩余额度时整批拒绝
+    """
+    items = [item.model_dump() for item in req.items]
+    check_rate_limit(ctx, "translate_batch", cost=len(items), tokens=svc.estimate_batch_tokens(items))
+    items = await svc.translate_batch(items)
+    failed = sum(1 for item in items if item["status"] != "DONE")
+    return Res.success(body={
+        "total": len(items),
+        "succeeded": len(items) - failed,
+        "failed": failed,
+        "items": items,
+    })
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/translate/stream", dependencies=[Depends(rate_limit("translate"))])
+async def translate_text_stream(
+    req: TransferRequest,
+    svc: StyleTransferService = Depends(provide_service_optional(StyleTransferService)),
+):
+    """
+    SSE 流式翻译：
+    - event: delta  data: {"text": "..."}      english 字段的增量文本（已做 post_clean）
+    - event: done   data: Res 结构，body 同 /translate
+    - event: error  data: Res 结构（失败）
+    """
+    # 流开始前先校验场景三元组，ID 不存在时仍按普通 JSON 返回错误
+    scenario_manager.get_tone(req.scene_id, req.intent_id, req.tone_id)
+
+    async def event_source():
+        try:
+            async for item in svc.translate_stream(
+                text=req.text,
+                scene_id=req.scene_id,
+                intent_id=req.intent_id,
+                tone_id=req.tone_id
+            ):
+                if item["event"] == "done":
+                    yield _sse("done", Res.success(body=item["data"]).model_dump())
+                else:
+                    yield _sse(item["event"], item["data"])
+        except BizException as e:
+            yield _sse("error", Res.fail(e.code, msg=e.msg).model_dump())
+        except Exception as e:
+            logger.exception("translate stream failed: %r", e)
+            yield _sse("error", Res.fail(ResponseCode._5050, msg="服务器内部错误").model_dump())
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.get("/scenarios")
-async def get_scenarios():
+async def get_scenarios(request: Request, response: Response):
     """
     前端通过此接口获取 Scene -> Intent -> Tone 的完整树状结构
+    ETag 为当前生效的配置版本，客户端可据此判断配置是否已热更新
     """
+    snapshot = scenario_manager.snapshot
+    etag = f'"{snapshot.version}"'
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
     # 严格遵守 Res 结构，将场景列表放入 body
-    return Res.success(body=scenario_manager.scenes)
\ No newline at end of file
+    return Res.success(body=snapshot.scenes)
+
+@router.get("/stats", dependencies=[Depends(get_ctx_required), Depends(require_perm("agent:stats"))])
+async def get_stats():
+    """运行期指标：结果缓存命中率、上游准入控制等，供监控面板采集（需登录且有 agent:stats 权限，ADMIN 直通）"""
+    return Res.success(body={
+        "scenario_version": scenario_manager.version,
+        "result_cache": result_cache.stats(),
+        "similarity_cache": similarity_cache.stats() if similarity_cache else None,
+        "llm_admission": llm_admission.stats(),
+        "single_flight": translate_flight.stats(),
+        "llm_http": get_llm_http().stats(),
+        "llm_providers": llm_pool_stats(),
+        "token_budget": token_budget.stats(),
+        "output_parser": parser_stats(),
+        "log_writer": log_writer.stats(),
+        "usage_counter": usage_counter.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "token_cache": token_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "ai_runtime": ai_runtime.status(),
+    })
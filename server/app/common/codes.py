@@ -12,12 +12,17 @@ class ResponseCode(Enum):
 
     _5050 = ResType("5050", "请求失败")
     _5030 = ResType("5030", "服务不存在")
+    _5031 = ResType("5031", "服务繁忙，请稍后重试")
 
     _40401 = ResType("40401", "请求参数格式错误")
     _40402 = ResType("40402", "参数校验失败")
     _40403 = ResType("40403", "没有信息")
+    _40404 = ResType("40404", "场景配置不存在")
 
     _4101 = ResType("4101", "没有该权限")
+    _4102 = ResType("4102", "今日用量已达上限")
+
+    _4291 = ResType("4291", "请求过于频繁，请稍后重试")
 
     _4301 = ResType("4301", "token为空")
     _4302 = ResType("4302", "token验证过期")
@@ -0,0 +1,15 @@
+# app/common/exceptions.py
+from __future__ import annotations
+
+from app.common.codes import ResponseCode
+
+
+class BizException(Exception):
+    """
+    业务异常：携带 ResponseCode，由全局异常处理器统一转换为 Res.fail 响应。
+    """
+
+    def __init__(self, code: ResponseCode = ResponseCode._5050, msg: str | None = None):
+        self.code = code
+        self.msg = msg or code.msg
+        super().__init__(self.msg)
@@ -9,8 +9,68 @@ class Settings(BaseSettings):
     jwt_secret_key: str = Field(default="change_me_to_a_long_random_string", alias="JWT_SECRET_KEY")
     jwt_algorithm: str = Field(default="HS256", alias="JWT_ALGORITHM")
     access_token_expire_minutes: int = Field(default=120, alias="ACCESS_TOKEN_EXPIRE_MINUTES")
+    # 已验签 token 缓存：最大条数 / 单条最长缓存秒数（同时不超过 token 自身的 exp）
+    jwt_cache_size: int = Field(default=4096, alias="JWT_CACHE_SIZE")
+    jwt_cache_ttl: int = Field(default=300, alias="JWT_CACHE_TTL")
 
-    SILICONFLOW_API_KEY: str
+    # 密码哈希：bcrypt 工作因子（每加 1 耗时翻倍）/ 专用线程池大小 / 排队上限（超出返回服务繁忙）
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    password_hash_workers: int = Field(default=2, alias="PASSWORD_HASH_WORKERS")
+    password_hash_queue: int = Field(default=64, alias="PASSWORD_HASH_QUEUE")
+
+    # LLM Key 由 app.workflows.config 在首次创建 LLM 时校验，这里不强制，避免无关模块导入即失败
+    SILICONFLOW_API_KEY: str = ""
+
+    # 翻译结果缓存：内存 LRU 条数 / TTL(秒) / 可选 SQLite 持久层路径（为空则不启用）
+    result_cache_size: int = Field(default=2048, alias="RESULT_CACHE_SIZE")
+    result_cache_ttl: int = Field(default=86400, alias="RESULT_CACHE_TTL")
+    result_cache_sqlite_path: str = Field(default="", alias="RESULT_CACHE_SQLITE_PATH")
+
+    # 近似重复输入缓存：开关 / 相似度阈值(0~1) / 单次查询最多比对的候选数 / LSH 分段数 / 最大条数
+    similarity_cache_enabled: bool = Field(default=False, alias="SIMILARITY_CACHE_ENABLED")
+    similarity_cache_threshold: float = Field(default=0.88, alias="SIMILARITY_CACHE_THRESHOLD")
+    similarity_cache_candidates: int = Field(default=256, alias="SIMILARITY_CACHE_CANDIDATES")
+    similarity_cache_bands: int = Field(default=6, alias="SIMILARITY_CACHE_BANDS")
+    similarity_cache_size: int = Field(default=200000, alias="SIMILARITY_CACHE_SIZE")
+
+    # 批量翻译：单批最大条数 / 单批内同时执行的图调用数
+    batch_max_items: int = Field(default=50, alias="BATCH_MAX_ITEMS")
+    batch_concurrency: int = Field(default=8, alias="BATCH_CONCURRENCY")
+
+    # 上游 LLM 排队时优先放行的角色（逗号分隔），其余登录用户次之，匿名最后
+    admission_priority_roles: str = Field(default="ADMIN,PAID,VIP", alias="ADMISSION_PRIORITY_ROLES")
+
+    # 日志异步落库（write-behind）：队列上限 / 单批最多条数 / 最长攒批时间(秒) / 队列满时最多等待(秒)
+    # 大字段（Prompt、检索上下文）保留全文的采样率(0~1) / 未采样时保留的前缀长度
+    log_queue_size: int = Field(default=10000, alias="LOG_QUEUE_SIZE")
+    log_batch_size: int = Field(default=200, alias="LOG_BATCH_SIZE")
+    log_flush_interval: float = Field(default=1.0, alias="LOG_FLUSH_INTERVAL")
+    log_put_timeout: float = Field(default=0.05, alias="LOG_PUT_TIMEOUT")
+    log_sample_rate: float = Field(default=1.0, alias="LOG_SAMPLE_RATE")
+    log_preview_chars: int = Field(default=200, alias="LOG_PREVIEW_CHARS")
+
+    # 每日用量：进程内计数的落库间隔(秒) / 单用户未落库增量超过该值时提前落库
+    usage_flush_interval: float = Field(default=5.0, alias="USAGE_FLUSH_INTERVAL")
+    usage_max_delta_requests: int = Field(default=50, alias="USAGE_MAX_DELTA_REQUESTS")
+    usage_max_delta_tokens: int = Field(default=20000, alias="USAGE_MAX_DELTA_TOKENS")
+
+    # 限流 / 当日限额（多 worker 通过 mmap 共享文件共享状态）：开关 / 共享文件路径（为空则放在系统临时目录）/ 哈希表槽位数
+    # 规则 JSON：键为 "功能:角色"（角色 ADMIN / CUSTOMER / ANONYMOUS，均可用 * 通配），
+    # 值为 {"limit": 窗口内请求数, "window": 窗口秒数, "daily_tokens": 当日 token, "daily_requests": 当日请求数}，0 表示不限制
+    # 批量翻译（translate_batch）按条目数计数，并在开始前按预估 token 检查当日剩余额度
+    rate_limit_enabled: bool = Field(default=True, alias="RATE_LIMIT_ENABLED")
+    rate_limit_path: str = Field(default="", alias="RATE_LIMIT_PATH")
+    rate_limit_slots: int = Field(default=65536, alias="RATE_LIMIT_SLOTS")
+    rate_limit_rules: str = Field(
+        default='{"*:ANONYMOUS": {"limit": 10, "window": 60, "daily_tokens": 20000},'
+                ' "*:CUSTOMER": {"limit": 30, "window": 60, "daily_tokens": 200000},'
+                ' "translate_batch:CUSTOMER": {"limit": 100, "window": 60, "daily_tokens": 200000},'
+                ' "*:ADMIN": {}}',
+        alias="RATE_LIMIT_RULES",
+    )
+
+    # AI 栈预热方式：eager（启动时阻塞预热）/ background（后台预热，/ready 反映进度）/ lazy（首个请求按需加载）
+    ai_warmup: str = Field(default="background", alias="AI_WARMUP")
 
     class Config:
         env_file = ".env"
@@ -1,8 +1,10 @@
 # app/core/context.py
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import List, Optional, Set
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.permissions import EMPTY_MATCHER, PermissionMatcher, RequiredPerm
 
 
 @dataclass
@@ -11,10 +13,32 @@ class RequestContext:
     请求上下文（单租户/个人订阅产品版）
     - user_id: 登录后才有
     - roles/perms: 可选（你想做 admin 后台/权限系统才需要）
+    - client_ip: 客户端地址（匿名请求按它限流）
+    - perm_matcher: perms 编译成的前缀树，随上下文一起按 token 缓存；未提供时首次检查权限时编译
     """
     user_id: Optional[str] = None
     roles: List[str] = None
     perms: Set[str] = None
+    client_ip: Optional[str] = None
+    perm_matcher: Optional[PermissionMatcher] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_payload(cls, payload: Optional[Dict[str, Any]]) -> "RequestContext":
+        """从 JWT payload 构建（未登录传 None）：user_id 取 sub/user_id/uid"""
+        payload = payload or {}
+        perms = set(payload.get("perms") or [])
+        return cls(
+            user_id=payload.get("sub") or payload.get("user_id") or payload.get("uid"),
+            roles=list(payload.get("roles") or []),
+            perms=perms,
+            perm_matcher=PermissionMatcher(perms) if perms else EMPTY_MATCHER,
+        )
+
+    def has_perm(self, required: RequiredPerm) -> bool:
+        """required 为 parse_perm 解析后的所需权限"""
+        if self.perm_matcher is None:
+            self.perm_matcher = PermissionMatcher(self.perms or ())
+        return self.perm_matcher.allows(required)
 
     @property
     def is_authed(self) -> bool:
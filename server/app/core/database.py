@@ -5,6 +5,9 @@ from app.models.base import Base
 
 # ✅ 关键修正：必须在这里显式导入你的模型，否则 create_all 不会创建这张表！
 from app.models.agent.reddit import RedditLog
+from app.models.content.cnt_daily_usage import CntDailyUsage
+from app.models.content.cnt_generation_log import CntGenerationLog
+from app.models.content.cnt_rewrite_history import CntRewriteHistory
 # 如果还有 SysUser，也要导入: from app.models.sys.user import SysUser
 
 is_sqlite = "sqlite" in settings.database_url
@@ -6,6 +6,7 @@ from starlette.exceptions import HTTPException as StarletteHTTPException
 
 from app.common.res import Res
 from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
 
 ALWAYS_HTTP_200 = True
 
@@ -45,7 +46,15 @@ def register_exception_handlers(app: FastAPI) -> None:
             content=Res.fail(code, msg=str(exc.detail)).model_dump(),
         )
 
-    # 3) 兜底：任何未捕获异常（500）
+    # 3) 业务异常：按异常携带的 ResponseCode 返回
+    @app.exception_handler(BizException)
+    async def biz_exception_handler(_: Request, exc: BizException):
+        return JSONResponse(
+            status_code=_status(400),
+            content=Res.fail(exc.code, msg=exc.msg).model_dump(),
+        )
+
+    # 4) 兜底：任何未捕获异常（500）
     @app.exception_handler(Exception)
     async def unhandled_exception_handler(_: Request, __: Exception):
         return JSONResponse(
@@ -0,0 +1,81 @@
+# app/core/permissions.py
+from __future__ import annotations
+
+from typing import Dict, Iterable, Optional, Tuple
+
+WILDCARD = "*"
+SEP = ":"
+
+RequiredPerm = Tuple[str, ...]
+
+
+def parse_perm(perm: str) -> RequiredPerm:
+    """所需权限按 ":" 拆段，在创建依赖时解析一次"""
+    if not perm or not perm.strip():
+        raise ValueError("permission must not be empty")
+    return tuple(perm.split(SEP))
+
+
+class _Node:
+    __slots__ = ("children", "exact", "wild")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _Node] = {}
+        self.exact = False  # 恰好拥有到此为止的权限
+        self.wild = False   # 拥有 "到此为止:*"，覆盖以此为前缀的所有权限
+
+
+class PermissionMatcher:
+    """
+    拥有的权限编译成的前缀树，构建后只读（随上下文按 token 缓存）。
+    匹配规则与原先的字符串匹配一致：
+    - 精确匹配: sys:user:save
+    - 前缀通配: sys:user:*  或 sys:*（覆盖 sys:user:save，也覆盖 sys:user 本身以外的下级）
+    - 超级权限: *
+    检查一个所需权限只沿树走 len(段数) 步，不拼接字符串，与拥有的权限数量无关。
+    """
+
+    __slots__ = ("_root", "size")
+
+    def __init__(self, perms: Iterable[str] = ()):
+        self._root = _Node()
+        self.size = 0
+        for perm in perms:
+            self._add(perm)
+
+    def _add(self, perm: str) -> None:
+        if not perm:
+            return
+        self.size += 1
+        parts = perm.split(SEP)
+        wild = parts[-1] == WILDCARD
+        if wild:
+            parts.pop()
+        node = self._root
+        for part in parts:
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = _Node()
+            node = child
+        if wild:
+            node.wild = True
+        else:
+            node.exact = True
+
+    def allows(self, required: RequiredPerm) -> bool:
+        node: Optional[_Node] = self._root
+        if node.wild:
+            return True
+        for part in required:
+            node = node.children.get(part)
+            if node is None:
+                return False
+            if node.wild:
+                return True
+        return node.exact
+
+    def __len__(self) -> int:
+        return self.size
+
+
+EMPTY_MATCHER = PermissionMatcher()
@@ -0,0 +1,301 @@
+# app/core/rate_limit.py
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, time as dt_time, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.context import RequestContext
+from app.enums.enums import UserType
+
+logger = logging.getLogger(__name__)
+
+# 槽位：key(u64) a(u32) b(u32) c(u32) kind(u8) seeded(u8) window(u16)
+# - 限流槽：a=窗口编号 b=当前窗口计数 c=上一窗口计数 window=窗口秒数
+# - 用量槽：a=日期(yyyymmdd) b=当日 token c=当日请求数 seeded=是否已合并数据库已有值
+_SLOT = struct.Struct("<QIIIBBH")
+_RATE, _USAGE = 1, 2
+_PROBES = 16
+ANONYMOUS = "ANONYMOUS"
+
+
+@dataclass(frozen=True)
+class LimitRule:
+    """limit 次 / window 秒的滑动窗口；daily_tokens / daily_requests 为当日限额；0 表示不限制"""
+    limit: int = 0
+    window: int = 60
+    daily_tokens: int = 0
+    daily_requests: int = 0
+
+    @staticmethod
+    def from_dict(raw: Dict[str, Any]) -> "LimitRule":
+        return LimitRule(
+            limit=int(raw.get("limit", 0)),
+            window=max(1, min(int(raw.get("window", 60)), 65535)),
+            daily_tokens=int(raw.get("daily_tokens", 0)),
+            daily_requests=int(raw.get("daily_requests", 0)),
+        )
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    reason: str = ""
+    retry_after: float = 0.0
+
+
+def _key(text: str) -> int:
+    # 各 worker 进程必须算出同一个值，不能用内置 hash()（每个进程随机化）
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little") or 1
+
+
+def _today() -> int:
+    return int(time.strftime("%Y%m%d"))
+
+
+def _seconds_to_midnight() -> float:
+    """距本地时间次日零点的秒数（当日用量按本地日期 _today() 计）"""
+    now = datetime.now()
+    return (datetime.combine(now.date() + timedelta(days=1), dt_time.min) - now).total_seconds()
+
+
+class SharedRateLimiter:
+    """
+    单机多 worker 共享的限流 / 限额状态。
+    - 状态放在 mmap 的共享文件里（开放寻址哈希表，固定槽位），每次判定在 flock 下读改写一个或两个槽位，O(1)，不访问数据库
+    - 请求频率：按 (功能, 用户/IP) 的滑动窗口计数（上一窗口计数按剩余比例折算 + 当前窗口计数）
+    - 当日用量：按用户累计 token / 请求数；用户当日第一次出现时在后台合并 CntDailyUsage 中的已有值，期间先放行
+    - 规则按 "功能:角色" 查找，依次回退到 "*:角色"、"功能:*"、"*:*"
+    - 哈希表满（探测 _PROBES 个槽位都被占用）时放行并计数，不因为限流器本身拒绝请求
+    """
+
+    def __init__(self, path: str, slots: int, rules: Dict[str, LimitRule], enabled: bool = True):
+        self.path = path
+        self.slots = slots
+        self.rules = rules
+        self.enabled = enabled
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        # 进行中的合并任务：按用户去重，同时持有引用，避免任务未完成就被回收
+        self._seeding: Dict[str, asyncio.Task] = {}
+        self._seed: Optional[Callable] = None
+
+        self.allowed = 0
+        self.rejected_rate = 0
+        self.rejected_quota = 0
+        self.table_full = 0
+
+    def set_usage_loader(self, loader: Callable) -> None:
+        """loader(user_id) -> (当日请求数, 当日 token)，用于合并数据库已有值"""
+        self._seed = loader
+
+    def _open(self) -> mmap.mmap:
+        # fork 出来的 worker 不能沿用父进程的 fd / 映射，按 pid 重新打开
+        if self._mm is None or self._pid != os.getpid():
+            size = self.slots * _SLOT.size
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size < size:
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self._fd, self._mm, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+        return self._mm
+
+    def rule(self, feature: str, role: str) -> LimitRule:
+        rules = self.rules
+        return (
+            rules.get(f"{feature}:{role}") or rules.get(f"*:{role}")
+            or rules.get(f"{feature}:*") or rules.get("*:*") or LimitRule()
+        )
+
+    def _find(self, mm: mmap.mmap, key: int, kind: int, now: float, today: int) -> Optional[Tuple[int, list]]:
+        """返回 (偏移, 槽位字段)；key 不存在时占用第一个空闲或过期的槽位"""
+        start = key % self.slots
+        free = None
+        for i in range(_PROBES):
+            offset = ((start + i) % self.slots) * _SLOT.size
+            fields = list(_SLOT.unpack_from(mm, offset))
+            if fields[0] == key:
+                return offset, fields
+            if free is None and self._expired(fields, now, today):
+                free = offset
+        if free is None:
+            return None
+        return free, [key, 0, 0, 0, kind, 0, 0]
+
+    @staticmethod
+    def _expired(fields: list, now: float, today: int) -> bool:
+        key, a, _, _, kind, _, window = fields
+        if key == 0:
+            return True
+        if kind == _RATE:
+            return int(now // (window or 1)) - a > 1
+        return a != today
+
+    def check(self, subject: str, feature: str, role: str, cost: int = 1, tokens: int = 0) -> Decision:
+        """
+        判定一次请求：先看当日限额，再按滑动窗口计数（放行时计入本次）。
+        cost 为本次计入的调用次数（批量按条目数）；tokens 为预估消耗，超过当日剩余 token 时拒绝。
+        """
+        rule = self.rule(feature, role)
+        if not self.enabled or not (rule.limit or rule.daily_tokens or rule.daily_requests):
+            return Decision(True)
+        now, today = time.time(), _today()
+        mm = self._open()
+        need_seed = False
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if rule.daily_tokens or rule.daily_requests:
+                found = self._find(mm, _key(f"u|{subject}"), _USAGE, now, today)
+                if found is not None:
+                    offset, f = found
+                    if f[1] != today:
+                        f[1:4] = [today, 0, 0]
+                        f[5] = 0
+                        _SLOT.pack_into(mm, offset, *f)
+                    need_seed = not f[5]
+                    if (rule.daily_tokens and f[2] + max(tokens, 1) > rule.daily_tokens) or (
+                        rule.daily_requests and f[3] + cost > rule.daily_requests
+                    ):
+                        self.rejected_quota += 1
+                        return Decision(False, "quota", _seconds_to_midnight())
+
+            if rule.limit:
+                found = self._find(mm, _key(f"r|{feature}|{subject}"), _RATE, now, today)
+                if found is None:
+                    self.table_full += 1
+                else:
+                    offset, f = found
+                    window = rule.window
+                    current = int(now // window)
+                    if f[6] != window or f[1] != current:
+                        # 进入新窗口：上一窗口计数只在相邻窗口时保留
+                        f[3] = f[2] if f[6] == window and f[1] == current - 1 else 0
+                        f[1], f[2], f[6] = current, 0, window
+                    elapsed = (now % window) / window
+                    estimate = f[3] * (1 - elapsed) + f[2]
+                    if estimate + cost > rule.limit:
+                        _SLOT.pack_into(mm, offset, *f)
+                        self.rejected_rate += 1
+                        return Decision(False, "rate", window * (1 - elapsed))
+                    f[2] += cost
+                    _SLOT.pack_into(mm, offset, *f)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        if need_seed:
+            self._schedule_seed(subject)
+        self.allowed += 1
+        return Decision(True)
+
+    def add_usage(self, subject: str, tokens: int, requests: int = 1) -> None:
+        """调用完成后累加当日用量（所有 worker 可见）"""
+        if not self.enabled:
+            return
+        now, today = time.time(), _today()
+        mm = self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            found = self._find(mm, _key(f"u|{subject}"), _USAGE, now, today)
+            if found is None:
+                self.table_full += 1
+                return
+            offset, f = found
+            if f[1] != today:
+                f[1:4] = [today, 0, 0]
+                f[5] = 0
+            f[2] = min(f[2] + tokens, 0xFFFFFFFF)
+            f[3] = min(f[3] + requests, 0xFFFFFFFF)
+            _SLOT.pack_into(mm, offset, *f)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _schedule_seed(self, subject: str) -> None:
+        # 匿名（按 IP）的用量不落库，无需合并
+        if subject.startswith("ip:") or self._seed is None:
+            self._mark_seeded(subject, 0, 0)
+            return
+        if subject in self._seeding:
+            return
+        task = asyncio.get_running_loop().create_task(self._seed_from_db(subject))
+        self._seeding[subject] = task
+        task.add_done_callback(lambda _: self._seeding.pop(subject, None))
+
+    async def _seed_from_db(self, subject: str) -> None:
+        try:
+            requests, tokens = await self._seed(subject)
+            self._mark_seeded(subject, requests, tokens)
+        except Exception as e:
+            logger.warning("rate limiter failed to load usage of %s: %r", subject, e)
+
+    def _mark_seeded(self, subject: str, requests: int, tokens: int) -> None:
+        now, today = time.time(), _today()
+        mm = self._open()
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            found = self._find(mm, _key(f"u|{subject}"), _USAGE, now, today)
+            if found is None:
+                return
+            offset, f = found
+            if f[1] != today:
+                f[1:4] = [today, 0, 0]
+            # 各 worker 可能各自合并一次，取较大值保证幂等
+            f[2] = max(f[2], tokens)
+            f[3] = max(f[3], requests)
+            f[5] = 1
+            _SLOT.pack_into(mm, offset, *f)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        used = 0
+        if self._mm is not None and self._pid == os.getpid():
+            now, today = time.time(), _today()
+            used = sum(not self._expired(list(f), now, today) for f in _SLOT.iter_unpack(self._mm[:]))
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "slots": self.slots,
+            "slots_used": used,
+            "allowed": self.allowed,
+            "rejected_rate": self.rejected_rate,
+            "rejected_quota": self.rejected_quota,
+            "table_full": self.table_full,
+        }
+
+
+def subject_of(ctx: RequestContext) -> str:
+    """限流主体：登录用户按 user_id，匿名按客户端 IP"""
+    return ctx.user_id if ctx.is_authed else f"ip:{ctx.client_ip or 'unknown'}"
+
+
+def role_of(ctx: RequestContext) -> str:
+    if not ctx.is_authed:
+        return ANONYMOUS
+    if ctx.is_admin:
+        return UserType.ADMIN.value
+    return UserType.CUSTOMER.value
+
+
+def _load_rules(raw: str) -> Dict[str, LimitRule]:
+    return {key: LimitRule.from_dict(value) for key, value in json.loads(raw or "{}").items()}
+
+
+rate_limiter = SharedRateLimiter(
+    path=settings.rate_limit_path or os.path.join(tempfile.gettempdir(), f"{settings.app_name}-ratelimit.bin"),
+    slots=settings.rate_limit_slots,
+    rules=_load_rules(settings.rate_limit_rules),
+    enabled=settings.rate_limit_enabled,
+)
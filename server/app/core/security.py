@@ -1,15 +1,137 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import bcrypt
 from jose import jwt, JWTError
-from passlib.context import CryptContext
+
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt 只使用密码的前 72 字节（passlib 时代同样截断），新版 bcrypt 超长会直接报错，这里显式截断
+_BCRYPT_MAX_BYTES = 72
+
+
+def _secret(password: str) -> bytes:
+    return password.encode("utf-8")[:_BCRYPT_MAX_BYTES]
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(_secret(password), bcrypt.gensalt(rounds)).decode("ascii")
+
+
+def _verify(plain: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(_secret(plain), hashed.encode("ascii"))
+    except ValueError:
+        # 库里的 hash 格式不对（空串 / 非 bcrypt），按校验失败处理
+        return False
+
+
+def _timed(fn: Callable, args: tuple) -> Tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class PasswordHasher:
+    """
+    bcrypt 哈希 / 校验放到独立的有界线程池里执行（bcrypt 计算时释放 GIL），不阻塞事件循环。
+    - workers：同时计算的个数，决定单机登录吞吐（约 workers / 单次耗时）
+    - max_pending：排队上限，登录洪峰超过 workers + max_pending 时直接返回"服务繁忙"，不无限堆积
+    - rounds：工作因子（cost），每加 1 耗时翻倍；调整后旧 hash 仍可校验，needs_rehash 判断是否需要按新因子重算
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 2, max_pending: int = 64):
+        if not 4 <= rounds <= 31:
+            raise ValueError(f"bcrypt rounds must be between 4 and 31, got {rounds}")
+        self.rounds = rounds
+        self.workers = max(1, workers)
+        self.max_pending = max(0, max_pending)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._inflight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.peak_inflight = 0
+        self._busy_seconds = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def _submit(self, fn: Callable, *args: Any) -> Any:
+        if self._inflight >= self.workers + self.max_pending:
+            self.rejected += 1
+            raise BizException(ResponseCode._5031)
+        self._inflight += 1
+        self.peak_inflight = max(self.peak_inflight, self._inflight)
+        try:
+            result, elapsed = await asyncio.get_running_loop().run_in_executor(self._pool(), _timed, fn, args)
+        finally:
+            self._inflight -= 1
+        self._busy_seconds += elapsed
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(_hash, password, self.rounds)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        return await self._submit(_verify, plain, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """hash 的工作因子与当前配置不一致（登录校验通过后可顺带按新因子重算）"""
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "inflight": self._inflight,
+            "peak_inflight": self.peak_inflight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self._busy_seconds * 1000 / self.completed, 2) if self.completed else 0,
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=settings.bcrypt_rounds,
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_queue,
+)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """async 接口（login / register / 改密码等）使用，不阻塞事件循环"""
+    return await password_hasher.hash(password)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await password_hasher.verify(plain, hashed)
+
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    """同步版本：只用于脚本 / 同步上下文，async 接口里用 get_password_hash_async"""
+    return _hash(password, password_hasher.rounds)
+
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return _verify(plain, hashed)
 
 def create_access_token(subject: str) -> str:
     expire = datetime.now(timezone.utc) + timedelta(minutes=settings.access_token_expire_minutes)
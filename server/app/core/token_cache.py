@@ -0,0 +1,103 @@
+# app/core/token_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.context import RequestContext
+from app.core.security import decode_token
+
+
+@dataclass(frozen=True)
+class VerifiedToken:
+    """验签通过的 token：payload 与据此构建的上下文（不含 client_ip），跨请求共享，只读"""
+    payload: Dict[str, Any]
+    ctx: RequestContext
+
+
+class VerifiedTokenCache:
+    """
+    已验签 JWT 的缓存：前端每次请求带同一个 bearer token，命中时跳过验签、解析 claims 和构建 roles/perms。
+    - 键：token 的 blake2b 摘要（不在内存里保留原始 token）
+    - 有效期到 token 的 exp 为止，且不超过 max_ttl（没有 exp 的 token 同样受 max_ttl 约束）
+    - 进程内 LRU，超过 max_entries 淘汰最久未用的；验签失败的 token 不缓存
+    - 读写加锁，同步 / 线程池里的调用方同样可用
+    """
+
+    def __init__(self, max_entries: int = 4096, max_ttl: float = 300):
+        self.max_entries = max(1, max_entries)
+        self.max_ttl = max_ttl
+        self._entries: "OrderedDict[bytes, Tuple[float, VerifiedToken]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalid = 0
+
+    @staticmethod
+    def _digest(token: str) -> bytes:
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token: str) -> Optional[VerifiedToken]:
+        """返回验签结果；token 无效或已过期返回 None"""
+        key = self._digest(token)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+
+        try:
+            payload = decode_token(token)
+        except ValueError:
+            with self._lock:
+                self.invalid += 1
+            return None
+
+        verified = VerifiedToken(payload=payload, ctx=RequestContext.from_payload(payload))
+        expires_at = now + self.max_ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at > now:
+            with self._lock:
+                self._entries[key] = (expires_at, verified)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return verified
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalid": self.invalid,
+        }
+
+
+token_cache = VerifiedTokenCache(
+    max_entries=settings.jwt_cache_size,
+    max_ttl=settings.jwt_cache_ttl,
+)
@@ -0,0 +1,277 @@
+# app/core/write_behind.py
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import func, insert
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 单条 INSERT 的绑定参数上限（SQLite 旧版本为 999），按列数折算每条语句的行数
+_MAX_PARAMS = 900
+_INSERT, _UPSERT = "insert", "upsert"
+
+
+class _Op:
+    __slots__ = ("kind", "model", "row")
+
+    def __init__(self, kind: str, model: Type, row: Dict[str, Any]):
+        self.kind = kind
+        self.model = model
+        self.row = row
+
+
+class WriteBehindQueue:
+    """
+    日志类数据的异步落库（write-behind）。
+    - 请求路径只把记录放进有界队列，后台任务按条数（batch_size）或时间（flush_interval）攒批，一个事务内多行 INSERT
+    - upsert 记录按主键在批内合并（PENDING → DONE 同批时只写一行），跨批用 ON CONFLICT / ON DUPLICATE KEY 更新
+    - 队列满时调用方最多等待 put_timeout（背压），仍放不进去则丢弃并计数，不拖垮请求
+    - 大字段（prompt / 上下文等）按 sample_rate 采样保留全文，未采样的只保留前 preview_chars 个字符
+    - 关闭时把队列里剩余的记录全部写完
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        max_queue: int = 10000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        put_timeout: float = 0.05,
+        sample_rate: float = 1.0,
+        preview_chars: int = 200,
+    ):
+        self._session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.sample_rate = sample_rate
+        self.preview_chars = preview_chars
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._dialect: Optional[str] = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.flushed_rows = 0
+        self.batches = 0
+        self.failed_rows = 0
+        self._flush_seconds = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run(self._queue), name="write-behind")
+
+    async def close(self, timeout: float = 10.0) -> None:
+        """停止接收并写完队列中剩余的记录；超时仍未写完则放弃"""
+        if not self.running:
+            return
+        queue, task = self._queue, self._task
+        self._queue = None
+        await queue.put(None)
+        try:
+            await asyncio.wait_for(task, timeout)
+        except asyncio.TimeoutError:
+            logger.error("write-behind flush timed out, %d records lost", queue.qsize())
+        self._task = None
+
+    async def insert(self, model: Type, row: Dict[str, Any], sampled_fields: Sequence[str] = ()) -> bool:
+        """追加写（只插入不更新）；返回是否进入队列"""
+        return await self._put(_Op(_INSERT, model, self._sample(row, sampled_fields)))
+
+    async def upsert(self, model: Type, row: Dict[str, Any], sampled_fields: Sequence[str] = ()) -> bool:
+        """按主键插入或更新（row 必须包含主键）；同一主键的多次写入在批内合并"""
+        return await self._put(_Op(_UPSERT, model, self._sample(row, sampled_fields)))
+
+    async def _put(self, op: _Op) -> bool:
+        queue = self._queue
+        if queue is None:
+            self.dropped += 1
+            return False
+        try:
+            queue.put_nowait(op)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(op), self.put_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += 1
+                if self.dropped % 100 == 1:
+                    logger.warning("write-behind queue full, %d records dropped so far", self.dropped)
+                return False
+        self.enqueued += 1
+        return True
+
+    def _sample(self, row: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+        """
+        大字段采样。字段值可以是无参函数（如渲染最终 Prompt），只在需要时求值。
+        未采样的字符串只保留前缀，其余类型置空。
+        """
+        if not fields:
+            return row
+        keep = self.sample_rate >= 1.0 or random.random() < self.sample_rate
+        if not keep:
+            self.sampled_out += 1
+        for name in fields:
+            value = row.get(name)
+            if callable(value):
+                value = value() if keep else ""
+            if not keep:
+                if isinstance(value, str):
+                    if len(value) > self.preview_chars:
+                        value = value[:self.preview_chars] + "…"
+                elif value is not None:
+                    value = None
+            row[name] = value
+        return row
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        closing = False
+        while not closing:
+            op = await queue.get()
+            if op is None:
+                break
+            batch = [op]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    op = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        op = await asyncio.wait_for(queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if op is None:
+                    closing = True
+                    break
+                batch.append(op)
+            await self._flush(batch)
+
+        # 关闭：写完剩余记录
+        rest: List[_Op] = []
+        while not queue.empty():
+            op = queue.get_nowait()
+            if op is not None:
+                rest.append(op)
+        for i in range(0, len(rest), self.batch_size):
+            await self._flush(rest[i:i + self.batch_size])
+
+    async def _flush(self, batch: List[_Op]) -> None:
+        groups = self._group(batch)
+        rows = sum(len(r) for r in groups.values())
+        start = time.perf_counter()
+        for attempt in (1, 2):
+            try:
+                await self._write(groups)
+                break
+            except Exception as e:
+                if attempt == 2:
+                    self.failed_rows += rows
+                    logger.exception("write-behind flush of %d rows failed: %r", rows, e)
+                    return
+                await asyncio.sleep(0.2)
+        self.batches += 1
+        self.flushed_rows += rows
+        self._flush_seconds += time.perf_counter() - start
+
+    @staticmethod
+    def _group(batch: List[_Op]) -> Dict[Tuple, List[Dict[str, Any]]]:
+        """按 (类型, 表, 列集合) 分组，多行 VALUES 要求列一致；upsert 先按主键合并"""
+        merged: Dict[Tuple, Dict[str, Any]] = {}
+        groups: Dict[Tuple, List[Dict[str, Any]]] = {}
+        for op in batch:
+            if op.kind == _UPSERT:
+                pk = tuple(op.row[c.name] for c in op.model.__table__.primary_key.columns)
+                row = merged.get((op.model, pk))
+                if row is None:
+                    merged[(op.model, pk)] = dict(op.row)
+                else:
+                    row.update(op.row)
+            else:
+                groups.setdefault((_INSERT, op.model, tuple(sorted(op.row))), []).append(op.row)
+        for (model, _), row in merged.items():
+            groups.setdefault((_UPSERT, model, tuple(sorted(row))), []).append(row)
+        return groups
+
+    async def _write(self, groups: Dict[Tuple, List[Dict[str, Any]]]) -> None:
+        async with self._session_factory() as session:
+            async with session.begin():
+                if self._dialect is None:
+                    self._dialect = session.bind.dialect.name
+                for (kind, model, columns), rows in groups.items():
+                    per_stmt = max(1, _MAX_PARAMS // max(len(columns), 1))
+                    for i in range(0, len(rows), per_stmt):
+                        chunk = rows[i:i + per_stmt]
+                        if kind == _INSERT:
+                            await session.execute(insert(model).values(chunk))
+                        else:
+                            await self._upsert(session, model, columns, chunk)
+
+    async def _upsert(self, session, model: Type, columns: Tuple[str, ...], rows: List[Dict[str, Any]]) -> None:
+        table = model.__table__
+        pk = [c.name for c in table.primary_key.columns]
+        if self._dialect in ("sqlite", "postgresql"):
+            if self._dialect == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            stmt = dialect_insert(model).values(rows)
+            update = {c: stmt.excluded[c] for c in columns if c not in pk}
+            if "updated_at" in table.c:
+                update["updated_at"] = func.now()
+            await session.execute(stmt.on_conflict_do_update(index_elements=pk, set_=update))
+        elif self._dialect in ("mysql", "mariadb"):
+            from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+            stmt = dialect_insert(model).values(rows)
+            update = {c: stmt.inserted[c] for c in columns if c not in pk}
+            if "updated_at" in table.c:
+                update["updated_at"] = func.now()
+            await session.execute(stmt.on_duplicate_key_update(**update))
+        else:
+            # 其它数据库没有通用的 upsert 语法，逐行 merge
+            for row in rows:
+                await session.merge(model(**row))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+            "avg_batch_rows": round(self.flushed_rows / self.batches, 1) if self.batches else 0,
+            "avg_flush_ms": round(self._flush_seconds * 1000 / self.batches, 2) if self.batches else 0,
+        }
+
+
+log_writer = WriteBehindQueue(
+    AsyncSessionLocal,
+    max_queue=settings.log_queue_size,
+    batch_size=settings.log_batch_size,
+    flush_interval=settings.log_flush_interval,
+    put_timeout=settings.log_put_timeout,
+    sample_rate=settings.log_sample_rate,
+    preview_chars=settings.log_preview_chars,
+)
@@ -1,19 +1,25 @@
 # app/deps.py
 from __future__ import annotations
 
+from dataclasses import replace
 from typing import Any, Dict, Optional, Set, List, Callable, Type, TypeVar, AsyncGenerator
 
 from fastapi import Depends, HTTPException, Request, status
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.core.context import RequestContext
+from app.core.permissions import parse_perm
+from app.core.rate_limit import rate_limiter, role_of, subject_of
+from app.core.token_cache import VerifiedToken, token_cache
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
 from app.core.database import AsyncSessionLocal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 S = TypeVar("S")
 
+_ANONYMOUS_CTX = RequestContext.from_payload(None)
+
 
 # ----------------------------
 # DB
@@ -39,44 +45,37 @@ def _get_bearer_token(request: Request) -> Optional[str]:
     return token
 
 
-def _decode_jwt(token: str) -> Optional[Dict[str, Any]]:
-    try:
-        return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-    except JWTError:
+async def _get_verified_token(request: Request) -> Optional[VerifiedToken]:
+    """验签结果（按 token 缓存到 exp，同一请求内只解析一次）；未登录或 token 无效返回 None"""
+    token = _get_bearer_token(request)
+    if not token:
         return None
+    return token_cache.get(token)
 
 
-def get_current_user_payload(request: Request) -> Optional[Dict[str, Any]]:
+async def get_current_user_payload(
+    verified: Optional[VerifiedToken] = Depends(_get_verified_token),
+) -> Optional[Dict[str, Any]]:
     """
     返回 JWT payload（未登录则返回 None）
     """
-    token = _get_bearer_token(request)
-    if not token:
-        return None
-    return _decode_jwt(token)
+    return verified.payload if verified else None
 
 
-def get_ctx(
-    payload: Optional[Dict[str, Any]] = Depends(get_current_user_payload),
+async def get_ctx(
+    request: Request,
+    verified: Optional[VerifiedToken] = Depends(_get_verified_token),
 ) -> RequestContext:
     """
     可匿名上下文：
     - 未登录：user_id=None
-    - 登录：从 token payload 取 sub/user_id/uid
+    - 登录：从 token payload 取 sub/user_id/uid（按 token 缓存，roles/perms 只读）
     """
-    user_id = (payload or {}).get("sub") or (payload or {}).get("user_id") or (payload or {}).get("uid")
-
-    roles: List[str] = list((payload or {}).get("roles") or [])
-    perms: Set[str] = set((payload or {}).get("perms") or [])
-
-    return RequestContext(
-        user_id=user_id,
-        roles=roles,
-        perms=perms,
-    )
+    base = verified.ctx if verified else _ANONYMOUS_CTX
+    return replace(base, client_ip=request.client.host if request.client else None)
 
 
-def get_ctx_required(ctx: RequestContext = Depends(get_ctx)) -> RequestContext:
+async def get_ctx_required(ctx: RequestContext = Depends(get_ctx)) -> RequestContext:
     """
     必须登录：没登录直接 401
     """
@@ -88,28 +87,6 @@ def get_ctx_required(ctx: RequestContext = Depends(get_ctx)) -> RequestContext:
 # ----------------------------
 # Permission guard
 # ----------------------------
-def _perm_match(required: str, owned: Set[str]) -> bool:
-    """
-    支持简单通配：
-    - 精确匹配: sys:user:save
-    - 前缀通配: sys:user:*  或 sys:*  （owned 里存这种也算）
-    - 超级权限: *
-    """
-    if required in owned:
-        return True
-
-    parts = required.split(":")
-    for i in range(len(parts), 0, -1):
-        prefix = ":".join(parts[:i]) + ":*"
-        if prefix in owned:
-            return True
-
-    if "*" in owned:
-        return True
-
-    return False
-
-
 def require_perm(perm: str):
     """
     用法（你 codegen 会生成这个）：
@@ -118,17 +95,50 @@ def require_perm(perm: str):
           ...
     """
 
-    def _dep(ctx: RequestContext = Depends(get_ctx_required)) -> None:
+    # 所需权限在创建依赖时解析；拥有的权限已随上下文编译成前缀树
+    # 匹配规则：精确匹配 sys:user:save / 前缀通配 sys:user:* 或 sys:* / 超级权限 *
+    required = parse_perm(perm)
+
+    async def _dep(ctx: RequestContext = Depends(get_ctx_required)) -> None:
         # ADMIN 角色直通（可选）
         if ctx.is_admin:
             return
 
-        if not _perm_match(perm, ctx.perms or set()):
+        if not ctx.has_perm(required):
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
 
     return _dep
 
 
+# ----------------------------
+# Rate limit
+# ----------------------------
+def check_rate_limit(ctx: RequestContext, feature: str, cost: int = 1, tokens: int = 0) -> None:
+    """
+    按 功能 + 角色 的规则判定一次调用，超限抛 BizException。
+    需要按请求体计费的接口（如批量翻译按条目数 / 预估 token）在解析请求体后直接调用。
+    """
+    decision = rate_limiter.check(subject_of(ctx), feature, role_of(ctx), cost, tokens)
+    if not decision.allowed:
+        code = ResponseCode._4102 if decision.reason == "quota" else ResponseCode._4291
+        raise BizException(code, f"{code.msg}（{int(decision.retry_after) + 1} 秒后可重试）")
+
+
+def rate_limit(feature: str, cost: int = 1):
+    """
+    限流 / 当日限额（规则按 功能 + 角色 配置，见 settings.rate_limit_rules）：
+      @router.post(..., dependencies=[Depends(rate_limit("translate"))])
+    判定只读写本机共享内存，不访问数据库。
+    """
+
+    # async：判定在事件循环里完成（临界区很短），首次出现的用户在循环里调度用量合并
+    async def _dep(ctx: RequestContext = Depends(get_ctx)) -> RequestContext:
+        check_rate_limit(ctx, feature, cost)
+        return ctx
+
+    return _dep
+
+
 # ----------------------------
 # Service providers (解决你说的 svc = XxxService(db, ctx) 太多的问题)
 # ----------------------------
@@ -136,7 +146,7 @@ def provide_service(service_cls: Type[S]) -> Callable[..., S]:
     """
     强制登录的 service 注入（用于需要鉴权的接口）
     """
-    def _dep(db: Session = Depends(get_db), ctx: RequestContext = Depends(get_ctx_required)) -> S:
+    async def _dep(db: AsyncSession = Depends(get_db), ctx: RequestContext = Depends(get_ctx_required)) -> S:
         return service_cls(db, ctx)
     return _dep
 
@@ -145,6 +155,6 @@ def provide_service_optional(service_cls: Type[S]) -> Callable[..., S]:
     """
     可匿名的 service 注入（用于公开接口）
     """
-    def _dep(db: Session = Depends(get_db), ctx: RequestContext = Depends(get_ctx)) -> S:
+    async def _dep(db: AsyncSession = Depends(get_db), ctx: RequestContext = Depends(get_ctx)) -> S:
         return service_cls(db, ctx)
     return _dep
@@ -1,11 +1,21 @@
 # main.py
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 
+from app.common.codes import ResponseCode
+from app.common.res import Res
 from app.core.config import settings
 from app.core.database import init_db, engine
+from app.core.rate_limit import rate_limiter
+from app.core.security import password_hasher
+from app.core.write_behind import log_writer
 from app.core.exception_handlers import register_exception_handlers
 from app.api.router import api_router
+from app.workflows.runtime import ai_runtime
+from app.workflows.scenario_manager import scenario_manager
+from app.workflows.config import SCENARIO_WATCH_INTERVAL
+from app.services.agent.result_cache import result_cache
+from app.services.agent.usage_counter import usage_counter
 
 
 @asynccontextmanager
@@ -14,8 +24,34 @@ async def lifespan(app: FastAPI):
     await init_db()
     print("✅ Database initialized (Async)")
 
+    # 翻译日志 / 生成记录 / 改写历史异步攒批落库
+    log_writer.start()
+    print("✅ Write-behind log queue started")
+    usage_counter.start()
+    # 限流器的当日用量在用户首次出现时合并数据库已有值
+    rate_limiter.set_usage_loader(usage_counter.usage)
+
+    # AI 栈（langgraph / langchain / MCP 工具客户端 / 执行计划 / LLM 连接池）按 AI_WARMUP 预热：
+    # eager 启动时阻塞预热；background 后台预热、/ready 就绪后再接流量；lazy 首个请求按需加载
+    if settings.ai_warmup == "eager":
+        await ai_runtime.warm_up()
+        print(f"✅ AI stack warmed up: {ai_runtime.status()}")
+    elif settings.ai_warmup == "background":
+        ai_runtime.start_background()
+        print("✅ AI stack warming up in background")
+
+    # 后台监听 scenarios.json，变更后原子替换配置快照
+    scenario_manager.start_watching(SCENARIO_WATCH_INTERVAL)
+
     yield
 
+    await scenario_manager.stop_watching()
+    await ai_runtime.close()
+    await result_cache.close()
+    # 先写完队列里的日志和用量计数，再释放连接池
+    await log_writer.close()
+    await usage_counter.close()
+    password_hasher.shutdown()
     # ✅ 修改：加上 await
     await engine.dispose()
 
@@ -24,3 +60,12 @@ app = FastAPI(title=settings.app_name, lifespan=lifespan)
 app.include_router(api_router)
 register_exception_handlers(app)
 
+
+
+@app.get("/ready")
+async def ready(response: Response):
+    """就绪探针：AI 栈预热完成前返回 503（lazy 模式不等预热，启动即就绪）"""
+    if ai_runtime.ready or settings.ai_warmup == "lazy":
+        return Res.success(ai_runtime.status())
+    response.status_code = 503
+    return Res.fail(ResponseCode._5031, f"AI 服务未就绪：{ai_runtime.state}")
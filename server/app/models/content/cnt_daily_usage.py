@@ -0,0 +1,27 @@
+# generated - DO NOT EDIT
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, BigInteger, String, Text, UniqueConstraint, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Enum as SAEnum
+
+from app.enums.enums import *
+from app.models.base import Base
+from app.models._gen_mixins import IdMixin, SoftDeleteMixin, TimeMixin
+
+
+class CntDailyUsage(IdMixin, TimeMixin, SoftDeleteMixin, Base):
+    """每日用量(用于限额/计费)"""
+    __tablename__ = "t_cnt_daily_usage"
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'yyyymmdd', name='uk_cnt_daily_usage'),
+    )
+
+    user_id: Mapped[str] = mapped_column(String(64), nullable=False, comment="用户ID")
+    yyyymmdd: Mapped[str] = mapped_column(String(8), nullable=False, comment="日期(YYYYMMDD)")
+    requests: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="请求次数")
+    tokens: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="Token累计")
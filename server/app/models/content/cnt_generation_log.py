@@ -0,0 +1,32 @@
+# generated - DO NOT EDIT
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, BigInteger, String, Text, UniqueConstraint, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Enum as SAEnum
+
+from app.enums.enums import *
+from app.models.base import Base
+from app.models._gen_mixins import IdMixin, SoftDeleteMixin, TimeMixin
+
+
+class CntGenerationLog(IdMixin, TimeMixin, SoftDeleteMixin, Base):
+    """生成记录/用量统计"""
+    __tablename__ = "t_cnt_generation_log"
+
+    user_id: Mapped[str] = mapped_column(String(64), nullable=False, comment="用户ID")
+    feature_code: Mapped[str] = mapped_column(String(64), nullable=False, comment="功能code")
+    tone_id: Mapped[str] = mapped_column(String(32), nullable=True, comment="语气ID")
+    input_text: Mapped[str] = mapped_column(Text, nullable=False, comment="输入(Text)")
+    context_text: Mapped[str] = mapped_column(Text, nullable=True, comment="上下文(Text)")
+    output_text: Mapped[str] = mapped_column(Text, nullable=True, comment="输出(Text)")
+    model_name: Mapped[str] = mapped_column(String(64), nullable=True, comment="模型名")
+    tokens_in: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="输入token")
+    tokens_out: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="输出token")
+    cost_cents: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="成本(分)")
+    latency_ms: Mapped[int] = mapped_column(Integer, nullable=False, default=0, comment="耗时ms")
+    status: Mapped[BasicStatus] = mapped_column(SAEnum(BasicStatus, name='enum_basic_status', native_enum=False), nullable=False, comment="状态")
+    remark: Mapped[str] = mapped_column(String(255), nullable=True, comment="备注")
@@ -0,0 +1,25 @@
+# generated - DO NOT EDIT
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Boolean, DateTime, Integer, BigInteger, String, Text, UniqueConstraint, JSON
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Enum as SAEnum
+
+from app.enums.enums import *
+from app.models.base import Base
+from app.models._gen_mixins import IdMixin, SoftDeleteMixin, TimeMixin
+
+
+class CntRewriteHistory(IdMixin, TimeMixin, SoftDeleteMixin, Base):
+    """改写历史(按用户)"""
+    __tablename__ = "t_cnt_rewrite_history"
+
+    user_id: Mapped[str] = mapped_column(String(64), nullable=False, comment="用户ID")
+    scenario_code: Mapped[str] = mapped_column(String(64), nullable=False, comment="场景编码")
+    input_text: Mapped[str] = mapped_column(Text, nullable=False, comment="输入")
+    prompt: Mapped[str] = mapped_column(Text, nullable=False, comment="最终Prompt")
+    output_text: Mapped[str] = mapped_column(Text, nullable=False, comment="输出")
+    usage: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=True, comment="用量(JSON)")
@@ -5,11 +5,11 @@ import re
 from typing import Any, Dict, List, Tuple, Type, Optional
 
 from sqlalchemy import select, func
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class BaseService:
-    def __init__(self, db: Session, ctx: Any):
+    def __init__(self, db: AsyncSession, ctx: Any):
         self.db = db
         self.ctx = ctx
 
@@ -51,19 +51,27 @@ class CRUDService(BaseService):
             return stmt.order_by(col.desc())
         return stmt.order_by(col.asc())
 
-    def get_by_id(self, obj_id: str):
+    def _apply_filters(self, stmt, filters: Optional[Dict[str, Any]]):
+        for k, v in (filters or {}).items():
+            if v is None:
+                continue
+            if hasattr(self.model, k):
+                stmt = stmt.where(getattr(self.model, k) == v)
+        return stmt
+
+    async def get_by_id(self, obj_id: str):
         stmt = self._base_stmt().where(self.model.id == obj_id)
-        return self.db.scalars(stmt).first()
+        return (await self.db.scalars(stmt)).first()
 
-    def create(self, data: Dict[str, Any]):
+    async def create(self, data: Dict[str, Any]):
         obj = self.model(**data)
         self.db.add(obj)
-        self.db.commit()
-        self.db.refresh(obj)
+        await self.db.commit()
+        await self.db.refresh(obj)
         return obj
 
-    def update(self, obj_id: str, data: Dict[str, Any]):
-        obj = self.get_by_id(obj_id)
+    async def update(self, obj_id: str, data: Dict[str, Any]):
+        obj = await self.get_by_id(obj_id)
         if not obj:
             return None
         for k, v in (data or {}).items():
@@ -71,55 +79,36 @@ class CRUDService(BaseService):
                 continue
             if hasattr(obj, k):
                 setattr(obj, k, v)
-        self.db.commit()
-        self.db.refresh(obj)
+        await self.db.commit()
+        await self.db.refresh(obj)
         return obj
 
-    def delete_many(self, ids: List[str]) -> int:
-        n = 0
-        for _id in ids or []:
-            obj = self.get_by_id(_id)
-            if not obj:
-                continue
+    async def delete_many(self, ids: List[str]) -> int:
+        if not ids:
+            return 0
+        objs = (await self.db.scalars(self._base_stmt().where(self.model.id.in_(ids)))).all()
+        for obj in objs:
             if hasattr(obj, "deleted"):
                 setattr(obj, "deleted", True)
-                n += 1
             else:
-                self.db.delete(obj)
-                n += 1
-        self.db.commit()
-        return n
-
-    def list(self, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None) -> List[Any]:
-        stmt = self._base_stmt()
-        filters = filters or {}
-        for k, v in filters.items():
-            if v is None:
-                continue
-            if hasattr(self.model, k):
-                stmt = stmt.where(getattr(self.model, k) == v)
-        stmt = self._apply_order_by(stmt, order_by)
-        return list(self.db.scalars(stmt).all())
+                await self.db.delete(obj)
+        await self.db.commit()
+        return len(objs)
+
+    async def list(self, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None) -> List[Any]:
+        stmt = self._apply_order_by(self._apply_filters(self._base_stmt(), filters), order_by)
+        return list((await self.db.scalars(stmt)).all())
 
-    def paging(
+    async def paging(
         self,
         filters: Optional[Dict[str, Any]] = None,
         page: int = 1,
         size: int = 20,
         order_by: Optional[str] = None,
     ) -> Tuple[int, List[Any]]:
-        stmt = self._base_stmt()
-        filters = filters or {}
-
-        for k, v in filters.items():
-            if v is None:
-                continue
-            if hasattr(self.model, k):
-                stmt = stmt.where(getattr(self.model, k) == v)
-
-        stmt = self._apply_order_by(stmt, order_by)
+        stmt = self._apply_order_by(self._apply_filters(self._base_stmt(), filters), order_by)
 
         subq = stmt.subquery()
-        total = self.db.scalar(select(func.count()).select_from(subq)) or 0
-        items = list(self.db.scalars(stmt.offset((page - 1) * size).limit(size)).all())
+        total = await self.db.scalar(select(func.count()).select_from(subq)) or 0
+        items = list((await self.db.scalars(stmt.offset((page - 1) * size).limit(size))).all())
         return int(total), items
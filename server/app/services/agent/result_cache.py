@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.core.config import settings
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 统一全角/半角，去掉首尾空白并折叠连续空白"""
+    return " ".join(unicodedata.normalize("NFKC", text or "").split())
+
+
+class _SQLiteTier:
+    """
+    SQLite 持久层：服务重启后仍可命中。
+    使用标准库 sqlite3，所有读写通过 asyncio.to_thread 放到线程里执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS t_result_cache ("
+                " cache_key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[float, dict]]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value, expires_at FROM t_result_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        value, expires_at = row
+        if expires_at < time.time():
+            return None
+        return expires_at, json.loads(value)
+
+    def set(self, key: str, value: dict, expires_at: float) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO t_result_cache (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._connect().execute("DELETE FROM t_result_cache WHERE expires_at < ?", (time.time(),))
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class ResultCache:
+    """
+    翻译结果缓存（只用于 scenarios.json 中标记了 cacheable 的确定性语气）。
+    - 键：规范化输入 + scene/intent/tone + 生效的 llm_params + 配置快照版本，配置热更新后自动失效
+    - 一级：进程内 LRU + TTL
+    - 二级：可选的 SQLite 持久层，重启后仍可命中，命中后回填一级
+    """
+
+    def __init__(self, max_entries: int = 2048, ttl: float = 86400, sqlite_path: str = ""):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._memory: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self._sqlite = _SQLiteTier(sqlite_path) if sqlite_path else None
+        self.hits = 0
+        self.sqlite_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        text: str,
+        scene_id: str,
+        intent_id: str,
+        tone_id: str,
+        llm_params: Mapping,
+        version: str,
+    ) -> str:
+        payload = json.dumps(
+            [normalize_text(text), scene_id, intent_id, tone_id, dict(llm_params), version],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._memory[key]
+
+        if self._sqlite is not None:
+            found = await asyncio.to_thread(self._sqlite.get, key)
+            if found is not None:
+                expires_at, value = found
+                self._put_memory(key, value, expires_at)
+                self.sqlite_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: dict) -> None:
+        expires_at = time.time() + self.ttl
+        self._put_memory(key, value, expires_at)
+        if self._sqlite is not None:
+            await asyncio.to_thread(self._sqlite.set, key, value, expires_at)
+
+    def _put_memory(self, key: str, value: dict, expires_at: float) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def close(self) -> None:
+        if self._sqlite is not None:
+            await asyncio.to_thread(self._sqlite.purge_expired)
+            await asyncio.to_thread(self._sqlite.close)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.sqlite_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "sqlite_hits": self.sqlite_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.sqlite_hits) / lookups, 4) if lookups else 0.0,
+            "sqlite": bool(self._sqlite),
+        }
+
+
+result_cache = ResultCache(
+    max_entries=settings.result_cache_size,
+    ttl=settings.result_cache_ttl,
+    sqlite_path=settings.result_cache_sqlite_path,
+)
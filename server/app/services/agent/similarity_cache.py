@@ -0,0 +1,195 @@
+import hashlib
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+_FINGERPRINT_BITS = 64
+
+
+def normalize_for_similarity(text: str) -> str:
+    """
+    近似匹配用的规范化：NFKC 统一全角/半角、转小写，
+    去掉空白、标点和符号（含 emoji），只保留文字和数字。
+    """
+    s = unicodedata.normalize("NFKC", text or "").lower()
+    return "".join(ch for ch in s if unicodedata.category(ch)[0] in ("L", "N"))
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str, ngram: int = 2) -> int:
+    """字符 n-gram 的 64 位 SimHash；文本短于 n 时退化为单字"""
+    n = ngram if len(text) >= ngram else 1
+    total = len(text) - n + 1
+    if total <= 0:
+        return 0
+    # 把每个分片哈希写成定长二进制串后拼接，按步长切片统计每一位上 1 的个数，
+    # 逐位计数交给 C 层的 str.count，避免 Python 层 64 次循环/分片
+    bits = "".join(format(_shingle_hash(text[i:i + n]), "064b") for i in range(total))
+    fp = 0
+    for pos in range(_FINGERPRINT_BITS):
+        if bits[pos::_FINGERPRINT_BITS].count("1") * 2 > total:
+            fp |= 1 << (_FINGERPRINT_BITS - 1 - pos)
+    return fp
+
+
+@dataclass(slots=True)
+class _Entry:
+    scope: str
+    fingerprint: int
+    length: int
+    value: dict
+    expires_at: float
+
+
+class SimilarityCache:
+    """
+    近似重复输入缓存（与精确匹配的结果缓存并列）。
+    输入只差标点、全半角、emoji 或个别字词时，直接复用同一 scene/intent/tone 下最近的相似结果。
+    - 表示：规范化后的中文字符 n-gram SimHash（纯 CPU、无外部模型）
+    - 索引：把 64 位指纹切成 bands 段做 LSH 分桶，只比对与查询至少有一段相同的候选；
+      汉明距离小于 bands 时必然同桶（鸽巢原理），更大的距离按概率召回。
+      每次查询最多比对 max_candidates 个候选（最近写入优先），代价与总条数无关
+    - 校验：汉明距离换算的相似度 >= threshold，且规范化长度比 >= threshold
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.88,
+        max_candidates: int = 256,
+        bands: int = 6,
+        max_entries: int = 200_000,
+        ttl: float = 86400,
+        min_length: int = 6,
+        ngram: int = 2,
+    ):
+        self.threshold = threshold
+        self.max_candidates = max(1, max_candidates)
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.min_length = min_length
+        self.ngram = ngram
+
+        self.max_distance = max(0, int(round((1.0 - threshold) * _FINGERPRINT_BITS)))
+        n_bands = max(1, min(16, bands))
+        base, extra = divmod(_FINGERPRINT_BITS, n_bands)
+        self._bands: List[Tuple[int, int]] = []  # (shift, mask)
+        shift = 0
+        for i in range(n_bands):
+            width = base + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._buckets: Dict[Tuple[str, int, int], Dict[int, None]] = {}
+        self._next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def _band_keys(self, scope: str, fingerprint: int):
+        for i, (shift, mask) in enumerate(self._bands):
+            yield scope, i, (fingerprint >> shift) & mask
+
+    def _prepare(self, text: str) -> Optional[Tuple[int, int]]:
+        norm = normalize_for_similarity(text)
+        if len(norm) < self.min_length:
+            # 太短的输入 SimHash 不稳定，只走精确匹配
+            return None
+        return simhash(norm, self.ngram), len(norm)
+
+    def get(self, scope: str, text: str) -> Optional[dict]:
+        prepared = self._prepare(text)
+        if prepared is None:
+            self.skipped += 1
+            return None
+        fingerprint, length = prepared
+        now = time.time()
+
+        best: Optional[Tuple[int, int]] = None  # (distance, entry_id)
+        seen = 0
+        for band_key in self._band_keys(scope, fingerprint):
+            bucket = self._buckets.get(band_key)
+            if not bucket:
+                continue
+            # 最近写入的候选优先
+            for entry_id in reversed(bucket):
+                if seen >= self.max_candidates:
+                    break
+                seen += 1
+                entry = self._entries.get(entry_id)
+                if entry is None or entry.expires_at < now:
+                    continue
+                if min(length, entry.length) / max(length, entry.length) < self.threshold:
+                    continue
+                distance = (fingerprint ^ entry.fingerprint).bit_count()
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, entry_id)
+            if seen >= self.max_candidates:
+                break
+
+        if best is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best[1])
+        self.hits += 1
+        return self._entries[best[1]].value
+
+    def set(self, scope: str, text: str, value: dict) -> None:
+        prepared = self._prepare(text)
+        if prepared is None:
+            return
+        fingerprint, length = prepared
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(scope, fingerprint, length, value, time.time() + self.ttl)
+        for band_key in self._band_keys(scope, fingerprint):
+            self._buckets.setdefault(band_key, {})[entry_id] = None
+
+        while len(self._entries) > self.max_entries:
+            old_id, old = self._entries.popitem(last=False)
+            self._unlink(old_id, old)
+
+    def _unlink(self, entry_id: int, entry: _Entry) -> None:
+        for band_key in self._band_keys(entry.scope, entry.fingerprint):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.pop(entry_id, None)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "buckets": len(self._buckets),
+            "threshold": self.threshold,
+            "max_distance": self.max_distance,
+            "max_candidates": self.max_candidates,
+            "bands": len(self._bands),
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+similarity_cache: Optional[SimilarityCache] = (
+    SimilarityCache(
+        threshold=settings.similarity_cache_threshold,
+        max_candidates=settings.similarity_cache_candidates,
+        bands=settings.similarity_cache_bands,
+        max_entries=settings.similarity_cache_size,
+        ttl=settings.result_cache_ttl,
+    )
+    if settings.similarity_cache_enabled
+    else None
+)
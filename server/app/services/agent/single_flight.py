@@ -0,0 +1,80 @@
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, TypeVar
+
+from app.services.agent.result_cache import normalize_text
+
+T = TypeVar("T")
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 1
+
+
+class SingleFlight:
+    """
+    进行中请求合并（single-flight）。
+    相同键的并发调用只执行一次，后到的调用挂到同一个任务上，共享结果或异常。
+    - 共享任务用 asyncio.shield 等待：某个等待方断开（被取消）不会取消其他人正在等的调用
+    - 所有等待方都离开后才取消共享任务（同时移出表），不再为没人要的结果付费
+    - 任务结束即从表中移除，之后的同键请求会重新发起（结果复用交给结果缓存）
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    @staticmethod
+    def make_key(text: str, scene_id: str, intent_id: str, tone_id: str) -> str:
+        payload = json.dumps([normalize_text(text), scene_id, intent_id, tone_id], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.create_task(fn())
+            call = self._calls[key] = _Call(task)
+            task.add_done_callback(lambda _: self._forget(key, call))
+            self.leaders += 1
+        else:
+            call.waiters += 1
+            self.coalesced += 1
+
+        try:
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # 取消后任务还要做清理（关闭上游流、归还准入名额），先从表中移除，
+                # 这期间到达的同键请求发起新调用，而不是挂到正在取消的任务上
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+                self.abandoned += 1
+            raise
+
+    def _forget(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 没有等待方的任务异常已无人读取，这里取走避免 "exception was never retrieved" 告警
+        if not call.task.cancelled():
+            call.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "upstream_calls": self.leaders,
+            # 合并掉、因此省下的上游调用次数
+            "saved_calls": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+translate_flight = SingleFlight()
@@ -1,49 +1,327 @@
+import asyncio
 import json
-from app.workflows.workflow import app_graph
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
+from app.core.config import settings
+from app.core.context import RequestContext
+from app.core.rate_limit import rate_limiter, subject_of
+from app.core.write_behind import log_writer
+from app.enums.enums import BasicStatus
+from app.models.agent.reddit import RedditLog
+from app.models.content.cnt_generation_log import CntGenerationLog
+from app.models.content.cnt_rewrite_history import CntRewriteHistory
+from app.workflows.admission import Priority
+from app.workflows.config import LLM_QUEUE_TIMEOUT, provider_configs
+from app.workflows.runtime import ai_runtime
+from app.workflows.scenario_manager import scenario_manager
+from app.workflows.token_budget import estimate_tokens, token_budget
+from app.services.agent.result_cache import result_cache
+from app.services.agent.similarity_cache import similarity_cache
+from app.services.agent.single_flight import SingleFlight, translate_flight
+from app.services.agent.usage_counter import usage_counter
+
+logger = logging.getLogger(__name__)
+
+_PRIORITY_ROLES = frozenset(r.strip() for r in settings.admission_priority_roles.split(",") if r.strip())
+# 生成记录的 user_id 不可为空，匿名请求统一记为该值
+_ANONYMOUS_USER = "anonymous"
+
+@dataclass
+class _CacheLookup:
+    key: Optional[str] = None
+    similarity_scope: Optional[str] = None
+    hit: Optional[dict] = None
 
-# 假设你的 SQLAlchemy Session 依赖和 Model 放在这里
-# from sqlalchemy.ext.asyncio import AsyncSession
-# from app.models import TransferLog
 
 class StyleTransferService:
     """
     业务逻辑服务层
     职责: 负责接收 API 层数据，持久化到数据库 (DB)，并调用底层的 LangGraph 引擎。
     """
-    def __init__(self, db=None): # db: AsyncSession
+    def __init__(self, db=None, ctx: Optional[RequestContext] = None): # db: AsyncSession
         self.db = db
+        self.ctx = ctx
+
+    def _priority(self) -> Priority:
+        """上游 LLM 排队优先级：付费 / 管理员角色 > 登录用户 > 匿名"""
+        if not self.ctx or not self.ctx.is_authed:
+            return Priority.LOW
+        if _PRIORITY_ROLES.intersection(self.ctx.roles or []):
+            return Priority.HIGH
+        return Priority.NORMAL
+
+    def _graph_config(self, deadline: Optional[float] = None) -> dict:
+        return {"configurable": {"priority": self._priority(), "deadline": deadline}}
 
     async def translate(self, text: str, scene_id: str, intent_id: str, tone_id: str) -> dict:
-        # 1. TODO: 在此处写入数据库，状态为 PENDING
-        # log = TransferLog(input_text=text, status="PENDING")
-        # self.db.add(log); await self.db.commit()
+        # 排队截止时间从请求进入服务层开始计算
+        deadline = time.monotonic() + LLM_QUEUE_TIMEOUT
+        # 0. 确定性语气先查结果缓存，命中则不再调用上游 LLM
+        lookup = await self._cache_lookup(text, scene_id, intent_id, tone_id)
+        if lookup.hit is not None:
+            return self._wrap(text, scene_id, intent_id, tone_id, dict(lookup.hit), cached=True)
+
+        # 1. 记录 PENDING（异步攒批落库，不在请求路径上提交事务）
+        log_id = str(uuid.uuid4())
+        await log_writer.upsert(RedditLog, {"id": log_id, "input_text": text, "status": "PENDING"})
+        start = time.monotonic()
+
+        try:
+            # 2. 调用 LangGraph 引擎执行流转（相同请求并发时合并为一次执行）
+            output_dict, context = await self._generate(
+                text, scene_id, intent_id, tone_id, lookup, self._graph_config(deadline)
+            )
+        except Exception as e:
+            # 3. 记录 ERROR
+            await self._log_finish(log_id, text, scene_id, intent_id, tone_id, None, "", time.monotonic() - start, e)
+            raise e
+
+        # 3. 记录 DONE 及输出结果
+        await self._log_finish(log_id, text, scene_id, intent_id, tone_id, output_dict, context, time.monotonic() - start)
+        return self._wrap(text, scene_id, intent_id, tone_id, output_dict)
 
+    async def translate_stream(self, text: str, scene_id: str, intent_id: str, tone_id: str) -> AsyncIterator[dict]:
+        """
+        流式翻译：产出 {"event": "delta", "data": {"text": ...}}，最后产出 {"event": "done", "data": <同 translate 的返回>}。
+        缓存命中时直接产出 done。
+        """
+        deadline = time.monotonic() + LLM_QUEUE_TIMEOUT
+        lookup = await self._cache_lookup(text, scene_id, intent_id, tone_id)
+        if lookup.hit is not None:
+            yield {"event": "done", "data": self._wrap(text, scene_id, intent_id, tone_id, dict(lookup.hit), cached=True)}
+            return
+
+        # 与 translate 一致：先记录 PENDING，结束时更新为 DONE / ERROR
+        log_id: Optional[str] = str(uuid.uuid4())
+        await log_writer.upsert(RedditLog, {"id": log_id, "input_text": text, "status": "PENDING"})
+        start = time.monotonic()
+        context = ""
         try:
-            # 2. 调用 LangGraph 引擎执行流转
-            result = await app_graph.ainvoke({
+            workflow = await ai_runtime.load()
+            state = await workflow.prepare_graph.ainvoke({
                 "scene_id": scene_id,
                 "intent_id": intent_id,
                 "tone_id": tone_id,
                 "input_text": text
             })
+            context = state.get("few_shot_context", "")
+            async for item in workflow.stream_generate(state, self._priority(), deadline):
+                if "delta" in item:
+                    yield {"event": "delta", "data": {"text": item["delta"]}}
+                else:
+                    output_dict = item["final_output"]
+                    await self._cache_store(lookup, text, output_dict)
+                    # 生成已成功：之后写记录出错不再按失败重复记一次
+                    done_id, log_id = log_id, None
+                    await self._log_finish(
+                        done_id, text, scene_id, intent_id, tone_id, output_dict, context, time.monotonic() - start,
+                    )
+                    yield {"event": "done", "data": self._wrap(text, scene_id, intent_id, tone_id, output_dict)}
+        except Exception as e:
+            if log_id is not None:
+                await self._log_finish(log_id, text, scene_id, intent_id, tone_id, None, context, time.monotonic() - start, e)
+            raise
+
+    async def translate_batch(self, items: List[dict]) -> List[dict]:
+        """
+        批量翻译：items 为 [{text, scene_id, intent_id, tone_id}]，结果按输入顺序返回，逐条带状态。
+        - 同一场景三元组只准备一次执行计划；检索按每条输入文本单独进行（进程内索引，开销很小）
+        - 图调用受 batch_concurrency 信号量约束
+        - 单条失败只影响该条（status=ERROR），不影响整批
+        """
+        sem = asyncio.Semaphore(max(1, settings.batch_concurrency))
+        prepared: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        graph_config = self._graph_config()
+
+        async def run(item: dict) -> dict:
+            text, scene_id, intent_id, tone_id = item["text"], item["scene_id"], item["intent_id"], item["tone_id"]
+            log_id: Optional[str] = None
+            start = time.monotonic()
+            try:
+                lookup = await self._cache_lookup(text, scene_id, intent_id, tone_id)
+                if lookup.hit is not None:
+                    return self._wrap(text, scene_id, intent_id, tone_id, dict(lookup.hit), cached=True)
+
+                # 与 translate 一致：逐条记录 PENDING，结束时更新为 DONE / ERROR
+                log_id = str(uuid.uuid4())
+                await log_writer.upsert(RedditLog, {"id": log_id, "input_text": text, "status": "PENDING"})
+
+                # 同一场景三元组的执行计划（Prompt 获取 + 参数绑定 + 链组装）只准备一次
+                workflow = await ai_runtime.load()
+                key = (scene_id, intent_id, tone_id)
+                if key not in prepared:
+                    prepared[key] = asyncio.create_task(workflow.plan_cache.get(*key))
+                await prepared[key]
 
+                async with sem:
+                    # 批量条目已受信号量约束，排队截止时间使用准入控制的默认值
+                    start = time.monotonic()
+                    output_dict, context = await self._generate(text, scene_id, intent_id, tone_id, lookup, graph_config)
+                # 生成已成功：之后写记录出错不再按失败重复记一次
+                done_id, log_id = log_id, None
+                await self._log_finish(done_id, text, scene_id, intent_id, tone_id, output_dict, context, time.monotonic() - start)
+                return self._wrap(text, scene_id, intent_id, tone_id, output_dict)
+            except BizException as e:
+                if log_id is not None:
+                    await self._log_finish(log_id, text, scene_id, intent_id, tone_id, None, "", time.monotonic() - start, e)
+                return self._wrap_error(text, scene_id, intent_id, tone_id, e.code, e.msg)
+            except Exception as e:
+                logger.exception("batch item failed: %r", e)
+                if log_id is not None:
+                    await self._log_finish(log_id, text, scene_id, intent_id, tone_id, None, "", time.monotonic() - start, e)
+                return self._wrap_error(text, scene_id, intent_id, tone_id, ResponseCode._5050, ResponseCode._5050.msg)
+
+        return list(await asyncio.gather(*(run(item) for item in items)))
+
+    @staticmethod
+    def estimate_batch_tokens(items: List[dict]) -> int:
+        """批量请求的预估 token：每条输入 + 按预算规则给出的输出上限（不含检索示例），用于开始前检查当日额度"""
+        total = 0
+        for item in items:
+            try:
+                cap = scenario_manager.get_tone(item["scene_id"], item["intent_id"], item["tone_id"]).max_output_tokens
+            except LookupError:
+                # 场景不存在的条目不会调用上游，单条返回错误
+                continue
+            input_tokens = estimate_tokens(item["text"])
+            total += input_tokens + token_budget.output_tokens(input_tokens, cap)
+        return total
+
+    async def _generate(
+        self, text: str, scene_id: str, intent_id: str, tone_id: str, lookup: "_CacheLookup", config: dict
+    ) -> Tuple[dict, str]:
+        """
+        执行图并写缓存，返回 (输出, 检索到的 few-shot 上下文)。相同 (规范化文本, scene, intent, tone) 的并发请求共享同一次执行，
+        按先到请求的优先级排队；某个等待方断开不影响其他等待方。
+        """
+        async def run() -> Tuple[dict, str]:
+            workflow = await ai_runtime.load()
+            result = await workflow.app_graph.ainvoke({
+                "scene_id": scene_id,
+                "intent_id": intent_id,
+                "tone_id": tone_id,
+                "input_text": text
+            }, config=config)
             output_dict = result["final_output"]
+            await self._cache_store(lookup, text, output_dict)
+            return output_dict, result.get("few_shot_context") or ""
+
+        key = SingleFlight.make_key(text, scene_id, intent_id, tone_id)
+        return await translate_flight.do(key, run)
 
-            # 3. TODO: 更新数据库状态为 DONE，保存输出结果
-            # log.output_text = json.dumps(output_dict, ensure_ascii=False)
-            # log.status = "DONE"
-            # await self.db.commit()
+    async def _log_finish(
+        self,
+        log_id: Optional[str],
+        text: str,
+        scene_id: str,
+        intent_id: str,
+        tone_id: str,
+        output_dict: Optional[dict],
+        context: str,
+        latency: float,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """
+        写入调用结果：翻译记录（log_id 不为空时更新 PENDING 那一行）、生成记录，登录用户成功时再写改写历史。
+        全部进入 write-behind 队列；检索上下文、最终 Prompt 按采样率保留全文。成功时累加当日用量。
+        """
+        output_text = json.dumps(output_dict, ensure_ascii=False) if output_dict is not None else None
+        authed = bool(self.ctx and self.ctx.is_authed)
+        user_id = self.ctx.user_id if authed else _ANONYMOUS_USER
+        tokens_in, tokens_out = estimate_tokens(text) + estimate_tokens(context), estimate_tokens(output_text or "")
+        latency_ms = int(latency * 1000)
 
-            return {
-                "scene": scene_id,
-                "intent": intent_id,
-                "tone": tone_id,
+        if log_id is not None:
+            await log_writer.upsert(RedditLog, {
+                "id": log_id,
                 "input_text": text,
-                "output_data": output_dict,
-                "status": "DONE"
-            }
+                "output_text": output_text,
+                "style_refs": [context] if context else None,
+                "status": "ERROR" if error else "DONE",
+            }, sampled_fields=("style_refs",))
 
-        except Exception as e:
-            # TODO: 更新数据库状态为 ERROR
-            # log.status = "ERROR"; await self.db.commit()
-            raise e
\ No newline at end of file
+        await log_writer.insert(CntGenerationLog, {
+            "user_id": user_id,
+            "feature_code": f"{scene_id}.{intent_id}"[:64],
+            "tone_id": tone_id[:32],
+            "input_text": text,
+            "context_text": context or None,
+            "output_text": output_text,
+            # 对冲时实际应答的可能是备用供应商，这里记主供应商的模型
+            "model_name": provider_configs()[0].get("model"),
+            "tokens_in": tokens_in,
+            "tokens_out": tokens_out,
+            "cost_cents": 0,
+            "latency_ms": latency_ms,
+            "status": BasicStatus.DISABLE if error else BasicStatus.ENABLE,
+            "remark": repr(error)[:255] if error else None,
+        }, sampled_fields=("context_text",))
+
+        if error is None and self.ctx is not None:
+            # 当日用量：限流器共享计数（所有 worker 可见）+ 登录用户落库
+            rate_limiter.add_usage(subject_of(self.ctx), tokens_in + tokens_out)
+        if authed and error is None:
+            usage_counter.record(user_id, tokens=tokens_in + tokens_out)
+            workflow = await ai_runtime.load()
+            plan = await workflow.plan_cache.get(scene_id, intent_id, tone_id)
+            await log_writer.insert(CntRewriteHistory, {
+                "user_id": user_id,
+                "scenario_code": f"{scene_id}.{intent_id}.{tone_id}"[:64],
+                "input_text": text,
+                # 最终 Prompt 只在采样命中时渲染
+                "prompt": lambda: plan.prompt.format(few_shot_context=context, input_text=text),
+                "output_text": output_text,
+                "usage": {"tokens_in": tokens_in, "tokens_out": tokens_out, "latency_ms": latency_ms},
+            }, sampled_fields=("prompt",))
+
+    async def _cache_lookup(self, text: str, scene_id: str, intent_id: str, tone_id: str) -> "_CacheLookup":
+        # 同时完成场景三元组校验：ID 不存在直接抛 ScenarioNotFoundError
+        tone = scenario_manager.get_tone(scene_id, intent_id, tone_id)
+        lookup = _CacheLookup()
+        if not tone.cacheable:
+            return lookup
+        version = scenario_manager.version
+        lookup.key = result_cache.make_key(text, scene_id, intent_id, tone_id, tone.llm_params, version)
+        lookup.hit = await result_cache.get(lookup.key)
+        if lookup.hit is None and similarity_cache is not None:
+            # 精确未命中时再查近似重复输入（同一场景三元组 + 同一配置版本内）
+            lookup.similarity_scope = f"{scene_id}/{intent_id}/{tone_id}@{version}"
+            lookup.hit = similarity_cache.get(lookup.similarity_scope, text)
+        return lookup
+
+    @staticmethod
+    async def _cache_store(lookup: "_CacheLookup", text: str, output_dict: dict) -> None:
+        if lookup.key is not None:
+            await result_cache.set(lookup.key, output_dict)
+        if lookup.similarity_scope is not None:
+            similarity_cache.set(lookup.similarity_scope, text, output_dict)
+
+    @staticmethod
+    def _wrap(text: str, scene_id: str, intent_id: str, tone_id: str, output_dict: dict, cached: bool = False) -> dict:
+        return {
+            "scene": scene_id,
+            "intent": intent_id,
+            "tone": tone_id,
+            "input_text": text,
+            "output_data": output_dict,
+            "status": "DONE",
+            "cached": cached
+        }
+
+    @staticmethod
+    def _wrap_error(text: str, scene_id: str, intent_id: str, tone_id: str, code: ResponseCode, msg: Optional[str]) -> dict:
+        return {
+            "scene": scene_id,
+            "intent": intent_id,
+            "tone": tone_id,
+            "input_text": text,
+            "output_data": None,
+            "status": "ERROR",
+            "cached": False,
+            "error": {"code": code.code, "message": msg or code.msg}
+        }
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.content.cnt_daily_usage import CntDailyUsage
+
+logger = logging.getLogger(__name__)
+
+UsageKey = Tuple[str, str]  # (user_id, yyyymmdd)
+
+
+def today() -> str:
+    return time.strftime("%Y%m%d")
+
+
+class UsageCounter:
+    """
+    每日用量计数（CntDailyUsage）。
+    - 请求路径只累加进程内的增量，不读写数据库
+    - 后台按 flush_interval 把增量以一条多行 INSERT … ON CONFLICT DO UPDATE（累加）写入；
+      某个用户的未落库增量超过 max_delta_requests / max_delta_tokens 时提前触发
+    - 查询当日用量 = 数据库已有值（按 flush_interval 缓存）+ 本进程未落库 / 正在落库的增量（限流器合并已有值时使用）
+    - 关闭时把剩余增量全部写完
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        flush_interval: float = 5.0,
+        max_delta_requests: int = 50,
+        max_delta_tokens: int = 20000,
+    ):
+        self._session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.max_delta_requests = max_delta_requests
+        self.max_delta_tokens = max_delta_tokens
+
+        self._pending: Dict[UsageKey, List[int]] = {}
+        self._flushing: Dict[UsageKey, List[int]] = {}
+        # 数据库已有值的缓存：key -> (requests, tokens, 读取时间)
+        self._persisted: Dict[UsageKey, Tuple[int, int, float]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._lock = asyncio.Lock()
+        self._dialect: Optional[str] = None
+
+        self.flushes = 0
+        self.flushed_keys = 0
+        self.failed_flushes = 0
+        self.early_flushes = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="usage-counter")
+
+    async def close(self) -> None:
+        """停止后台任务并写完剩余增量（不取消正在进行的写入，避免丢计数）"""
+        if self._task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def record(self, user_id: str, requests: int = 1, tokens: int = 0, day: Optional[str] = None) -> None:
+        key = (user_id, day or today())
+        delta = self._pending.get(key)
+        if delta is None:
+            delta = self._pending[key] = [0, 0]
+        delta[0] += requests
+        delta[1] += tokens
+        if self._wakeup is not None and not self._wakeup.is_set() and (
+            delta[0] >= self.max_delta_requests or delta[1] >= self.max_delta_tokens
+        ):
+            self.early_flushes += 1
+            self._wakeup.set()
+
+    async def usage(self, user_id: str, day: Optional[str] = None) -> Tuple[int, int]:
+        """当日 (请求数, token 数)：数据库已有值 + 本进程尚未落库的增量"""
+        key = (user_id, day or today())
+        cached = self._persisted.get(key)
+        if cached is None or time.monotonic() - cached[2] > self.flush_interval:
+            # 与 flush 互斥：否则读到刚提交的批次时 _flushing 里仍有同一批增量，
+            # flush 成功后又会把它加到这里刚缓存的值上，重复计数
+            async with self._lock:
+                async with self._session_factory() as session:
+                    row = (await session.execute(
+                        select(CntDailyUsage.requests, CntDailyUsage.tokens).where(
+                            CntDailyUsage.user_id == key[0], CntDailyUsage.yyyymmdd == key[1]
+                        )
+                    )).first()
+                cached = (row[0], row[1], time.monotonic()) if row else (0, 0, time.monotonic())
+                self._persisted[key] = cached
+        requests, tokens = cached[0], cached[1]
+        for deltas in (self._pending, self._flushing):
+            delta = deltas.get(key)
+            if delta:
+                requests += delta[0]
+                tokens += delta[1]
+        return requests, tokens
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            self._prune_persisted()
+            if not self._pending:
+                return
+            self._flushing, self._pending = self._pending, {}
+            batch = self._flushing
+            try:
+                await self._write(batch)
+            except Exception as e:
+                # 写失败：增量放回去，下次一起写
+                self.failed_flushes += 1
+                logger.exception("usage counter flush of %d keys failed: %r", len(batch), e)
+                for key, (requests, tokens) in batch.items():
+                    delta = self._pending.setdefault(key, [0, 0])
+                    delta[0] += requests
+                    delta[1] += tokens
+            else:
+                self.flushes += 1
+                self.flushed_keys += len(batch)
+                for key, (requests, tokens) in batch.items():
+                    cached = self._persisted.get(key)
+                    if cached is not None:
+                        self._persisted[key] = (cached[0] + requests, cached[1] + tokens, cached[2])
+            finally:
+                self._flushing = {}
+
+    def _prune_persisted(self) -> None:
+        """丢掉非当日、或已过缓存期（下次查询本来就会重读）的数据库已有值，避免常驻进程里无限增长"""
+        day, expire = today(), time.monotonic() - self.flush_interval
+        stale = [key for key, cached in self._persisted.items() if key[1] != day or cached[2] < expire]
+        for key in stale:
+            del self._persisted[key]
+
+    async def _write(self, batch: Dict[UsageKey, List[int]]) -> None:
+        rows = [
+            {"id": str(uuid.uuid4()), "user_id": user_id, "yyyymmdd": day, "requests": requests, "tokens": tokens}
+            for (user_id, day), (requests, tokens) in batch.items()
+        ]
+        table = CntDailyUsage.__table__
+        async with self._session_factory() as session:
+            async with session.begin():
+                if self._dialect is None:
+                    self._dialect = session.bind.dialect.name
+                if self._dialect in ("sqlite", "postgresql"):
+                    if self._dialect == "sqlite":
+                        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+                    else:
+                        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+                    stmt = dialect_insert(CntDailyUsage).values(rows)
+                    await session.execute(stmt.on_conflict_do_update(
+                        index_elements=["user_id", "yyyymmdd"],
+                        set_={
+                            "requests": table.c.requests + stmt.excluded.requests,
+                            "tokens": table.c.tokens + stmt.excluded.tokens,
+                            "updated_at": func.now(),
+                        },
+                    ))
+                elif self._dialect in ("mysql", "mariadb"):
+                    from sqlalchemy.dialects.mysql import insert as dialect_insert
+
+                    stmt = dialect_insert(CntDailyUsage).values(rows)
+                    await session.execute(stmt.on_duplicate_key_update(
+                        requests=table.c.requests + stmt.inserted.requests,
+                        tokens=table.c.tokens + stmt.inserted.tokens,
+                        updated_at=func.now(),
+                    ))
+                else:
+                    # 其它数据库：逐行先累加，没有命中再插入
+                    for row in rows:
+                        result = await session.execute(
+                            update(CntDailyUsage)
+                            .where(CntDailyUsage.user_id == row["user_id"], CntDailyUsage.yyyymmdd == row["yyyymmdd"])
+                            .values(requests=CntDailyUsage.requests + row["requests"],
+                                    tokens=CntDailyUsage.tokens + row["tokens"])
+                        )
+                        if result.rowcount == 0:
+                            session.add(CntDailyUsage(**row))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "pending_keys": len(self._pending),
+            "pending_requests": sum(d[0] for d in self._pending.values()),
+            "pending_tokens": sum(d[1] for d in self._pending.values()),
+            "cached_keys": len(self._persisted),
+            "flushes": self.flushes,
+            "early_flushes": self.early_flushes,
+            "flushed_keys": self.flushed_keys,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+usage_counter = UsageCounter(
+    AsyncSessionLocal,
+    flush_interval=settings.usage_flush_interval,
+    max_delta_requests=settings.usage_max_delta_requests,
+    max_delta_tokens=settings.usage_max_delta_tokens,
+)
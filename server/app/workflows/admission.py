@@ -0,0 +1,219 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
+from app.workflows.config import (
+    LLM_CONCURRENCY_INITIAL,
+    LLM_CONCURRENCY_MIN,
+    LLM_CONCURRENCY_MAX,
+    LLM_QUEUE_SIZE,
+    LLM_QUEUE_TIMEOUT,
+    LLM_LATENCY_TOLERANCE,
+)
+
+logger = logging.getLogger(__name__)
+
+# 上游明确表示过载 / 限流的状态码
+_OVERLOAD_STATUS = (429, 503, 529)
+
+
+class Priority(IntEnum):
+    """排队优先级，数值越小越先放行"""
+    HIGH = 0     # 付费 / 管理员
+    NORMAL = 1   # 登录用户
+    LOW = 2      # 匿名
+
+
+class AdmissionRejected(BizException):
+    """排队已满被拒绝，或在截止时间前没有等到执行名额"""
+
+    def __init__(self, msg: Optional[str] = None):
+        super().__init__(ResponseCode._5031, msg)
+
+
+def _is_overload(exc: BaseException) -> bool:
+    # 异常来自 LLM 调用时 openai 早已加载，这里导入不产生额外开销，也避免本模块导入时拉起整个 SDK
+    from openai import APIStatusError, APITimeoutError
+
+    if isinstance(exc, APITimeoutError):
+        return True
+    return isinstance(exc, APIStatusError) and exc.status_code in _OVERLOAD_STATUS
+
+
+class AdmissionController:
+    """
+    上游 LLM 调用的准入控制。
+    - 自适应并发上限（AIMD）：并发打满且延迟正常时每个 RTT 加 1；
+      上游 429/503/超时，或短期延迟超过长期基线 latency_tolerance 倍时乘性下降（冷却期内只降一次）
+    - 有界等待队列：按优先级 + 先来后到放行；队列满时新请求优先级更高则挤掉队尾最低优先级的请求，否则立即拒绝
+    - 截止时间：排队超过 deadline 直接失败，不占用事件循环
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 64,
+        max_queue: int = 128,
+        queue_timeout: float = 15.0,
+        latency_tolerance: float = 2.0,
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.latency_tolerance = latency_tolerance
+
+        self._in_flight = 0
+        # 堆元素：[priority, seq, future]；被取消 / 挤掉的 future 已 done，出堆时跳过
+        self._heap: List[list] = []
+        self._waiting = 0
+        self._seq = itertools.count()
+
+        self._latency_ewma: Optional[float] = None
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.throttled = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = Priority.NORMAL, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        获取一个执行名额，退出时归还并根据本次耗时 / 异常调整并发上限。
+        deadline 为 time.monotonic() 时间戳；为空时使用默认排队超时。
+        """
+        await self._acquire(priority, deadline)
+        start = time.monotonic()
+        outcome = "ok"
+        try:
+            yield
+        except BaseException as e:
+            outcome = "overload" if _is_overload(e) else "error"
+            raise
+        finally:
+            self._release(time.monotonic() - start, outcome)
+
+    async def _acquire(self, priority: int, deadline: Optional[float]) -> None:
+        if self._in_flight < self.limit and not self._waiting:
+            self._in_flight += 1
+            self.admitted += 1
+            return
+
+        now = time.monotonic()
+        if deadline is None:
+            deadline = now + self.queue_timeout
+        if deadline <= now:
+            self.expired += 1
+            raise AdmissionRejected("请求排队超时，请稍后重试")
+        if self._waiting >= self.max_queue:
+            self._evict_for(priority)
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, [int(priority), next(self._seq), fut])
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), deadline - now)
+        except asyncio.TimeoutError:
+            if not fut.done():
+                fut.cancel()
+                self._waiting -= 1
+                self.expired += 1
+                raise AdmissionRejected("请求排队超时，请稍后重试") from None
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                # 名额已分配但调用方被取消：归还名额，不计入延迟统计
+                self._in_flight -= 1
+                self._wake()
+            elif not fut.done():
+                fut.cancel()
+                self._waiting -= 1
+            raise
+        # 被挤出队列时 future 带着 AdmissionRejected
+        fut.result()
+
+    def _evict_for(self, priority: int) -> None:
+        """队列已满：挤掉优先级最低、最晚到的等待者；没有更低优先级的则拒绝当前请求"""
+        worst = max((w for w in self._heap if not w[2].done()), key=lambda w: (w[0], w[1]), default=None)
+        if worst is None or worst[0] <= priority:
+            self.shed += 1
+            raise AdmissionRejected()
+        worst[2].set_exception(AdmissionRejected())
+        self._waiting -= 1
+        self.shed += 1
+
+    def _wake(self) -> None:
+        while self._heap and self._in_flight < self.limit:
+            _, _, fut = heapq.heappop(self._heap)
+            if fut.done():
+                continue
+            self._waiting -= 1
+            self._in_flight += 1
+            self.admitted += 1
+            fut.set_result(None)
+
+    def _release(self, latency: float, outcome: str) -> None:
+        saturated = self._in_flight >= self.limit
+        self._in_flight -= 1
+        now = time.monotonic()
+
+        if outcome == "overload":
+            self.throttled += 1
+            self._decrease(now, 0.7)
+        elif outcome == "ok":
+            # 短期 EWMA 反映当前延迟，长期 EWMA 作为基线；LLM 单次耗时随输出长度波动大，不宜用最小值做基线
+            self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+            self._baseline = latency if self._baseline is None else 0.98 * self._baseline + 0.02 * latency
+            if self._latency_ewma > self._baseline * self.latency_tolerance:
+                self._decrease(now, 0.9)
+            elif saturated:
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+
+        self._wake()
+
+    def _decrease(self, now: float, factor: float) -> None:
+        # 冷却期（一个基线 RTT，至少 1 秒）内只降一次，避免同一波失败把上限打到底
+        if now - self._last_decrease < max(1.0, self._baseline or 0.0):
+            return
+        self._last_decrease = now
+        old = self.limit
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        if self.limit != old:
+            logger.info("LLM concurrency limit %d -> %d", old, self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "queued": self._waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "expired": self.expired,
+            "throttled": self.throttled,
+            "latency_ewma_ms": round(self._latency_ewma * 1000, 1) if self._latency_ewma is not None else None,
+            "baseline_ms": round(self._baseline * 1000, 1) if self._baseline is not None else None,
+        }
+
+
+llm_admission = AdmissionController(
+    initial_limit=LLM_CONCURRENCY_INITIAL,
+    min_limit=LLM_CONCURRENCY_MIN,
+    max_limit=LLM_CONCURRENCY_MAX,
+    max_queue=LLM_QUEUE_SIZE,
+    queue_timeout=LLM_QUEUE_TIMEOUT,
+    latency_tolerance=LLM_LATENCY_TOLERANCE,
+)
@@ -1,6 +1,6 @@
+import json
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
 
 # 1. 必须先运行这一行，才能把 .env 里的变量注入到系统环境
 load_dotenv()
@@ -8,15 +8,145 @@ load_dotenv()
 # 2. 从环境变量读取你的 Key
 # 注意：确保变量名与 .env 文件中 sk-xxxx 前面的那个名字完全一模一样
 api_key = os.getenv("SILICONFLOW_API_KEY")
+LLM_API_BASE = "https://api.siliconflow.cn/v1"
 
-# 3. 增加一个简单的断言，如果没读到 Key，直接报错提醒，而不是让 LangChain 崩溃
-if not api_key:
-    raise ValueError("❌ 错误：环境变量 SILICONFLOW_API_KEY 为空，请检查 .env 文件内容和路径！")
-
-# 4. 初始化 LLM
-llm = ChatOpenAI(
-    model="deepseek-ai/DeepSeek-V3",
-    openai_api_key=api_key, # 这里必须确保传入的是有效的字符串
-    openai_api_base="https://api.siliconflow.cn/v1",
-    max_tokens=1024
-)
\ No newline at end of file
+# 3. 上游请求走共享连接池（连接数 / keep-alive 过期(秒) / HTTP2 / 建连与读超时(秒) / DNS 缓存 TTL(秒)），
+#    预热阶段建立 LLM_HTTP_PREWARM 条连接、退出时关闭；与 LLM 一样首次使用时才创建（需要导入 httpx）
+#    代理：LLM_HTTP_PROXY 显式指定（http(s):// 或 socks5://），为空时按 HTTP(S)_PROXY / NO_PROXY 环境变量（LLM_HTTP_TRUST_ENV=false 关闭）
+LLM_HTTP_PREWARM = int(os.getenv("LLM_HTTP_PREWARM", "1"))
+_llm_http = None
+
+
+def get_llm_http():
+    global _llm_http
+    if _llm_http is None:
+        from app.workflows.http_pool import LLMHttpPool
+
+        _llm_http = LLMHttpPool(
+            max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+            keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60")),
+            http2=os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes"),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "60")),
+            dns_ttl=float(os.getenv("LLM_DNS_TTL", "300")),
+            proxy=os.getenv("LLM_HTTP_PROXY", ""),
+            trust_env=os.getenv("LLM_HTTP_TRUST_ENV", "true").lower() in ("1", "true", "yes"),
+        )
+    return _llm_http
+
+
+# 4. 初始化 LLM：供应商池（OpenAI 兼容接口），按权重 + 实时首 token 延迟 / 错误率路由，
+#    主供应商超过首 token 延迟分位数仍无输出时对冲到备用供应商，先出首 token 者胜出。
+#    LLM_PROVIDERS 为 JSON 数组：[{"name", "base_url", "model", "api_key" | "api_key_env", "weight"}]，为空时只用 SiliconFlow。
+#    首次使用时才导入 langchain_openai 并创建客户端，导入本模块不再拖慢启动 / MCP 子进程
+LLM_PROVIDERS = os.getenv("LLM_PROVIDERS", "")
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.3"))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "2.0"))
+LLM_PROVIDER_COOLDOWN = float(os.getenv("LLM_PROVIDER_COOLDOWN", "30"))
+_llm_pool = None
+_llm = None
+
+
+def provider_configs() -> list:
+    if LLM_PROVIDERS.strip():
+        return json.loads(LLM_PROVIDERS)
+    return [{
+        "name": "siliconflow",
+        "base_url": LLM_API_BASE,
+        "model": "deepseek-ai/DeepSeek-V3",
+        "api_key_env": "SILICONFLOW_API_KEY",
+    }]
+
+
+def get_llm_pool():
+    global _llm_pool
+    if _llm_pool is None:
+        from langchain_openai import ChatOpenAI
+        from app.workflows.providers import Provider, ProviderPool, ProviderSpec
+
+        specs = [ProviderSpec.from_dict(raw) for raw in provider_configs()]
+        # 没读到 Key 直接报错提醒，而不是让 LangChain 崩溃
+        for spec in specs:
+            if not spec.api_key:
+                raise ValueError(f"❌ 错误：LLM 供应商 {spec.name} 的 API Key 为空，请检查 .env 文件内容和路径！")
+
+        llm_http = get_llm_http()
+        providers = [
+            Provider(spec, ChatOpenAI(
+                model=spec.model,
+                openai_api_key=spec.api_key, # 这里必须确保传入的是有效的字符串
+                openai_api_base=spec.base_url,
+                max_tokens=LLM_MAX_OUTPUT_TOKENS,
+                http_async_client=llm_http.client,
+                # ChatOpenAI 会把自己的 timeout 逐请求传给 SDK，覆盖客户端上的设置，这里显式保持一致
+                timeout=llm_http.timeout,
+                # 失败由供应商池切换 / 对冲处理，SDK 内部不再重试
+                max_retries=0 if len(specs) > 1 else 2,
+            ))
+            for spec in specs
+        ]
+        _llm_pool = ProviderPool(
+            providers,
+            hedge_enabled=LLM_HEDGE_ENABLED,
+            hedge_percentile=LLM_HEDGE_PERCENTILE,
+            hedge_min_delay=LLM_HEDGE_MIN_DELAY,
+            hedge_default_delay=LLM_HEDGE_DEFAULT_DELAY,
+            cooldown=LLM_PROVIDER_COOLDOWN,
+        )
+    return _llm_pool
+
+
+def get_llm():
+    global _llm
+    if _llm is None:
+        from app.workflows.providers import HedgedChatModel
+
+        _llm = HedgedChatModel(pool=get_llm_pool())
+    return _llm
+
+
+def llm_pool_stats():
+    """供应商池尚未创建（AI 栈未加载）时返回 None，不为了统计触发加载"""
+    return _llm_pool.stats() if _llm_pool is not None else None
+
+
+# 5. MCP 服务端进程配置：通过 stdio 协议启动常驻服务进程
+MCP_SERVERS = {
+    "style_server": {
+        "command": "python",
+        "args": ["-m", "app.workflows.mcp_server"],
+        "transport": "stdio"
+    }
+}
+
+# 6. 工具调用传输方式："stdio" 走 MCP 协议 + 常驻子进程；"inproc" 同进程直接调用 FastMCP 实例
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio").lower()
+
+# 7. MCP 会话池：常驻进程数量、健康检查间隔(秒)、单次工具调用超时(秒)
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+MCP_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "30"))
+
+
+# 8. scenarios.json 热加载轮询间隔(秒)，0 表示关闭
+SCENARIO_WATCH_INTERVAL = float(os.getenv("SCENARIO_WATCH_INTERVAL", "2"))
+
+# 9. 上游 LLM 准入控制：自适应并发上限（初始 / 下限 / 上限）、等待队列长度、默认排队超时(秒)、
+#    短期延迟超过长期基线多少倍视为拥塞
+LLM_CONCURRENCY_INITIAL = int(os.getenv("LLM_CONCURRENCY_INITIAL", "16"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "2"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "64"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "128"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "15"))
+LLM_LATENCY_TOLERANCE = float(os.getenv("LLM_LATENCY_TOLERANCE", "2.0"))
+
+# 10. token 预算：默认输出上限（语气 / 意图可用 max_output_tokens 覆盖）、输出下限、
+#     按输入估算输出（base + ratio × 输入 token）、Prompt 总预算（模板 + 输入 + few-shot 示例）
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "1024"))
+LLM_MIN_OUTPUT_TOKENS = int(os.getenv("LLM_MIN_OUTPUT_TOKENS", "192"))
+LLM_OUTPUT_BASE_TOKENS = int(os.getenv("LLM_OUTPUT_BASE_TOKENS", "96"))
+LLM_OUTPUT_RATIO = float(os.getenv("LLM_OUTPUT_RATIO", "3.0"))
+LLM_PROMPT_BUDGET = int(os.getenv("LLM_PROMPT_BUDGET", "3000"))
@@ -0,0 +1,244 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.workflows.search_engine import DEFAULT_DIM, HybridIndex, Segment
+
+logger = logging.getLogger(__name__)
+
+# 语料库根目录，每个 collection_name 一个子目录
+CORPUS_DIR = Path(os.getenv("CORPUS_DIR") or Path(__file__).resolve().parents[2] / "data" / "corpora")
+
+_MANIFEST = "manifest.json"
+_FORMAT = 1
+# 除检索索引外，每个 Segment 额外保存的列：原始输入、预渲染示例（变长字符串 = 偏移 + blob）、去重摘要
+_TEXT_COLUMNS = ("input", "render")
+
+
+def render_example(input_text: str, output: Mapping) -> str:
+    """few-shot 示例的固定渲染格式，入库时预渲染，请求期直接拼接"""
+    return f"Input: {input_text}\nOutput: {json.dumps(dict(output), ensure_ascii=False)}"
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _pack(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class _StoredSegment:
+    """一个已落盘的 Segment：所有数组都以只读 mmap 打开，多进程共享同一份页缓存"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in Segment.ARRAYS}
+        self.segment = Segment(**arrays)
+        self._columns = {
+            name: (np.load(path / f"{name}_off.npy", mmap_mode="r"), np.load(path / f"{name}_blob.npy", mmap_mode="r"))
+            for name in _TEXT_COLUMNS
+        }
+        self.digest = np.load(path / "digest.npy", mmap_mode="r")
+
+    def text(self, column: str, i: int) -> str:
+        offsets, blob = self._columns[column]
+        return bytes(blob[int(offsets[i]):int(offsets[i + 1])]).decode("utf-8")
+
+    @staticmethod
+    def write(path: Path, inputs: List[str], renders: List[str], dim: int) -> None:
+        """先写临时目录再整体改名，读端永远看不到写了一半的 Segment"""
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        segment = Segment.build(inputs, dim)
+        for name in Segment.ARRAYS:
+            np.save(tmp / f"{name}.npy", getattr(segment, name))
+        for name, strings in zip(_TEXT_COLUMNS, (inputs, renders)):
+            offsets, blob = _pack(strings)
+            np.save(tmp / f"{name}_off.npy", offsets)
+            np.save(tmp / f"{name}_blob.npy", blob)
+        np.save(tmp / "digest.npy", np.array([_digest(t) for t in inputs], dtype=np.uint64))
+        os.replace(tmp, path)
+
+
+class CorpusStore:
+    """
+    单个 collection 的磁盘列式语料库。
+    目录结构：manifest.json + 若干不可变 Segment 目录（seg-000001/ ...），每个 Segment 内为 .npy 列：
+    - 检索索引：倒排表（CSR）、文档长度、按维度转置的哈希向量
+    - 文本列：原始输入、预渲染的 "Input/Output" 示例（偏移数组 + UTF-8 blob）
+    - digest：输入文本摘要，追加写入时去重
+    追加只新增 Segment 并原子替换 manifest；读端以 mmap 打开，manifest 变化后只加载新增的 Segment。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.index = HybridIndex([])
+        self._segments: List[_StoredSegment] = []
+        self._bases: List[int] = [0]
+        self._manifest_mtime_ns = 0
+        self._last_check = 0.0
+
+    @staticmethod
+    def path_for(collection_name: str, root: Optional[Path] = None) -> Path:
+        return Path(root or CORPUS_DIR) / collection_name
+
+    @property
+    def size(self) -> int:
+        return self.index.size
+
+    # ----------------------------
+    # 读端
+    # ----------------------------
+    def _read_manifest(self) -> Dict[str, Any]:
+        manifest_path = self.path / _MANIFEST
+        if not manifest_path.exists():
+            return {"format": _FORMAT, "dim": DEFAULT_DIM, "segments": []}
+        return json.loads(manifest_path.read_text("utf-8"))
+
+    def reload(self) -> bool:
+        """manifest 有变化时重新打开，已打开的 Segment 直接复用；返回是否发生了变化"""
+        try:
+            mtime_ns = (self.path / _MANIFEST).stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = 0
+        if mtime_ns == self._manifest_mtime_ns:
+            return False
+
+        opened = {seg.path.name: seg for seg in self._segments}
+        segments = [
+            opened.get(meta["name"]) or _StoredSegment(self.path / meta["name"])
+            for meta in self._read_manifest()["segments"]
+        ]
+        bases = [0]
+        for seg in segments:
+            bases.append(bases[-1] + seg.segment.size)
+        # 整体替换，正在查询的请求仍持有旧索引
+        self._segments, self._bases = segments, bases
+        self.index = HybridIndex([seg.segment for seg in segments])
+        self._manifest_mtime_ns = mtime_ns
+        return True
+
+    def refresh_if_stale(self, min_interval: float = 2.0) -> None:
+        if time.monotonic() - self._last_check < min_interval:
+            return
+        self._last_check = time.monotonic()
+        try:
+            if self.reload():
+                logger.info("corpus %s loaded: %d segments, %d docs", self.path.name, len(self._segments), self.size)
+        except Exception as e:
+            logger.warning("corpus %s reload failed, keep %d docs: %r", self.path.name, self.size, e)
+
+    def _locate(self, i: int) -> Tuple[_StoredSegment, int]:
+        s = int(np.searchsorted(self._bases, i, side="right")) - 1
+        return self._segments[s], i - self._bases[s]
+
+    def input(self, i: int) -> str:
+        seg, local = self._locate(i)
+        return seg.text("input", local)
+
+    def rendered(self, i: int) -> str:
+        seg, local = self._locate(i)
+        return seg.text("render", local)
+
+    # ----------------------------
+    # 写端
+    # ----------------------------
+    @contextmanager
+    def _write_lock(self) -> Iterator[None]:
+        """跨进程写锁：同一 collection 同时只允许一个写入方"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest["count"] = sum(meta["count"] for meta in manifest["segments"])
+        tmp = self.path / (_MANIFEST + ".tmp")
+        tmp.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), "utf-8")
+        os.replace(tmp, self.path / _MANIFEST)
+
+    def _next_segment_name(self, manifest: Dict[str, Any]) -> str:
+        last = max((int(meta["name"].split("-")[1]) for meta in manifest["segments"]), default=0)
+        return f"seg-{last + 1:06d}"
+
+    def append(self, records: Iterable[Mapping], segment_size: int = 50000) -> Tuple[int, int]:
+        """
+        流式追加 {"input": str, "output": {...}} 记录，每 segment_size 条落一个新 Segment。
+        与库中已有（及本批前面）输入完全相同的记录跳过。返回 (新增条数, 跳过条数)。
+        """
+        added = skipped = 0
+        with self._write_lock():
+            manifest = self._read_manifest()
+            dim = int(manifest.get("dim", DEFAULT_DIM))
+            seen = set()
+            for meta in manifest["segments"]:
+                seen.update(np.load(self.path / meta["name"] / "digest.npy").tolist())
+
+            inputs: List[str] = []
+            renders: List[str] = []
+
+            def flush() -> None:
+                name = self._next_segment_name(manifest)
+                _StoredSegment.write(self.path / name, inputs, renders, dim)
+                manifest["segments"].append({"name": name, "count": len(inputs)})
+                self._write_manifest(manifest)
+                inputs.clear()
+                renders.clear()
+
+            for record in records:
+                text = record["input"]
+                h = _digest(text)
+                if h in seen:
+                    skipped += 1
+                    continue
+                seen.add(h)
+                inputs.append(text)
+                renders.append(render_example(text, record["output"]))
+                added += 1
+                if len(inputs) >= segment_size:
+                    flush()
+            if inputs:
+                flush()
+        return added, skipped
+
+    def compact(self) -> int:
+        """把全部 Segment 合并为一个（追加次数多、Segment 过碎时执行），返回合并后的条数"""
+        with self._write_lock():
+            manifest = self._read_manifest()
+            old = [meta["name"] for meta in manifest["segments"]]
+            if len(old) <= 1:
+                return sum(meta["count"] for meta in manifest["segments"])
+
+            inputs: List[str] = []
+            renders: List[str] = []
+            for name in old:
+                seg = _StoredSegment(self.path / name)
+                for i in range(seg.segment.size):
+                    inputs.append(seg.text("input", i))
+                    renders.append(seg.text("render", i))
+
+            name = self._next_segment_name(manifest)
+            _StoredSegment.write(self.path / name, inputs, renders, int(manifest.get("dim", DEFAULT_DIM)))
+            manifest["segments"] = [{"name": name, "count": len(inputs)}]
+            self._write_manifest(manifest)
+            # 已映射旧文件的读端不受影响（unlink 后映射仍然有效），下次 reload 切到新 Segment
+            for name in old:
+                shutil.rmtree(self.path / name, ignore_errors=True)
+            return len(inputs)
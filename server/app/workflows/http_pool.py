@@ -0,0 +1,302 @@
+import asyncio
+import ipaddress
+import logging
+import socket
+import time
+import urllib.request
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import httpcore
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _CachingBackend(httpcore.AsyncNetworkBackend):
+    """
+    带 DNS 缓存的网络后端：解析结果按 TTL 缓存，建连时依次尝试各个地址。
+    所有地址都连不上时丢弃缓存，下次重新解析。TLS SNI 仍使用原始域名（由 httpcore 处理）。
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._inner = httpcore.AnyIOBackend()
+        self._cache: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        cached = self._cache.get((host, port))
+        if cached and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            raise httpcore.ConnectError(f"DNS resolution failed for {host}: {e}") from e
+        addrs = list(dict.fromkeys(info[4][0] for info in infos))
+        if self.ttl > 0:
+            self._cache[(host, port)] = (time.monotonic() + self.ttl, addrs)
+        return addrs
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        error: Optional[Exception] = None
+        for addr in await self._resolve(host, port):
+            try:
+                return await self._inner.connect_tcp(addr, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        self._cache.pop((host, port), None)
+        raise error or httpcore.ConnectError(f"no address for {host}")
+
+    async def connect_unix_socket(self, path: str, timeout: Optional[float] = None, socket_options=None):
+        return await self._inner.connect_unix_socket(path, timeout, socket_options)
+
+    async def sleep(self, seconds: float) -> None:
+        await self._inner.sleep(seconds)
+
+
+# httpcore 异常 → httpx 异常（openai SDK 按 httpx 异常判断超时 / 重试），子类在前
+_EXCEPTIONS: Tuple[Tuple[type, type], ...] = (
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.ProxyError, httpx.ProxyError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextmanager
+def _map_exceptions() -> Iterator[None]:
+    try:
+        yield
+    except Exception as e:
+        for source, target in _EXCEPTIONS:
+            if isinstance(e, source):
+                raise target(str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    """包装 httpcore 响应流：映射异常，关闭时回调（统计进行中的请求）"""
+
+    def __init__(self, stream: Any, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        with _map_exceptions():
+            async for part in self._stream:
+                yield part
+
+    async def aclose(self) -> None:
+        try:
+            if hasattr(self._stream, "aclose"):
+                await self._stream.aclose()
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+                self._on_close = None
+
+
+def _env_proxy(url: httpx.URL) -> Optional[str]:
+    """按 HTTP(S)_PROXY / ALL_PROXY / NO_PROXY 环境变量取该地址应走的代理（与 httpx 默认 trust_env 行为一致）"""
+    proxies = urllib.request.getproxies()
+    proxy = proxies.get(url.scheme) or proxies.get("all")
+    if proxy and not urllib.request.proxy_bypass(url.host):
+        return proxy if "://" in proxy else f"http://{proxy}"
+    return None
+
+
+class LLMHttpPool(httpx.AsyncBaseTransport):
+    """
+    上游 LLM 共享 HTTP 连接池。
+    本身作为 transport 挂在一个常驻的 httpx.AsyncClient 上（注入 ChatOpenAI），
+    底层 httpcore 连接池在 lifespan 中创建 / 预热 / 关闭，客户端对象本身始终不变；未启动时首个请求懒创建。
+    - 连接数上限、keep-alive 连接数与过期时间
+    - HTTP/2（需要安装 h2，缺失时退回 HTTP/1.1）
+    - 建连 / 读超时
+    - DNS 缓存（通过 httpcore 公开的 network_backend 参数接入）
+    - 代理：显式配置的 proxy 优先，否则按环境变量（HTTP(S)_PROXY / NO_PROXY）逐个源站选择；每个代理一个连接池
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        dns_ttl: float = 300.0,
+        proxy: str = "",
+        trust_env: bool = True,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        if http2 and not _h2_available():
+            logger.warning("LLM_HTTP2 enabled but h2 is not installed (pip install 'httpx[http2]'), fall back to HTTP/1.1")
+            http2 = False
+        self.http2 = http2
+        self._backend = _CachingBackend(dns_ttl)
+        self.proxy = proxy or None
+        self.trust_env = trust_env
+        # 代理地址（None 为直连）-> 连接池；源站 -> 代理地址（环境变量只在每个源站首次请求时查一次）
+        self._pools: Dict[Optional[str], httpcore.AsyncConnectionPool] = {}
+        self._routes: Dict[Tuple[bytes, bytes, Optional[int]], Optional[str]] = {}
+        self.requests = 0
+        self.in_flight = 0
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.client = httpx.AsyncClient(transport=self, timeout=self.timeout)
+
+    def _route(self, url: httpx.URL) -> Optional[str]:
+        """该请求应走的代理地址，None 为直连"""
+        if self.proxy:
+            return self.proxy
+        if not self.trust_env:
+            return None
+        origin = (url.raw_scheme, url.raw_host, url.port)
+        if origin not in self._routes:
+            self._routes[origin] = _env_proxy(url)
+        return self._routes[origin]
+
+    def _ensure_pool(self, proxy: Optional[str] = None) -> httpcore.AsyncConnectionPool:
+        pool = self._pools.get(proxy)
+        if pool is not None:
+            return pool
+        options = dict(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=self.limits.max_connections,
+            max_keepalive_connections=self.limits.max_keepalive_connections,
+            keepalive_expiry=self.limits.keepalive_expiry,
+            http1=True,
+            http2=self.http2,
+            network_backend=self._backend,
+        )
+        if proxy is None:
+            pool = httpcore.AsyncConnectionPool(**options)
+        else:
+            url = httpx.URL(proxy)
+            proxy_url = httpcore.URL(scheme=url.raw_scheme, host=url.raw_host, port=url.port, target=b"/")
+            proxy_auth = (url.username, url.password) if url.username else None
+            if url.scheme in ("http", "https"):
+                pool = httpcore.AsyncHTTPProxy(proxy_url=proxy_url, proxy_auth=proxy_auth, **options)
+            elif url.scheme in ("socks5", "socks5h"):
+                # 需要安装 socksio（pip install 'httpx[socks]'）
+                pool = httpcore.AsyncSOCKSProxy(proxy_url=proxy_url, proxy_auth=proxy_auth, **options)
+            else:
+                raise ValueError(f"unsupported LLM HTTP proxy scheme: {url.scheme!r}")
+            logger.info("LLM HTTP pool uses proxy %s://%s:%s", url.scheme, url.host, url.port or "")
+        self._pools[proxy] = pool
+        return pool
+
+    def _release(self) -> None:
+        self.in_flight -= 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        req = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        self.in_flight += 1
+        try:
+            with _map_exceptions():
+                resp = await self._ensure_pool(self._route(request.url)).handle_async_request(req)
+        except BaseException:
+            self._release()
+            raise
+        return httpx.Response(
+            status_code=resp.status,
+            headers=resp.headers,
+            stream=_ResponseStream(resp.stream, self._release),
+            extensions=resp.extensions,
+        )
+
+    async def start(self, prewarm_urls: Sequence[str] = (), connections: int = 1) -> None:
+        """创建连接池，并向每个上游发起轻量请求提前完成 DNS / TCP / TLS 握手（状态码无所谓）"""
+        for url in prewarm_urls or ("",):
+            self._ensure_pool(self._route(httpx.URL(url)) if url else self.proxy)
+        if connections <= 0:
+            return
+        results = await asyncio.gather(
+            # 预热只为握手，超时按建连超时算，不拖慢启动
+            *(self.client.head(url, timeout=self.timeout.connect) for url in prewarm_urls for _ in range(connections)),
+            return_exceptions=True,
+        )
+        for r in results:
+            if isinstance(r, Exception):
+                logger.warning("LLM HTTP pool prewarm failed: %r", r)
+
+    async def close(self) -> None:
+        """关闭底层连接；客户端仍可用，之后的请求会重新建池"""
+        pools, self._pools = self._pools, {}
+        self._routes.clear()
+        for pool in pools.values():
+            await pool.aclose()
+
+    async def aclose(self) -> None:
+        await self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        connections = [c for pool in self._pools.values() for c in pool.connections]
+        idle = sum(1 for c in connections if c.is_idle())
+        active = len(connections) - idle
+        return {
+            "started": bool(self._pools),
+            "http2": self.http2,
+            "proxied_pools": sum(1 for proxy in self._pools if proxy is not None),
+            "open": len(connections),
+            "idle": idle,
+            "active": active,
+            "in_flight": self.in_flight,
+            # HTTP/1.1 下一个连接同时只承载一个请求，超出活跃连接数的部分在等连接
+            "waiting": max(0, self.in_flight - active) if not self.http2 else None,
+            "max_connections": self.limits.max_connections,
+            "requests": self.requests,
+            "dns_cache": {"hits": self._backend.hits, "misses": self._backend.misses},
+        }
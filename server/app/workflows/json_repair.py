@@ -0,0 +1,209 @@
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.workflows.scenario_manager import scenario_manager
+
+# 字符串外需要处理的字符：各种引号、括号、逗号；其余原样拷贝
+_OUTSIDE = re.compile("[\"'“”{}\\[\\],]")
+# 字符串内需要处理的字符：反斜杠、控制字符、各种引号；其余原样拷贝
+_INSIDE = re.compile("[\\\\\x00-\x1f\"'“”]")
+# 截断在 \u 转义中间
+_PARTIAL_UNICODE = re.compile(r"\\u[0-9a-fA-F]{0,3}$")
+_WS = " \t\r\n"
+_VALID_ESCAPES = frozenset('"\\/bfnrtu')
+_CONTROL = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+_SMART_QUOTES = "“”"
+# 引号后面紧跟这些字符才算字符串结束，否则视为正文里未转义的引号
+_STRING_END = frozenset(",:}]")
+_VALUE_START = frozenset("\"'“”{[]}")
+
+# 修复 / 失败计数（只统计完整解析，流式中间结果不计）
+repair_counts: Counter = Counter()
+
+
+def _closes_string(text: str, i: int) -> bool:
+    n = len(text)
+    while i < n and text[i] in _WS:
+        i += 1
+    if i >= n:
+        return True
+    if text[i] != ",":
+        return text[i] in _STRING_END
+    # "a "b", c" 这类正文里的逗号：逗号后面必须是下一个键 / 值的开头
+    i += 1
+    while i < n and text[i] in _WS:
+        i += 1
+    return i >= n or text[i] in _VALUE_START
+
+
+def _last_significant(out: List[str]) -> str:
+    for piece in reversed(out):
+        stripped = piece.rstrip()
+        if stripped:
+            return stripped[-1]
+    return ""
+
+
+def _strip_trailing_comma(out: List[str]) -> bool:
+    while out:
+        stripped = out[-1].rstrip()
+        if stripped:
+            out[-1] = stripped
+            break
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        return True
+    return False
+
+
+def repair_json(text: str, partial: bool = False) -> Tuple[Optional[str], List[str]]:
+    """
+    从模型输出里取出第一个 JSON 对象并修复常见瑕疵，一次线性扫描，返回 (修复后的 JSON 文本, 修复项)。
+    - 第一个 { 之前、顶层对象闭合之后的内容（客套前缀、``` 围栏）直接丢弃
+    - 尾随逗号、弯引号 / 单引号、字符串里的裸换行和控制字符、正文里未转义的双引号、非法转义
+    - 缺少闭合括号时补齐；字符串本身被截断（多半是触到 max_tokens）只在 partial 模式下补齐，否则返回 None
+    找不到对象时返回 (None, [])。
+    """
+    start = text.find("{")
+    if start < 0:
+        return None, []
+    out: List[str] = []
+    repairs: List[str] = []
+    stack: List[str] = []  # 待闭合的括号
+    closer: Optional[str] = None  # 当前字符串可接受的结束引号；None 表示在字符串外
+    str_start = 0  # 最近一个字符串在 out 中的位置
+    str_is_key = False
+    i, n = start, len(text)
+
+    while i < n:
+        if closer is None:
+            m = _OUTSIDE.search(text, i)
+            if m is None:
+                out.append(text[i:])
+                break
+            j = m.start()
+            if j > i:
+                out.append(text[i:j])
+            ch = text[j]
+            i = j + 1
+            if ch == "{" or ch == "[":
+                stack.append("}" if ch == "{" else "]")
+                out.append(ch)
+            elif ch == "}" or ch == "]":
+                if _strip_trailing_comma(out):
+                    repairs.append("trailing_comma")
+                expected = stack.pop()
+                if expected != ch:
+                    repairs.append("bracket")
+                out.append(expected)
+                if not stack:
+                    return "".join(out), repairs
+            elif ch == ",":
+                out.append(ch)
+            else:
+                if ch != '"':
+                    repairs.append("quotes")
+                closer = "'" if ch == "'" else ('"' if ch == '"' else _SMART_QUOTES)
+                str_is_key = stack[-1] == "}" and _last_significant(out) in "{,"
+                str_start = len(out)
+                out.append('"')
+        else:
+            m = _INSIDE.search(text, i)
+            if m is None:
+                out.append(text[i:])
+                break
+            j = m.start()
+            if j > i:
+                out.append(text[i:j])
+            ch = text[j]
+            i = j + 1
+            if ch == "\\":
+                if i >= n:
+                    break  # 末尾悬空的反斜杠，按截断处理
+                esc = text[i]
+                if esc in _VALID_ESCAPES:
+                    out.append("\\" + esc)
+                    i += 1
+                elif esc == "'":
+                    out.append("'")
+                    i += 1
+                else:
+                    # 非法转义：反斜杠按字面量保留，后面的字符照常处理
+                    out.append("\\\\")
+                    repairs.append("escape")
+            elif ch < " ":
+                out.append(_CONTROL.get(ch) or "\\u%04x" % ord(ch))
+                repairs.append("control_char")
+            elif ch in closer and _closes_string(text, i):
+                out.append('"')
+                closer = None
+            elif ch == '"':
+                out.append('\\"')
+                if closer == '"':
+                    repairs.append("inner_quote")
+            else:
+                out.append(ch)
+
+    # 没有读到顶层对象的 }：输出被截断或模型漏写了结尾
+    if closer is not None:
+        if not partial:
+            return None, repairs + ["truncated_string"]
+        if str_is_key:
+            del out[str_start:]
+            str_is_key = False
+        else:
+            value = "".join(out[str_start:])
+            tail = _PARTIAL_UNICODE.search(value)
+            out[str_start:] = [value[:tail.start()] if tail else value, '"']
+
+    _strip_trailing_comma(out)
+    last = _last_significant(out)
+    if last == ":" or (str_is_key and last == '"'):
+        # 只有键没有值
+        if not partial:
+            return None, repairs + ["truncated_key"]
+        del out[str_start:]
+        _strip_trailing_comma(out)
+    repairs.append("unclosed")
+    return "".join(out) + "".join(reversed(stack)), repairs
+
+
+def parse_llm_json(text: str, partial: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    解析模型输出的 JSON 对象。先按修复后的文本解析；
+    partial=True 用于流式中间结果，解析不了返回 None，否则抛 ValueError。
+    """
+    repaired, repairs = repair_json(text or "", partial)
+    obj = None
+    if repaired is not None:
+        try:
+            obj = json.loads(repaired)
+        except ValueError:
+            obj = None
+    if partial:
+        return obj
+    if obj is None:
+        repair_counts["failed"] += 1
+        repair_counts.update(r for r in repairs if r.startswith("truncated"))
+        raise ValueError(f"Invalid json output: {text}")
+    repair_counts["parsed"] += 1
+    if repairs:
+        repair_counts["repaired"] += 1
+        repair_counts.update(set(repairs))
+    return obj
+
+
+def clean_output(obj: Dict[str, Any], fields: Sequence[str] = ("english",)) -> Dict[str, Any]:
+    """对指定字符串字段做 post_clean（去掉字段值里残留的客套前缀、代码围栏）"""
+    for name in fields:
+        value = obj.get(name)
+        if isinstance(value, str):
+            obj[name] = scenario_manager.post_clean(value)
+    return obj
+
+
+def parser_stats() -> Dict[str, int]:
+    return dict(repair_counts)
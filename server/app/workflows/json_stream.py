@@ -0,0 +1,185 @@
+import re
+from typing import Any, Dict, Optional
+
+from app.workflows.output_parser import TolerantJsonOutputParser
+from app.workflows.scenario_manager import scenario_manager
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_LEAD_WORDS = ("here is", "sure,", "here's", "okay,")
+_LEAD_MAX = max(len(w) for w in _LEAD_WORDS)
+# 末尾的空白 / 引号 / ``` / ```json 围栏片段可能被 post_clean 去掉或与后文连成围栏，暂不下发
+_HOLD_TAIL = re.compile(r"(?:[\s\"'`]|(?<=`)j(?:s(?:o(?:n)?)?)?)*$")
+
+
+class JsonFieldStreamer:
+    """
+    增量扫描模型输出的 JSON 对象，边收边吐出指定字符串字段（默认 english）的已解码内容。
+    - 第一个 { 之前的内容（如 "Here is the result:"、```json）直接忽略
+    - 只跟踪顶层对象：字符串/转义/嵌套深度的状态机，不回溯、不重复解析
+    - 顶层对象的 } 出现后 done=True，调用方据此立即停止上游生成
+    """
+
+    def __init__(self, field: str = "english"):
+        self.field = field
+        self.done = False
+        self._buf: list = []
+        self._depth = 0
+        self._in_string = False
+        self._escape: Optional[str] = None  # 正在读取的转义序列（含反斜杠后的字符）
+        self._high_surrogate: Optional[int] = None
+        self._token: list = []  # 当前顶层字符串内容
+        self._is_key = True  # 顶层当前字符串是键还是值
+        self._last_key: Optional[str] = None
+        self._capturing = False
+
+    @property
+    def text(self) -> str:
+        """已收到的 JSON 原文（从第一个 { 开始）"""
+        return "".join(self._buf)
+
+    def feed(self, chunk: str) -> str:
+        """喂入一段模型输出，返回其中属于目标字段的新增文本"""
+        out = []
+        for ch in chunk:
+            if self.done:
+                break
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._buf.append(ch)
+                continue
+            self._buf.append(ch)
+
+            if self._in_string:
+                decoded = self._consume_string_char(ch)
+                if decoded is None:
+                    continue
+                if self._depth == 1:
+                    self._token.append(decoded)
+                    if self._capturing:
+                        out.append(decoded)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._token = []
+                self._capturing = self._depth == 1 and not self._is_key and self._last_key == self.field
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+            elif self._depth == 1:
+                if ch == ":":
+                    self._is_key = False
+                elif ch == ",":
+                    self._is_key = True
+        return "".join(out)
+
+    def _consume_string_char(self, ch: str) -> Optional[str]:
+        """处理字符串内的一个字符，返回解码后的文本；转义未读完或字符串结束时返回 None"""
+        if self._escape is not None:
+            self._escape += ch
+            if self._escape[1] != "u":
+                seq, self._escape = self._escape, None
+                return _ESCAPES.get(seq[1], seq[1])
+            if len(self._escape) < 6:
+                return None
+            seq, self._escape = self._escape, None
+            code = int(seq[2:], 16) if all(c in "0123456789abcdefABCDEF" for c in seq[2:]) else 0xFFFD
+            # 代理对的前半部分先缓存，和后半部分拼成一个字符再下发
+            if 0xD800 <= code < 0xDC00:
+                self._high_surrogate = code
+                return ""
+            high, self._high_surrogate = self._high_surrogate, None
+            if high is not None and 0xDC00 <= code < 0xE000:
+                return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+            return chr(code)
+        if ch == "\\":
+            self._escape = ch
+            return None
+        if ch == '"':
+            self._in_string = False
+            self._capturing = False
+            if self._depth == 1 and self._is_key:
+                self._last_key = "".join(self._token)
+            return None
+        return ch
+
+    def result(self) -> Dict[str, Any]:
+        """解析完整对象（容错修复 + 清洗 english 字段，与非流式接口一致）"""
+        return TolerantJsonOutputParser().parse(self.text)
+
+
+class IncrementalCleaner:
+    """
+    post_clean 的增量版本：只下发已确定不会被 post_clean 改写的前缀，
+    保证所有增量拼起来等于对完整文本执行 post_clean 的结果。
+    - 开头疑似 "Here is ... :" 之类的客套前缀时，等到出现冒号再决定，之后不再回看开头
+    - 末尾的空白、引号、``` 围栏片段先扣住，后续有正文才下发
+    - 每次只清洗上次确定位置之后的尾巴，不重新拼接 / 清洗全文
+    """
+
+    def __init__(self):
+        self._raw: list = []
+        self._tail = ""  # 还没确定的部分（开头未定时为全部原文）
+        self._started = False  # 开头的引号 / 客套前缀是否已处理
+        self._lead: Optional[bool] = None  # 开头是否像客套前缀，看够字数后固定
+        self._lead_end = False  # 是否出现过冒号 / 换行（客套前缀可能结束）
+        self._emitted: list = []
+
+    def feed(self, delta: str) -> str:
+        if not delta:
+            return ""
+        self._raw.append(delta)
+        tail = self._tail + delta
+        if not self._started:
+            if self._awaiting_lead_in(tail, delta):
+                self._tail = tail
+                return ""
+            tail = _strip_head(tail)
+            self._started = True
+
+        cut = _HOLD_TAIL.search(tail).start()
+        self._tail = tail[cut:]
+        piece = scenario_manager.strip_fences(tail[:cut])
+        if not self._emitted:
+            piece = piece.lstrip()
+        if piece:
+            self._emitted.append(piece)
+        return piece
+
+    def finish(self) -> str:
+        """输入结束，下发剩余部分（最终结果以对完整文本的 post_clean 为准）"""
+        cleaned = scenario_manager.post_clean("".join(self._raw))
+        emitted = "".join(self._emitted)
+        if not cleaned.startswith(emitted):
+            # 理论上不会出现；宁可少发，最终事件会带上完整结果
+            return ""
+        self._emitted = [cleaned]
+        return cleaned[len(emitted):]
+
+    def _awaiting_lead_in(self, tail: str, delta: str) -> bool:
+        if self._lead is None:
+            head = tail.lstrip().lstrip("\"'").lower()
+            maybe = any(w.startswith(head[:len(w)]) for w in _LEAD_WORDS)
+            if len(head) < _LEAD_MAX and maybe:
+                return True
+            self._lead = maybe
+        if not self._lead:
+            return False
+        # 像客套前缀：等到前缀匹配上且后面出现正文（冒号后的空白也属于前缀），或出现换行（不可能再匹配）
+        self._lead_end = self._lead_end or ":" in delta or "\n" in delta
+        if not self._lead_end:
+            return True
+        head = tail.lstrip().lstrip('"').lstrip("'")
+        rest = scenario_manager.strip_lead_in(head)
+        if len(rest) == len(head):
+            return "\n" not in head
+        return not rest
+
+
+def _strip_head(text: str) -> str:
+    """post_clean 对开头的处理：去空白、引号和客套前缀"""
+    return scenario_manager.strip_lead_in(text.lstrip().lstrip('"').lstrip("'"))
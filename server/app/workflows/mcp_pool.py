@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import anyio
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp import ClientSession
+from mcp.shared.exceptions import McpError
+
+logger = logging.getLogger(__name__)
+
+# 这些异常说明会话/子进程本身坏了（而不是工具业务报错），需要重启会话
+_TRANSPORT_ERRORS = (
+    McpError,
+    anyio.ClosedResourceError,
+    anyio.BrokenResourceError,
+    anyio.EndOfStream,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class _PooledSession:
+    """
+    单个常驻 MCP 会话。
+    stdio_client 内部基于 anyio cancel scope，必须在同一个 task 中进入和退出，
+    因此每个会话由独立的 owner task 持有：打开后挂起等待关闭信号，关闭时由 owner task 自己退出上下文。
+    """
+
+    def __init__(self, client: MultiServerMCPClient, server_name: str, index: int):
+        self._client = client
+        self._server_name = server_name
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def open(self, timeout: float) -> None:
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self._server_name}-{self.index}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except TimeoutError:
+            await self.close()
+            raise
+        if self._error is not None:
+            raise self._error
+
+    async def _run(self) -> None:
+        try:
+            async with self._client.session(self._server_name) as session:
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+            logger.warning("MCP session #%s exited: %r", self.index, e)
+        finally:
+            self.session = None
+            self._ready.set()
+
+    async def ping(self, timeout: float) -> bool:
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+            return True
+        except Exception:
+            return False
+
+    async def close(self, timeout: float = 5.0) -> None:
+        task, self._task = self._task, None
+        if task is None:
+            return
+        self._closing.set()
+        try:
+            # 超时后 wait_for 会取消 owner task，强制结束子进程
+            await asyncio.wait_for(task, timeout)
+        except Exception:
+            pass
+        self.session = None
+
+
+class MCPSessionPool:
+    """
+    MCP 会话池。
+    核心职责：在应用生命周期内维持固定数量的常驻 MCP 服务进程及其会话，
+    请求间共享复用，避免每个图节点都重新拉起一个 Python 子进程。
+    - 空闲会话放在队列里，调用方独占借用，用完归还
+    - 后台定时 ping 空闲会话，进程崩溃或无响应时自动重启
+    - 应用退出时统一关闭所有会话与子进程
+    """
+
+    def __init__(
+        self,
+        connections: Dict[str, Any],
+        server_name: str,
+        size: int = 2,
+        health_interval: float = 30.0,
+        call_timeout: float = 30.0,
+        start_timeout: float = 30.0,
+    ):
+        self._client = MultiServerMCPClient(connections)
+        self.server_name = server_name
+        self.size = max(1, size)
+        self._health_interval = health_interval
+        self._call_timeout = call_timeout
+        self._start_timeout = start_timeout
+
+        self._slots: List[_PooledSession] = [
+            _PooledSession(self._client, server_name, i) for i in range(self.size)
+        ]
+        self._idle: Optional[asyncio.Queue] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._started = False
+        self.restarts = 0
+
+    async def start(self) -> None:
+        """启动全部会话；可重复调用，未在 lifespan 中启动时会在首次调用工具时懒启动"""
+        if self._started:
+            return
+        async with self._start_lock:
+            if self._started:
+                return
+            self._idle = asyncio.Queue()
+            results = await asyncio.gather(
+                *(slot.open(self._start_timeout) for slot in self._slots),
+                return_exceptions=True,
+            )
+            for slot, res in zip(self._slots, results):
+                if isinstance(res, BaseException):
+                    # 启动失败的会话也放回队列，借出时会再次尝试重启
+                    logger.warning("MCP session #%s failed to start: %r", slot.index, res)
+                self._idle.put_nowait(slot)
+
+            if self._health_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop(), name="mcp-pool-health")
+            self._started = True
+
+    async def close(self) -> None:
+        if not self._started:
+            return
+        self._started = False
+        if self._health_task:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        await asyncio.gather(*(slot.close() for slot in self._slots), return_exceptions=True)
+
+    async def _restart(self, slot: _PooledSession) -> None:
+        await slot.close()
+        self.restarts += 1
+        await slot.open(self._start_timeout)
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        """
+        借用一个会话执行工具调用。
+        传输层异常（进程退出、管道断开、超时）时重启该会话并重试一次。
+        """
+        await self.start()
+        slot: _PooledSession = await self._idle.get()
+        try:
+            for attempt in range(2):
+                if not slot.alive:
+                    await self._restart(slot)
+                try:
+                    return await asyncio.wait_for(
+                        slot.session.call_tool(name, arguments=arguments),
+                        self._call_timeout,
+                    )
+                except _TRANSPORT_ERRORS as e:
+                    if attempt:
+                        raise
+                    logger.warning("MCP session #%s broken on %s: %r, restarting", slot.index, name, e)
+                    await self._restart(slot)
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._health_interval)
+            # 只检查当前空闲的会话，正在被借用的会话不打扰
+            for _ in range(self._idle.qsize()):
+                try:
+                    slot = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    if not await slot.ping(timeout=5.0):
+                        logger.warning("MCP session #%s unhealthy, restarting", slot.index)
+                        await self._restart(slot)
+                except Exception as e:
+                    logger.warning("MCP session #%s restart failed: %r", slot.index, e)
+                finally:
+                    self._idle.put_nowait(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": "stdio",
+            "size": self.size,
+            "alive": sum(1 for s in self._slots if s.alive),
+            "idle": self._idle.qsize() if self._idle else 0,
+            "restarts": self.restarts,
+        }
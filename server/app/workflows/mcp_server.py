@@ -14,22 +14,30 @@ mcp = FastMCP("Style-Transfer-Server")
 @mcp.resource("config://scenarios")
 def get_scenarios_config() -> str:
     """提供只读的场景配置资源"""
+    scenario_manager.refresh_if_stale()
     return json.dumps(scenario_manager.scenes, ensure_ascii=False)
 
 @mcp.tool()
-async def fetch_reddit_context(scene_id: str, intent_id: str) -> str:
-    """提供可执行工具：调用底层 RAG 获取上下文"""
-    return await retriever.get_dynamic_examples(scene_id, intent_id)
+async def fetch_reddit_context(scene_id: str, intent_id: str, input_text: str = "", max_tokens: int = 0) -> str:
+    """提供可执行工具：调用底层 RAG，按输入文本检索相关且多样的示例作为上下文（max_tokens > 0 时按预算裁剪）"""
+    scenario_manager.refresh_if_stale()
+    return await retriever.get_dynamic_examples(scene_id, intent_id, input_text, max_tokens)
 
 @mcp.tool()
-def build_prompt_template(scene_id: str, intent_id: str, tone_id: str) -> str:
-    """提供可执行工具：组装并返回提示词的系统与人类部分"""
-    template = scenario_manager.get_prompt_template(scene_id, intent_id, tone_id)
+def build_prompt_template(scene_id: str, intent_id: str, tone_id: str, version: str = "") -> str:
+    """提供可执行工具：组装并返回提示词的系统与人类部分及其配置版本（version 与本进程不一致时立即检查热加载）"""
+    scenario_manager.refresh_if_stale(0 if version and version != scenario_manager.version else 2.0)
+    snapshot = scenario_manager.snapshot
+    template = snapshot.get_prompt_template(scene_id, intent_id, tone_id)
     result = {
+        "version": snapshot.version,
         "system": template.messages[0].prompt.template,
         "human": template.messages[1].prompt.template
     }
     return json.dumps(result, ensure_ascii=False)
 
+# 服务启动即构建检索索引，首个请求不承担建索引开销
+retriever.warm_up()
+
 if __name__ == "__main__":
     mcp.run()
\ No newline at end of file
@@ -0,0 +1,25 @@
+from typing import Any, List, Tuple
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import Generation
+
+from app.workflows.json_repair import clean_output, parse_llm_json
+
+
+class TolerantJsonOutputParser(JsonOutputParser):
+    """
+    替代 JsonOutputParser + post_clean：容错解析模型输出，完整结果顺带清洗 clean_fields。
+    流式（partial）时同样可用，返回已收到部分对应的对象。
+    """
+
+    clean_fields: Tuple[str, ...] = ("english",)
+
+    def parse_result(self, result: List[Generation], *, partial: bool = False) -> Any:
+        text = result[0].text
+        if partial:
+            return parse_llm_json(text, partial=True)
+        try:
+            return clean_output(parse_llm_json(text), self.clean_fields)
+        except ValueError as e:
+            raise OutputParserException(str(e), llm_output=text) from e
@@ -0,0 +1,140 @@
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Mapping, Optional, Tuple
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+
+from app.workflows.config import get_llm
+from app.workflows.output_parser import TolerantJsonOutputParser
+from app.workflows.scenario_manager import scenario_manager
+from app.workflows.token_budget import estimate_tokens, token_budget
+from app.workflows.tool_client import tool_client, extract_mcp_text
+
+logger = logging.getLogger(__name__)
+
+PlanKey = Tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class ExecutionPlan:
+    """
+    单个 (scene, intent, tone) 的预编译执行计划。
+    请求路径上只做变量替换和 LLM 调用，其余（路由判断、Prompt 解析、参数绑定、链组装）都在编译期完成。
+    """
+    key: PlanKey
+    version: str
+    rag_enabled: bool
+    prompt: ChatPromptTemplate
+    llm_params: Mapping
+    bound_llm: Runnable
+    parser: TolerantJsonOutputParser
+    chain: Runnable
+    # 流式接口用：只输出文本增量，JSON 由调用方边收边解析
+    stream_chain: Runnable
+    # token 预算：模板本身（不含变量）的估算 token 数、输出上限
+    template_tokens: int = 0
+    max_output_tokens: int = 1024
+    # 按 max_tokens 缓存的链，(max_tokens, streaming) -> Runnable
+    _sized: Dict[Tuple[int, bool], Runnable] = field(default_factory=dict, compare=False, repr=False)
+
+    def sized_chain(self, max_tokens: int, streaming: bool = False) -> Runnable:
+        """绑定本次 max_tokens 的链；max_tokens 向上取整到 32，同档位复用同一条链"""
+        max_tokens = min(-(-max_tokens // 32) * 32, self.max_output_tokens)
+        key = (max_tokens, streaming)
+        chain = self._sized.get(key)
+        if chain is None:
+            sized_llm = self.bound_llm.bind(max_tokens=max_tokens)
+            parser = StrOutputParser() if streaming else self.parser
+            chain = self._sized[key] = self.prompt | sized_llm | parser
+        return chain
+
+
+class PlanCache:
+    """
+    执行计划缓存。
+    按配置版本分桶、以场景三元组为键；配置版本变化时才重新编译，否则始终命中。
+    只保留当前和上一个版本的计划，热加载前已进入图的请求可以按旧版本跑完。
+    """
+
+    def __init__(self):
+        self._plans: Dict[str, Dict[PlanKey, ExecutionPlan]] = {}
+
+    def peek(self, scene_id: str, intent_id: str, tone_id: str, version: Optional[str] = None) -> Optional[ExecutionPlan]:
+        bucket = self._plans.get(version or scenario_manager.version)
+        return bucket.get((scene_id, intent_id, tone_id)) if bucket else None
+
+    async def get(self, scene_id: str, intent_id: str, tone_id: str, version: Optional[str] = None) -> ExecutionPlan:
+        """
+        version 为空时取当前配置版本；指定的旧版本已被淘汰时退回当前版本。
+        """
+        plan = self.peek(scene_id, intent_id, tone_id, version)
+        if plan is None and version:
+            plan = self.peek(scene_id, intent_id, tone_id)
+        if plan is None:
+            # 并发首次编译时可能重复编译一次，结果等价，后写覆盖即可
+            plan = await self._compile((scene_id, intent_id, tone_id))
+            self._store(plan)
+        return plan
+
+    async def warm_up(self) -> int:
+        """预编译当前版本的全部场景组合，返回编译数量（启动期和配置热加载后调用）"""
+        n = 0
+        for key in list(scenario_manager.iter_keys()):
+            await self.get(*key)
+            n += 1
+        return n
+
+    def _store(self, plan: ExecutionPlan) -> None:
+        self._plans.setdefault(plan.version, {})[plan.key] = plan
+        for stale in list(self._plans)[:-2]:
+            del self._plans[stale]
+
+    async def _compile(self, key: PlanKey) -> ExecutionPlan:
+        s_id, i_id, t_id = key
+        # 整个编译过程基于同一份快照；先在本进程校验 ID，未知组合直接失败，不必走一次工具调用
+        snapshot = scenario_manager.snapshot
+        tone = snapshot.get_tone(s_id, i_id, t_id)
+        rag_config = snapshot.get_intent(s_id, i_id).rag
+
+        # 提示词仍通过 MCP 工具获取，保持与外部客户端一致的协议边界
+        response = await tool_client.call_tool(
+            "build_prompt_template",
+            arguments={"scene_id": s_id, "intent_id": i_id, "tone_id": t_id, "version": snapshot.version}
+        )
+        prompts = json.loads(extract_mcp_text(response))
+        if prompts.get("version") == snapshot.version:
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", prompts["system"]),
+                ("human", prompts["human"])
+            ])
+        else:
+            # 工具进程的配置版本与本进程不一致（热加载尚未同步），改用本进程快照，保证计划与版本号对应
+            logger.warning(
+                "prompt version mismatch for %s: tool=%s local=%s, use local snapshot",
+                key, prompts.get("version"), snapshot.version,
+            )
+            prompt = snapshot.get_prompt_template(s_id, i_id, t_id)
+            prompts = {"system": prompt.messages[0].prompt.template, "human": prompt.messages[1].prompt.template}
+
+        bound_llm = get_llm().bind(**tone.llm_params)
+        parser = TolerantJsonOutputParser()
+
+        return ExecutionPlan(
+            key=key,
+            version=snapshot.version,
+            rag_enabled=rag_config.enabled,
+            prompt=prompt,
+            llm_params=tone.llm_params,
+            bound_llm=bound_llm,
+            parser=parser,
+            chain=prompt | bound_llm | parser,
+            stream_chain=prompt | bound_llm | StrOutputParser(),
+            template_tokens=estimate_tokens(prompts["system"]) + estimate_tokens(prompts["human"]),
+            max_output_tokens=tone.max_output_tokens or token_budget.default_cap,
+        )
+
+
+plan_cache = PlanCache()
@@ -0,0 +1,312 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel, agenerate_from_stream
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """一个 OpenAI 兼容的上游：地址 + 模型 + 路由权重"""
+    name: str
+    base_url: str
+    model: str
+    api_key: str
+    weight: float = 1.0
+
+    @staticmethod
+    def from_dict(raw: Dict[str, Any]) -> "ProviderSpec":
+        api_key = raw.get("api_key") or os.getenv(raw.get("api_key_env", "SILICONFLOW_API_KEY"), "")
+        return ProviderSpec(
+            name=raw.get("name") or raw["base_url"],
+            base_url=raw["base_url"],
+            model=raw["model"],
+            api_key=api_key,
+            weight=float(raw.get("weight", 1.0)),
+        )
+
+
+class Provider:
+    """
+    供应商运行时状态：首 token 延迟（最近样本窗口 + EWMA）、错误率 EWMA、连续失败熔断。
+    路由分数 = 权重 × 成功率 / 首 token 延迟。
+    """
+
+    def __init__(self, spec: ProviderSpec, llm: BaseChatModel, window: int = 256):
+        self.spec = spec
+        self.llm = llm
+        self._ttft = deque(maxlen=window)
+        self.ttft_ewma: Optional[float] = None
+        self.error_ewma = 0.0
+        self.consecutive_errors = 0
+        self.down_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+        self.cancelled = 0
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def available(self, now: float) -> bool:
+        return self.down_until <= now
+
+    def score(self, default_ttft: float) -> float:
+        return self.spec.weight * (1.0 - self.error_ewma) / max(self.ttft_ewma or default_ttft, 0.01)
+
+    def ttft_quantile(self, q: float) -> Optional[float]:
+        if len(self._ttft) < 20:
+            return None
+        ordered = sorted(self._ttft)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def record_first_token(self, latency: float) -> None:
+        self._ttft.append(latency)
+        self.ttft_ewma = latency if self.ttft_ewma is None else 0.8 * self.ttft_ewma + 0.2 * latency
+        self.error_ewma *= 0.9
+        self.consecutive_errors = 0
+
+    def record_error(self, exc: BaseException, cooldown: float) -> None:
+        self.errors += 1
+        self.error_ewma = 0.9 * self.error_ewma + 0.1
+        self.consecutive_errors += 1
+        # 连续失败 3 次暂时摘除，冷却期后重新参与路由
+        if self.consecutive_errors >= 3:
+            self.down_until = time.monotonic() + cooldown
+        logger.warning("LLM provider %s failed (%d in a row): %r", self.name, self.consecutive_errors, exc)
+
+    def stats(self) -> Dict[str, Any]:
+        p50, p90 = self.ttft_quantile(0.5), self.ttft_quantile(0.9)
+        return {
+            "model": self.spec.model,
+            "weight": self.spec.weight,
+            "available": self.available(time.monotonic()),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "wins": self.wins,
+            "hedges": self.hedges,
+            "cancelled": self.cancelled,
+            "error_rate": round(self.error_ewma, 3),
+            "ttft_ewma_ms": round(self.ttft_ewma * 1000, 1) if self.ttft_ewma is not None else None,
+            "ttft_p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "ttft_p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+        }
+
+
+class _Attempt:
+    """一次上游请求：后台任务读到首个非空 token（连同之前的空 chunk）为止，之后由胜出方继续迭代同一个流"""
+
+    __slots__ = ("provider", "stream", "task", "started")
+
+    def __init__(self, provider: Provider, stream: AsyncIterator[AIMessageChunk]):
+        self.provider = provider
+        self.stream = stream
+        self.started = time.monotonic()
+        self.task: asyncio.Task = asyncio.ensure_future(self._head())
+
+    async def _head(self) -> List[AIMessageChunk]:
+        head: List[AIMessageChunk] = []
+        async for chunk in self.stream:
+            head.append(chunk)
+            if chunk.content:
+                break
+        return head
+
+
+class ProviderPool:
+    """
+    多供应商路由 + 首 token 对冲。
+    - 主供应商按 分数 加权随机选择，其余按分数排序作为备选
+    - 主请求在 hedge_delay 内没有产出首个 token（延迟取主供应商首 token 延迟的 hedge_percentile 分位数），
+      向下一个供应商发起对冲请求，谁先出首 token 用谁，另一个立即取消
+    - 首 token 之前失败直接切换到下一个供应商（不等对冲延迟）；首 token 之后的失败原样抛出
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[Provider],
+        hedge_enabled: bool = True,
+        hedge_percentile: float = 0.9,
+        hedge_min_delay: float = 0.3,
+        hedge_default_delay: float = 2.0,
+        max_hedges: int = 1,
+        cooldown: float = 30.0,
+    ):
+        if not providers:
+            raise ValueError("LLM provider pool is empty")
+        self.providers = list(providers)
+        self.hedge_enabled = hedge_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.max_hedges = max_hedges
+        self.cooldown = cooldown
+
+    def rank(self) -> List[Provider]:
+        now = time.monotonic()
+        up = [p for p in self.providers if p.available(now)] or list(self.providers)
+        scores = [p.score(self.hedge_default_delay) for p in up]
+        primary = random.choices(up, weights=scores)[0] if sum(scores) > 0 else up[0]
+        rest = sorted((p for p in up if p is not primary), key=lambda p: -p.score(self.hedge_default_delay))
+        return [primary] + rest
+
+    def hedge_delay(self, provider: Provider) -> float:
+        q = provider.ttft_quantile(self.hedge_percentile)
+        return max(self.hedge_min_delay, q if q is not None else self.hedge_default_delay)
+
+    async def _discard(self, attempt: _Attempt) -> None:
+        attempt.provider.in_flight -= 1
+        if not attempt.task.done():
+            attempt.task.cancel()
+            attempt.provider.cancelled += 1
+        await asyncio.wait([attempt.task])
+        if not attempt.task.cancelled():
+            attempt.task.exception()
+        try:
+            await attempt.stream.aclose()
+        except Exception:
+            pass
+
+    async def astream(
+        self, messages: List[BaseMessage], stop: Optional[List[str]] = None, **kwargs: Any
+    ) -> AsyncIterator[AIMessageChunk]:
+        candidates = self.rank()
+        live: List[_Attempt] = []
+        winner: Optional[_Attempt] = None
+        head: List[AIMessageChunk] = []
+        error: Optional[Exception] = None
+        launched = hedges = 0
+
+        def launch() -> _Attempt:
+            nonlocal launched
+            provider = candidates[launched]
+            launched += 1
+            provider.requests += 1
+            provider.in_flight += 1
+            attempt = _Attempt(provider, provider.llm.astream(messages, stop=stop, **kwargs))
+            live.append(attempt)
+            return attempt
+
+        try:
+            primary = launch()
+            while winner is None:
+                if not live:
+                    if launched >= len(candidates):
+                        raise error or RuntimeError("no LLM provider available")
+                    # 首 token 之前失败：立即切换到下一个供应商
+                    primary = launch()
+                    continue
+
+                timeout = None
+                if self.hedge_enabled and hedges < self.max_hedges and launched < len(candidates):
+                    timeout = max(0.0, primary.started + self.hedge_delay(primary.provider) - time.monotonic())
+                done, _ = await asyncio.wait(
+                    [a.task for a in live], timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges += 1
+                    hedge = launch()
+                    hedge.provider.hedges += 1
+                    logger.info("hedging LLM request %s -> %s", primary.provider.name, hedge.provider.name)
+                    continue
+
+                for attempt in [a for a in live if a.task.done()]:
+                    live.remove(attempt)
+                    try:
+                        head = attempt.task.result()
+                    except Exception as e:
+                        attempt.provider.in_flight -= 1
+                        attempt.provider.record_error(e, self.cooldown)
+                        error = e
+                        continue
+                    winner = attempt
+                    break
+        finally:
+            # 输掉的请求立即取消（包括调用方在等待首 token 时断开的情况）
+            for attempt in live:
+                await self._discard(attempt)
+
+        provider = winner.provider
+        provider.wins += 1
+        provider.record_first_token(time.monotonic() - winner.started)
+        try:
+            for chunk in head:
+                yield chunk
+            async for chunk in winner.stream:
+                yield chunk
+        except Exception as e:
+            provider.record_error(e, self.cooldown)
+            raise
+        finally:
+            provider.in_flight -= 1
+            await winner.stream.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hedge_enabled": self.hedge_enabled,
+            "providers": {
+                p.name: {**p.stats(), "hedge_delay_ms": round(self.hedge_delay(p) * 1000, 1)} for p in self.providers
+            },
+        }
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    LangChain 适配层：对外是普通的 ChatModel（可 bind 参数、接入链、流式输出），调用转发给 ProviderPool。
+    非流式调用内部同样走流式，以便按首 token 判断是否对冲。
+    """
+
+    pool: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "openai-provider-pool"
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self.pool.astream(messages, stop=stop, **kwargs):
+            generation = ChatGenerationChunk(message=chunk)
+            if run_manager:
+                await run_manager.on_llm_new_token(generation.text, chunk=generation)
+            yield generation
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await agenerate_from_stream(self._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # 同步调用不做对冲，直接走当前排名第一的供应商
+        return self.pool.rank()[0].llm._generate(messages, stop=stop, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        yield from self.pool.rank()[0].llm._stream(messages, stop=stop, **kwargs)
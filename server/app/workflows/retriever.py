@@ -1,32 +1,124 @@
+import asyncio
+import hashlib
 import json
-import random
-from app.workflows.scenario_manager import scenario_manager
+import logging
+from typing import Dict, Optional, Tuple
+
+from app.workflows.scenario_manager import scenario_manager, RagConfig
+from app.workflows.search_engine import HybridIndex
+from app.workflows.token_budget import estimate_tokens, fit_examples
+from app.workflows.corpus_store import CorpusStore, render_example
+
+logger = logging.getLogger(__name__)
+
 
 class ExampleRetriever:
     """
     RAG 检索模块。
-    当前实现为静态 JSON 抽样，提供标准化的 get_dynamic_examples 接口。
+    当前实现为进程内混合检索（BM25 + 哈希向量 + 排名融合 + MMR），提供标准化的 get_dynamic_examples 接口。
+    语料来源优先级：
+    1. collection_name 对应的磁盘语料库（tools.corpus 导入，mmap 打开，多进程共享，追加后自动加载新增部分）
+    2. scenarios.json 中内联的 mock_corpus（按配置版本在加载期建索引，内容相同的语料只建一份）
     未来接入 Milvus/MongoDB Atlas 等向量数据库时，仅需重写此类的内部实现。
     """
-    async def get_dynamic_examples(self, scene_id: str, intent_id: str) -> str:
-        rag_config = scenario_manager.get_rag_config(scene_id, intent_id)
 
-        if not rag_config.get("enabled", False):
-            return ""
+    def __init__(self):
+        # version -> (scene_id, intent_id) -> 索引；只保留当前和上一个版本
+        self._indexes: Dict[str, Dict[Tuple[str, str], HybridIndex]] = {}
+        # version -> 语料摘要 -> 索引；同一版本内多个意图共用同一份语料时只建一份
+        self._shared: Dict[str, Dict[str, HybridIndex]] = {}
+        # collection_name -> 磁盘语料库
+        self._stores: Dict[str, CorpusStore] = {}
+
+    def warm_up(self) -> int:
+        """打开全部磁盘语料库，并为没有磁盘语料的意图构建内联语料索引，返回可用的语料数量"""
+        snapshot = scenario_manager.snapshot
+        ready = set()
+        for key, intent in snapshot.intent_index.items():
+            if not intent.rag.enabled:
+                continue
+            store = self._store_for(intent.rag)
+            if store is not None:
+                ready.add(intent.rag.collection_name)
+            elif intent.rag.corpus:
+                self._index_for(snapshot.version, key, intent.rag)
+        return len(ready) + len(self._shared.get(snapshot.version, {}))
+
+    def _store_for(self, rag_config: RagConfig) -> Optional[CorpusStore]:
+        name = rag_config.collection_name
+        if not name:
+            return None
+        store = self._stores.get(name)
+        if store is None:
+            store = self._stores[name] = CorpusStore(CorpusStore.path_for(name))
+        store.refresh_if_stale()
+        return store if store.size else None
 
-        corpus = rag_config.get("mock_corpus", [])
-        top_k = rag_config.get("top_k", 3)
-        if not corpus:
+    def _index_for(self, version: str, key: Tuple[str, str], rag_config: RagConfig) -> HybridIndex:
+        bucket = self._indexes.get(version)
+        if bucket is not None and key in bucket:
+            return bucket[key]
+
+        if bucket is None:
+            bucket = self._indexes[version] = {}
+            self._shared[version] = {}
+            for stale in list(self._indexes)[:-2]:
+                del self._indexes[stale]
+                del self._shared[stale]
+
+        texts = [e["input"] for e in rag_config.corpus]
+        digest = hashlib.sha1(json.dumps(texts, ensure_ascii=False).encode("utf-8")).hexdigest()
+        shared = self._shared[version]
+        if digest not in shared:
+            shared[digest] = HybridIndex.from_texts(texts)
+            logger.info("retrieval index built for %s/%s: %d docs", key[0], key[1], len(texts))
+        bucket[key] = shared[digest]
+        return bucket[key]
+
+    async def get_dynamic_examples(self, scene_id: str, intent_id: str, input_text: str = "", max_tokens: int = 0) -> str:
+        """
+        按输入检索 few-shot 示例并渲染为上下文。
+        max_tokens > 0 时按检索排名放入示例直到用完预算（放不下的跳过），一条都放不下则不带上下文。
+        """
+        snapshot = scenario_manager.snapshot
+        rag_config = snapshot.get_intent(scene_id, intent_id).rag
+
+        if not rag_config.enabled:
             return ""
 
-        sampled = random.sample(corpus, min(top_k, len(corpus)))
-        context_items = [
-            f"Input: {res['input']}\nOutput: {json.dumps(res['output'], ensure_ascii=False)}"
-            for res in sampled
-        ]
+        params = dict(
+            top_k=rag_config.top_k,
+            candidates=rag_config.candidates,
+            fusion=rag_config.fusion,
+            rrf_k=rag_config.rrf_k,
+            mmr_lambda=rag_config.mmr_lambda,
+        )
+        store = self._store_for(rag_config)
+        if store is not None:
+            # 磁盘语料库：示例已在入库时预渲染
+            context_items = [store.rendered(i) for i in store.index.search(input_text, **params)]
+        else:
+            corpus = rag_config.corpus
+            if not corpus:
+                return ""
+            key = (scene_id, intent_id)
+            index = self._indexes.get(snapshot.version, {}).get(key)
+            if index is None:
+                # 配置热更新后首次查询：大语料建索引放到线程里，不阻塞事件循环
+                index = await asyncio.to_thread(self._index_for, snapshot.version, key, rag_config)
+            context_items = [
+                render_example(corpus[i]["input"], corpus[i]["output"])
+                for i in index.search(input_text, **params)
+            ]
+
+        if max_tokens > 0:
+            frame = rag_config.context_format.replace("{retrieved_context}", "")
+            context_items, _ = fit_examples(context_items, max_tokens - estimate_tokens(frame))
+            if not context_items:
+                return ""
+
         retrieved_text = "\n\n".join(context_items)
-        fmt = rag_config.get("context_format", "{retrieved_context}")
 
-        return fmt.replace("{retrieved_context}", retrieved_text)
+        return rag_config.context_format.replace("{retrieved_context}", retrieved_text)
 
-retriever = ExampleRetriever()
\ No newline at end of file
+retriever = ExampleRetriever()
@@ -0,0 +1,113 @@
+import asyncio
+import importlib
+import logging
+import time
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 图模块：导入它会连带加载 langgraph / langchain / LLM SDK / MCP 适配层
+_WORKFLOW_MODULE = "app.workflows.workflow"
+
+
+class AIRuntime:
+    """
+    AI 栈的延迟加载与预热。
+    API 路由、服务层只依赖本模块，导入应用时不再加载 langgraph / langchain 等重依赖：
+    - load()：首次使用时在线程中导入图模块（不阻塞事件循环），并发调用只导入一次
+    - warm_up()：显式预热阶段，导入 + 启动工具客户端 + 预编译执行计划 + 预热 LLM 连接池
+    - status()：就绪状态与各阶段耗时，供 /ready 探针使用
+    """
+
+    def __init__(self):
+        self._workflow: Optional[ModuleType] = None
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._warm_task: Optional[asyncio.Task] = None
+        self.state = "cold"  # cold -> warming -> ready / failed
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    async def load(self) -> ModuleType:
+        if self._workflow is not None:
+            return self._workflow
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self._workflow is None:
+                start = time.perf_counter()
+                self._workflow = await asyncio.to_thread(importlib.import_module, _WORKFLOW_MODULE)
+                self.timings["import_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                logger.info("AI stack loaded in %.0f ms", self.timings["import_ms"])
+        return self._workflow
+
+    async def warm_up(self) -> None:
+        """可重复调用；失败时记录错误并保持可用（请求期仍会按需懒加载）"""
+        if self.ready:
+            return
+        self.state = "warming"
+        try:
+            await self.load()
+            # 图模块已加载，以下导入只是取引用
+            from app.workflows.config import LLM_HTTP_PREWARM, get_llm_http, get_llm_pool
+            from app.workflows.plans import plan_cache
+            from app.workflows.tool_client import tool_client
+
+            start = time.perf_counter()
+            await tool_client.start()
+            self.timings["tool_client_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            self.timings["plans"] = await plan_cache.warm_up()
+            self.timings["plans_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            start = time.perf_counter()
+            base_urls = list(dict.fromkeys(p.spec.base_url for p in get_llm_pool().providers))
+            await get_llm_http().start(base_urls, LLM_HTTP_PREWARM)
+            self.timings["llm_http_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+            self.state = "ready"
+            self.error = None
+        except Exception as e:
+            self.state = "failed"
+            self.error = repr(e)
+            logger.exception("AI stack warm-up failed")
+
+    def start_background(self) -> asyncio.Task:
+        """后台预热：服务立即开始接收请求，/ready 在预热完成后才返回就绪"""
+        if self._warm_task is None or self._warm_task.done():
+            self._warm_task = asyncio.create_task(self.warm_up())
+        return self._warm_task
+
+    async def close(self) -> None:
+        task, self._warm_task = self._warm_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.state = "cold"
+        if self._workflow is None:
+            return
+        from app.workflows.config import get_llm_http
+        from app.workflows.tool_client import tool_client
+
+        await tool_client.close()
+        await get_llm_http().close()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "state": self.state,
+            "loaded": self._workflow is not None,
+            "error": self.error,
+            "timings": dict(self.timings),
+        }
+
+
+ai_runtime = AIRuntime()
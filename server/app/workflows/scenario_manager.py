@@ -1,71 +1,364 @@
+import asyncio
+import hashlib
 import json
+import logging
 import re
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from langchain_core.prompts import ChatPromptTemplate
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from app.common.codes import ResponseCode
+from app.common.exceptions import BizException
+
+if TYPE_CHECKING:
+    from langchain_core.prompts import ChatPromptTemplate
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_PREFIX = "Context:\n{few_shot_context}\n\n"
+_DEFAULT_SUFFIX = "\nInput: {input_text}\nOutput:"
+_DEFAULT_INSTRUCTION = "Process this:"
+# post_clean：客套前缀、```json 围栏
+_LEAD_IN = re.compile(r"^(Here is|Sure,|Here's|Okay,).+?:\s*", re.IGNORECASE)
+_FENCE = re.compile(r"```json\s*|\s*```")
+
+
+class ScenarioNotFoundError(BizException, LookupError):
+    """场景 / 意图 / 语气 ID 不存在"""
+
+    def __init__(self, *ids: str):
+        super().__init__(ResponseCode._40404, f"场景配置不存在: {'/'.join(ids)}")
+
+
+def _freeze(value: Any) -> Any:
+    """递归转换为只读结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+@dataclass(frozen=True, slots=True)
+class RagConfig:
+    """合并后的 RAG 配置（global_rag + local_rag_override），加载期一次性解析"""
+    enabled: bool
+    collection_name: str
+    search_type: str
+    top_k: int
+    context_format: str
+    corpus: Tuple[Mapping, ...]
+    # 混合检索参数：融合方式 rrf / linear、RRF 常数、MMR 相关性权重、每路召回候选数
+    fusion: str
+    rrf_k: int
+    mmr_lambda: float
+    candidates: int
+    raw: Mapping
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+
+@dataclass(frozen=True, slots=True)
+class ToneConfig:
+    id: str
+    name: str
+    llm_params: Mapping
+    system_prompt: str
+    human_prompt: str
+    # 结果可复用（确定性语气，如低温直译），由 scenarios.json 中的 cacheable 显式开启
+    cacheable: bool
+    # 输出 token 上限：语气未配置时继承意图的 max_output_tokens，都为空时取全局默认
+    max_output_tokens: Optional[int]
+    raw: Mapping
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.raw.get(key, default)
+
+
+@dataclass(frozen=True, slots=True)
+class IntentConfig:
+    id: str
+    name: str
+    tones: Tuple[ToneConfig, ...]
+    rag: RagConfig
+    max_output_tokens: Optional[int] = None
+
+
+@dataclass(frozen=True, slots=True)
+class SceneConfig:
+    id: str
+    name: str
+    intents: Tuple[IntentConfig, ...]
+    rag: RagConfig
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return int(value) if value not in (None, "") else None
+
+
+def _build_rag(merged: Dict[str, Any]) -> RagConfig:
+    return RagConfig(
+        enabled=bool(merged.get("enabled", False)),
+        collection_name=str(merged.get("collection_name") or ""),
+        search_type=str(merged.get("search_type") or ""),
+        top_k=int(merged.get("top_k", 3)),
+        context_format=str(merged.get("context_format") or "{retrieved_context}"),
+        corpus=_freeze(list(merged.get("mock_corpus") or [])),
+        fusion=str(merged.get("fusion") or "rrf"),
+        rrf_k=int(merged.get("rrf_k", 60)),
+        mmr_lambda=float(merged.get("mmr_lambda", 0.7)),
+        candidates=int(merged.get("candidates", 50)),
+        raw=_freeze(merged),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class ScenarioSnapshot:
+    """
+    一份完整、只读的场景配置快照：原始场景树 + 哈希索引 + 预编译 Prompt。
+    热加载时整体替换引用，持有旧快照的请求不受影响。
+    """
+    version: str
+    mtime_ns: int
+    scenes: List[dict]
+    scene_index: Mapping
+    intent_index: Mapping
+    tone_index: Mapping
+    prompt_index: Dict
+
+    @staticmethod
+    def build(raw: bytes, mtime_ns: int = 0) -> "ScenarioSnapshot":
+        """解析并校验配置；任何结构错误都会抛出异常，调用方据此保留旧快照"""
+        scenes = json.loads(raw.decode("utf-8")).get("scenes", [])
+        scene_index: Dict[str, SceneConfig] = {}
+        intent_index: Dict[Tuple[str, str], IntentConfig] = {}
+        tone_index: Dict[Tuple[str, str, str], ToneConfig] = {}
+
+        for s in scenes:
+            s_id = s["id"]
+            global_rag = dict(s.get("global_rag", {}))
+            intents = []
+            for i in s.get("intents", []):
+                i_id = i["id"]
+                layout = i.get("human_layout", {})
+                prefix = layout.get("prefix", _DEFAULT_PREFIX)
+                suffix = layout.get("suffix", _DEFAULT_SUFFIX)
+
+                tones = []
+                for t in i.get("tones", []):
+                    prompts = t.get("prompts", {})
+                    tone = ToneConfig(
+                        id=t["id"],
+                        name=t.get("name", t["id"]),
+                        llm_params=_freeze(dict(t.get("llm_params", {}))),
+                        system_prompt=prompts.get("system", ""),
+                        # 三段式 Prompt (Prefix + Instruction + Suffix)
+                        human_prompt=f"{prefix}{prompts.get('instruction', _DEFAULT_INSTRUCTION)}{suffix}",
+                        cacheable=bool(t.get("cacheable", False)),
+                        max_output_tokens=_optional_int(t.get("max_output_tokens", i.get("max_output_tokens"))),
+                        raw=_freeze(t),
+                    )
+                    key = (s_id, i_id, tone.id)
+                    tones.append(tone)
+                    tone_index[key] = tone
+
+                merged_rag = {**global_rag, **i.get("local_rag_override", {})}
+                intent = IntentConfig(
+                    id=i_id, name=i.get("name", i_id), tones=tuple(tones), rag=_build_rag(merged_rag),
+                    max_output_tokens=_optional_int(i.get("max_output_tokens")),
+                )
+                intents.append(intent)
+                intent_index[(s_id, i_id)] = intent
+
+            scene_index[s_id] = SceneConfig(
+                id=s_id, name=s.get("name", s_id), intents=tuple(intents), rag=_build_rag(global_rag)
+            )
+
+        return ScenarioSnapshot(
+            # 配置内容摘要作为版本号 / ETag，下游按版本号判断缓存是否失效
+            version=hashlib.sha1(raw).hexdigest()[:12],
+            mtime_ns=mtime_ns,
+            scenes=scenes,
+            scene_index=MappingProxyType(scene_index),
+            intent_index=MappingProxyType(intent_index),
+            tone_index=MappingProxyType(tone_index),
+            # Prompt 模板对象首次取用时再创建（需要 langchain），加载配置本身只做纯 Python 解析
+            prompt_index={},
+        )
+
+    def get_scene(self, scene_id: str) -> SceneConfig:
+        try:
+            return self.scene_index[scene_id]
+        except KeyError:
+            raise ScenarioNotFoundError(scene_id) from None
+
+    def get_intent(self, scene_id: str, intent_id: str) -> IntentConfig:
+        try:
+            return self.intent_index[(scene_id, intent_id)]
+        except KeyError:
+            raise ScenarioNotFoundError(scene_id, intent_id) from None
+
+    def get_tone(self, scene_id: str, intent_id: str, tone_id: str) -> ToneConfig:
+        try:
+            return self.tone_index[(scene_id, intent_id, tone_id)]
+        except KeyError:
+            raise ScenarioNotFoundError(scene_id, intent_id, tone_id) from None
+
+    def get_prompt_template(self, scene_id: str, intent_id: str, tone_id: str) -> "ChatPromptTemplate":
+        key = (scene_id, intent_id, tone_id)
+        prompt = self.prompt_index.get(key)
+        if prompt is None:
+            from langchain_core.prompts import ChatPromptTemplate
+
+            tone = self.get_tone(*key)
+            prompt = self.prompt_index[key] = ChatPromptTemplate.from_messages([
+                ("system", tone.system_prompt),
+                ("human", tone.human_prompt)
+            ])
+        return prompt
+
 
 class ScenarioManager:
     """
     配置解析引擎。
-    核心职责：将底层的 JSON 结构映射为内存中的配置对象，并提供 RAG 覆盖和提示词动态组装规则。
+    核心职责：将底层的 JSON 结构映射为内存中的只读配置快照，并提供 RAG 覆盖和提示词动态组装规则。
+    加载期完成 RAG 合并、提示词拼装和 (scene, intent, tone) 哈希索引，请求期查找为 O(1)，ID 不存在直接报错。
+    配置文件变更后在后台重新解析校验，成功才原子替换快照；失败保留旧快照继续服务。
     不直接参与业务调用，作为数据提供方被 MCP Server 依赖。
     """
 
     def __init__(self, config_filename: str = "scenarios.json"):
         self.config_file = Path(__file__).parent / config_filename
-        self.scenes = self._load_config().get("scenes", [])
+        self._resolve_path()
+        stat = self.config_file.stat()
+        self._snapshot = ScenarioSnapshot.build(self.config_file.read_bytes(), stat.st_mtime_ns)
+        self._last_check = time.monotonic()
+        # 最近一次解析失败的文件 mtime，同一个坏文件只报一次错
+        self._failed_mtime_ns = 0
+        self._watch_task: Optional[asyncio.Task] = None
 
-    def _load_config(self) -> dict:
+    def _resolve_path(self) -> None:
         if not self.config_file.exists():
             alt_path = self.config_file.parent.parent / self.config_file.name
             if alt_path.exists():
                 self.config_file = alt_path
             else:
                 raise FileNotFoundError(f"配置文件缺失: {self.config_file}")
-        with open(self.config_file, "r", encoding="utf-8") as f:
-            return json.load(f)
 
-    def get_scene(self, scene_id: str) -> dict:
-        return next((s for s in self.scenes if s.get("id") == scene_id), {})
+    # ----------------------------
+    # Snapshot
+    # ----------------------------
+    @property
+    def snapshot(self) -> ScenarioSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> str:
+        return self._snapshot.version
+
+    @property
+    def scenes(self) -> List[dict]:
+        return self._snapshot.scenes
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        文件有变化时重新解析并原子替换快照，返回是否发生了替换。
+        解析或校验失败时抛出异常，当前快照保持不变。
+        """
+        self._last_check = time.monotonic()
+        current = self._snapshot
+        stat = self.config_file.stat()
+        if not force and stat.st_mtime_ns in (current.mtime_ns, self._failed_mtime_ns):
+            return False
+
+        try:
+            snapshot = ScenarioSnapshot.build(self.config_file.read_bytes(), stat.st_mtime_ns)
+        except Exception:
+            self._failed_mtime_ns = stat.st_mtime_ns
+            raise
+        if snapshot.version == current.version:
+            # 内容没变（例如只是 touch），更新 mtime 即可
+            self._snapshot = snapshot
+            return False
+
+        self._snapshot = snapshot
+        logger.info("scenarios reloaded: %s -> %s", current.version, snapshot.version)
+        return True
 
-    def get_intent(self, scene_id: str, intent_id: str) -> dict:
-        scene = self.get_scene(scene_id)
-        return next((i for i in scene.get("intents", []) if i.get("id") == intent_id), {})
+    def refresh_if_stale(self, min_interval: float = 2.0) -> None:
+        """
+        同步节流检查，适合没有后台任务的进程（如 MCP 子进程）在处理请求前调用。
+        """
+        if time.monotonic() - self._last_check < min_interval:
+            return
+        try:
+            self.reload()
+        except Exception as e:
+            logger.warning("scenarios reload failed, keep version %s: %r", self.version, e)
 
-    def get_tone(self, scene_id: str, intent_id: str, tone_id: str) -> dict:
-        intent = self.get_intent(scene_id, intent_id)
-        return next((t for t in intent.get("tones", []) if t.get("id") == tone_id), {})
+    async def watch(self, interval: float = 2.0) -> None:
+        """mtime 轮询；解析放在线程里，不阻塞事件循环"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.reload)
+            except Exception as e:
+                logger.warning("scenarios reload failed, keep version %s: %r", self.version, e)
 
-    def get_rag_config(self, scene_id: str, intent_id: str) -> dict:
-        scene = self.get_scene(scene_id)
-        intent = self.get_intent(scene_id, intent_id)
-        rag_config = scene.get("global_rag", {}).copy()
-        rag_config.update(intent.get("local_rag_override", {}))
-        return rag_config
+    def start_watching(self, interval: float = 2.0) -> None:
+        if interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.create_task(self.watch(interval), name="scenarios-watcher")
 
-    def get_prompt_template(self, scene_id: str, intent_id: str, tone_id: str) -> ChatPromptTemplate:
-        """组装三段式 Prompt 模板 (Prefix + Instruction + Suffix)"""
-        intent = self.get_intent(scene_id, intent_id)
-        tone = self.get_tone(scene_id, intent_id, tone_id)
+    async def stop_watching(self) -> None:
+        task, self._watch_task = self._watch_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
-        sys_prompt = tone.get("prompts", {}).get("system", "")
+    # ----------------------------
+    # Lookups（均基于当前快照）
+    # ----------------------------
+    def get_scene(self, scene_id: str) -> SceneConfig:
+        return self._snapshot.get_scene(scene_id)
 
-        layout = intent.get("human_layout", {})
-        prefix = layout.get("prefix", "Context:\n{few_shot_context}\n\n")
-        suffix = layout.get("suffix", "\nInput: {input_text}\nOutput:")
-        instruction = tone.get("prompts", {}).get("instruction", "Process this:")
+    def get_intent(self, scene_id: str, intent_id: str) -> IntentConfig:
+        return self._snapshot.get_intent(scene_id, intent_id)
 
-        final_human_prompt = f"{prefix}{instruction}{suffix}"
+    def get_tone(self, scene_id: str, intent_id: str, tone_id: str) -> ToneConfig:
+        return self._snapshot.get_tone(scene_id, intent_id, tone_id)
 
-        return ChatPromptTemplate.from_messages([
-            ("system", sys_prompt),
-            ("human", final_human_prompt)
-        ])
+    def iter_keys(self) -> Iterator[Tuple[str, str, str]]:
+        """遍历全部 (scene_id, intent_id, tone_id) 组合"""
+        return iter(self._snapshot.tone_index)
+
+    def get_rag_config(self, scene_id: str, intent_id: str) -> RagConfig:
+        return self._snapshot.get_intent(scene_id, intent_id).rag
+
+    def get_prompt_template(self, scene_id: str, intent_id: str, tone_id: str) -> "ChatPromptTemplate":
+        """返回预编译的三段式 Prompt 模板 (Prefix + Instruction + Suffix)"""
+        return self._snapshot.get_prompt_template(scene_id, intent_id, tone_id)
+
+    @staticmethod
+    def strip_lead_in(text: str) -> str:
+        """去掉开头的 "Here is ...:" 之类客套前缀"""
+        return _LEAD_IN.sub("", text, count=1)
+
+    @staticmethod
+    def strip_fences(text: str) -> str:
+        """去掉 ```json / ``` 围栏"""
+        return _FENCE.sub("", text)
 
     @staticmethod
     def post_clean(text: str) -> str:
         s = (text or "").strip().strip('"').strip("'")
-        s = re.sub(r"^(Here is|Sure,|Here's|Okay,).+?:\s*", "", s, flags=re.IGNORECASE)
-        s = re.sub(r"```json\s*|\s*```", "", s)
+        s = ScenarioManager.strip_lead_in(s)
+        s = ScenarioManager.strip_fences(s)
         return s.strip()
 
-scenario_manager = ScenarioManager()
\ No newline at end of file
+scenario_manager = ScenarioManager()
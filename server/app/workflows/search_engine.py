@@ -0,0 +1,256 @@
+import hashlib
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_RUN = re.compile(f"[{_CJK}]+")
+_TOKEN = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+
+DEFAULT_DIM = 256
+
+
+def tokenize(text: str) -> List[str]:
+    """中文按字二元组切分（单字片段保留单字），其余文字按词切分；NFKC + 小写"""
+    tokens: List[str] = []
+    for run in _TOKEN.findall(unicodedata.normalize("NFKC", text or "").lower()):
+        if _CJK_RUN.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+@lru_cache(maxsize=65536)
+def term_hash(term: str) -> int:
+    """词项的稳定 64 位哈希；倒排表按它排序存储，落盘后跨进程保持一致"""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _hash_features(tokens: Sequence[str]) -> List[str]:
+    """稠密向量特征：二元组 + 中文单字，单字让只差一个字的近义表达也能相互召回"""
+    feats = list(tokens)
+    for t in tokens:
+        if len(t) == 2 and _CJK_RUN.fullmatch(t):
+            feats.append(t[0])
+    return feats
+
+
+def embed(tokens: Sequence[str], dim: int = DEFAULT_DIM) -> np.ndarray:
+    """signed feature hashing：tf 取对数，L2 归一化"""
+    vec = np.zeros(dim, dtype=np.float32)
+    for feat, tf in Counter(_hash_features(tokens)).items():
+        h = zlib.crc32(feat.encode("utf-8"))
+        vec[h % dim] += (1.0 + math.log(tf)) * (1.0 if h & 0x80000000 else -1.0)
+    n = float(np.linalg.norm(vec))
+    return vec / n if n else vec
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    一段不可变的索引数据，全部是扁平 NumPy 数组，可以直接落盘并以 mmap 方式打开。
+    - vocab / post_off / post_doc / post_tf：按词项哈希排序的倒排表（CSR）
+    - doclen：文档长度（词项数），BM25 长度归一化用
+    - columns：稠密向量，按维度转置存储（dim x n），稀疏查询向量只取非零维度对应的行做乘加
+    """
+    vocab: np.ndarray
+    post_off: np.ndarray
+    post_doc: np.ndarray
+    post_tf: np.ndarray
+    doclen: np.ndarray
+    columns: np.ndarray
+
+    ARRAYS = ("vocab", "post_off", "post_doc", "post_tf", "doclen", "columns")
+
+    @property
+    def size(self) -> int:
+        return len(self.doclen)
+
+    @staticmethod
+    def build(texts: Sequence[str], dim: int = DEFAULT_DIM) -> "Segment":
+        docs = [tokenize(t) for t in texts]
+        postings: Dict[int, List[tuple]] = {}
+        for doc_id, doc in enumerate(docs):
+            for term, tf in Counter(doc).items():
+                postings.setdefault(term_hash(term), []).append((doc_id, tf))
+
+        vocab = sorted(postings)
+        post_off = np.zeros(len(vocab) + 1, dtype=np.int64)
+        post_doc: List[int] = []
+        post_tf: List[int] = []
+        for i, h in enumerate(vocab):
+            for doc_id, tf in postings[h]:
+                post_doc.append(doc_id)
+                post_tf.append(tf)
+            post_off[i + 1] = len(post_doc)
+
+        vectors = np.zeros((len(docs), dim), dtype=np.float32)
+        for doc_id, doc in enumerate(docs):
+            vectors[doc_id] = embed(doc, dim)
+
+        return Segment(
+            vocab=np.array(vocab, dtype=np.uint64),
+            post_off=post_off,
+            post_doc=np.array(post_doc, dtype=np.int32),
+            post_tf=np.array(post_tf, dtype=np.float32),
+            doclen=np.array([len(d) for d in docs], dtype=np.int32),
+            columns=np.ascontiguousarray(vectors.T),
+        )
+
+    def lookup(self, h: int) -> slice:
+        """词项在倒排表中的区间；不存在时返回空区间"""
+        i = int(np.searchsorted(self.vocab, np.uint64(h)))
+        if i < len(self.vocab) and int(self.vocab[i]) == h:
+            return slice(int(self.post_off[i]), int(self.post_off[i + 1]))
+        return slice(0, 0)
+
+
+class HybridIndex:
+    """
+    进程内混合检索索引，由一个或多个 Segment 组成（追加写入只新增 Segment，旧数据不重建）。
+    查询期只做 NumPy 向量运算：
+    - 稀疏：BM25（中文字二元组），df / avgdl 跨全部 Segment 统计
+    - 稠密：特征哈希向量（signed hashing trick，纯 CPU、无模型依赖）的内积
+    - 融合：rrf（倒数排名融合）或 linear（归一化分数加权）
+    - 选择：在融合后的候选集上做 MMR，兼顾相关性和多样性
+    文档下标按 Segment 顺序全局编号。
+    """
+
+    def __init__(
+        self,
+        segments: Sequence[Segment],
+        k1: float = 1.5,
+        b: float = 0.75,
+        origin: Optional[np.ndarray] = None,
+    ):
+        self.segments = list(segments)
+        self.k1 = k1
+        self.b = b
+        self.dim = self.segments[0].columns.shape[0] if self.segments else DEFAULT_DIM
+        self._bases = np.cumsum([0] + [s.size for s in self.segments])
+        self.size = int(self._bases[-1])
+        total_len = sum(int(s.doclen.sum(dtype=np.int64)) for s in self.segments)
+        self._avgdl = total_len / self.size if self.size and total_len else 1.0
+        # 内部下标 -> 调用方下标（from_texts 去重后使用）
+        self._origin = origin
+
+    @classmethod
+    def from_texts(cls, texts: Sequence[str], dim: int = DEFAULT_DIM) -> "HybridIndex":
+        """内存构建；完全相同的文本只索引第一条，避免候选集被重复示例占满，返回的仍是原始下标"""
+        first: Dict[str, int] = {}
+        for i, t in enumerate(texts):
+            first.setdefault(t, i)
+        origin = np.fromiter(first.values(), dtype=np.int64, count=len(first))
+        return cls([Segment.build(list(first), dim)], origin=origin)
+
+    def _bm25(self, tokens: Sequence[str]) -> np.ndarray:
+        scores = np.zeros(self.size, dtype=np.float32)
+        k1, b = self.k1, self.b
+        bases = self._bases.tolist()
+        for term in set(tokens):
+            h = term_hash(term)
+            hits = [(seg, base, seg.lookup(h)) for seg, base in zip(self.segments, bases)]
+            df = sum(sl.stop - sl.start for _, _, sl in hits)
+            if not df:
+                continue
+            idf = math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+            for seg, base, sl in hits:
+                if sl.stop == sl.start:
+                    continue
+                docs = seg.post_doc[sl]
+                tf = seg.post_tf[sl]
+                norm = k1 * (1 - b + b * seg.doclen[docs] / self._avgdl)
+                # 同一词项的文档 ID 不重复，可以直接花式索引累加
+                scores[base + docs] += idf * tf * (k1 + 1) / (tf + norm)
+        return scores
+
+    def _dense(self, query_vec: np.ndarray) -> np.ndarray:
+        nz = np.flatnonzero(query_vec)
+        if not len(nz):
+            return np.zeros(self.size, dtype=np.float32)
+        q = query_vec[nz]
+        return np.concatenate([q @ seg.columns[nz] for seg in self.segments])
+
+    def _vectors(self, ids: np.ndarray) -> np.ndarray:
+        """按全局下标取稠密向量（len(ids) x dim）"""
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        seg_idx = np.searchsorted(self._bases, ids, side="right") - 1
+        for s in np.unique(seg_idx).tolist():
+            mask = seg_idx == s
+            out[mask] = self.segments[s].columns[:, ids[mask] - self._bases[s]].T
+        return out
+
+    @staticmethod
+    def _top(scores: np.ndarray, n: int) -> np.ndarray:
+        """分数 > 0 的前 n 个文档下标（降序）"""
+        positive = np.flatnonzero(scores > 0)
+        if len(positive) > n:
+            positive = positive[np.argpartition(-scores[positive], n - 1)[:n]]
+        return positive[np.argsort(-scores[positive], kind="stable")]
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        candidates: int = 50,
+        fusion: str = "rrf",
+        rrf_k: int = 60,
+        alpha: float = 0.5,
+        mmr_lambda: float = 0.7,
+    ) -> List[int]:
+        """返回选中的文档下标；查询无任何命中时按文档顺序返回前 top_k 条"""
+        if not self.size or top_k <= 0:
+            return []
+        tokens = tokenize(query)
+        sparse = self._bm25(tokens)
+        dense = self._dense(embed(tokens, self.dim))
+
+        sparse_top = self._top(sparse, candidates)
+        dense_top = self._top(dense, candidates)
+        fused: Dict[int, float] = {}
+        if fusion == "linear":
+            for top, scores, weight in ((sparse_top, sparse, alpha), (dense_top, dense, 1 - alpha)):
+                if len(top):
+                    peak = float(scores[top[0]])
+                    for doc_id in top.tolist():
+                        fused[doc_id] = fused.get(doc_id, 0.0) + weight * float(scores[doc_id]) / peak
+        else:
+            for top in (sparse_top, dense_top):
+                for rank, doc_id in enumerate(top.tolist()):
+                    fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+        if fused:
+            selected = self._mmr(fused, top_k, mmr_lambda)
+        else:
+            selected = np.arange(min(top_k, self.size))
+        return (self._origin[selected] if self._origin is not None else selected).tolist()
+
+    def _mmr(self, fused: Dict[int, float], top_k: int, mmr_lambda: float) -> np.ndarray:
+        ids = np.fromiter(fused.keys(), dtype=np.int64, count=len(fused))
+        relevance = np.fromiter(fused.values(), dtype=np.float32, count=len(fused))
+        relevance /= relevance.max()
+        vectors = self._vectors(ids)
+        sim = vectors @ vectors.T
+
+        selected: List[int] = []
+        max_sim = np.zeros(len(ids), dtype=np.float32)
+        available = np.ones(len(ids), dtype=bool)
+        for _ in range(min(top_k, len(ids))):
+            score = mmr_lambda * relevance - (1 - mmr_lambda) * max_sim
+            score[~available] = -np.inf
+            pick = int(np.argmax(score))
+            selected.append(pick)
+            available[pick] = False
+            np.maximum(max_sim, sim[:, pick], out=max_sim)
+        return ids[selected]
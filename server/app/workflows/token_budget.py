@@ -0,0 +1,159 @@
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.workflows.config import (
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_MIN_OUTPUT_TOKENS,
+    LLM_OUTPUT_BASE_TOKENS,
+    LLM_OUTPUT_RATIO,
+    LLM_PROMPT_BUDGET,
+)
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字及全角标点：按 1 字 1 token 估算（主流 BPE 词表实际约 0.6~1，取上界保证不超预算）
+_WIDE = re.compile("[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+# 每条消息的角色 / 分隔符开销
+_MESSAGE_OVERHEAD = 4
+# 按 max_tokens 分桶统计延迟
+_BUCKETS = (256, 512, 1024)
+
+
+def estimate_tokens(text: str) -> int:
+    """本地快速 token 估算：宽字符 1 字 1 token，其余约 4 个字符 1 token；不依赖分词器"""
+    if not text:
+        return 0
+    wide = len(_WIDE.findall(text))
+    return wide + (len(text) - wide + 3) // 4
+
+
+def fit_examples(examples: Sequence[str], budget: int, separator: str = "\n\n") -> Tuple[List[str], int]:
+    """
+    按检索排名依次放入示例，放不下的跳过（后面更短的仍可能放得下），返回 (选中的示例, 占用 token)。
+    budget <= 0 表示不限制。
+    """
+    if budget <= 0:
+        return list(examples), sum(estimate_tokens(e) for e in examples)
+    sep = estimate_tokens(separator)
+    kept: List[str] = []
+    used = 0
+    for example in examples:
+        cost = estimate_tokens(example) + (sep if kept else 0)
+        if used + cost <= budget:
+            kept.append(example)
+            used += cost
+    return kept, used
+
+
+@dataclass(frozen=True)
+class BudgetDecision:
+    """单次调用的预算决策，调用结束后连同耗时一起记录"""
+    input_tokens: int
+    prompt_tokens: int
+    few_shot_tokens: int
+    max_tokens: int
+    cap: int
+
+
+class TokenBudget:
+    """
+    Prompt / 输出 token 预算。
+    - 输出：max_tokens = base + ratio × 输入 token，夹在 [min_output, cap] 之间；cap 取语气 / 意图配置，缺省为全局上限
+    - Prompt：总预算扣除模板和输入后，剩余部分留给 few-shot 示例（检索端按排名裁剪）
+    - 记录每次决策的 token 数与耗时，按 max_tokens 分桶，便于观察对延迟和成本的影响
+    """
+
+    def __init__(
+        self,
+        prompt_budget: int = 3000,
+        default_cap: int = 1024,
+        min_output: int = 192,
+        output_base: int = 96,
+        output_ratio: float = 3.0,
+    ):
+        self.prompt_budget = prompt_budget
+        self.default_cap = default_cap
+        self.min_output = min_output
+        self.output_base = output_base
+        self.output_ratio = output_ratio
+
+        self.requests = 0
+        self.retried = 0
+        self.near_limit = 0
+        self._sums = {"input": 0, "prompt": 0, "few_shot": 0, "max_tokens": 0, "output": 0, "reserved_saved": 0}
+        self._buckets: Dict[str, Dict[str, float]] = {}
+
+    def examples_budget(self, template_tokens: int, input_text: str) -> int:
+        """few-shot 示例可用的 token 数（至少保留 0）"""
+        return max(0, self.prompt_budget - template_tokens - estimate_tokens(input_text) - 2 * _MESSAGE_OVERHEAD)
+
+    def output_tokens(self, input_tokens: int, cap: Optional[int] = None) -> int:
+        cap = cap or self.default_cap
+        wanted = self.output_base + int(self.output_ratio * input_tokens)
+        return max(min(self.min_output, cap), min(wanted, cap))
+
+    def decide(self, template_tokens: int, input_text: str, few_shot_context: str, cap: Optional[int] = None) -> BudgetDecision:
+        input_tokens = estimate_tokens(input_text)
+        few_shot_tokens = estimate_tokens(few_shot_context)
+        cap = cap or self.default_cap
+        return BudgetDecision(
+            input_tokens=input_tokens,
+            prompt_tokens=template_tokens + input_tokens + few_shot_tokens + 2 * _MESSAGE_OVERHEAD,
+            few_shot_tokens=few_shot_tokens,
+            max_tokens=self.output_tokens(input_tokens, cap),
+            cap=cap,
+        )
+
+    def record(self, decision: BudgetDecision, latency: float, output_text: str = "") -> None:
+        output_tokens = estimate_tokens(output_text)
+        self.requests += 1
+        sums = self._sums
+        sums["input"] += decision.input_tokens
+        sums["prompt"] += decision.prompt_tokens
+        sums["few_shot"] += decision.few_shot_tokens
+        sums["max_tokens"] += decision.max_tokens
+        sums["output"] += output_tokens
+        sums["reserved_saved"] += max(0, self.default_cap - decision.max_tokens)
+        if output_tokens >= 0.9 * decision.max_tokens:
+            self.near_limit += 1
+
+        bucket = next((f"<={b}" for b in _BUCKETS if decision.max_tokens <= b), f">{_BUCKETS[-1]}")
+        stat = self._buckets.setdefault(bucket, {"count": 0, "latency_ms": 0.0})
+        stat["count"] += 1
+        stat["latency_ms"] += latency * 1000
+        logger.debug("token budget %s latency=%.0fms output~%d", decision, latency * 1000, output_tokens)
+
+    def record_retry(self) -> None:
+        """输出被 max_tokens 截断、按上限重试"""
+        self.retried += 1
+
+    def stats(self) -> Dict[str, Any]:
+        n = max(self.requests, 1)
+        return {
+            "prompt_budget": self.prompt_budget,
+            "default_cap": self.default_cap,
+            "requests": self.requests,
+            "avg_input_tokens": round(self._sums["input"] / n, 1),
+            "avg_prompt_tokens": round(self._sums["prompt"] / n, 1),
+            "avg_few_shot_tokens": round(self._sums["few_shot"] / n, 1),
+            "avg_max_tokens": round(self._sums["max_tokens"] / n, 1),
+            "avg_output_tokens": round(self._sums["output"] / n, 1),
+            "reserved_tokens_saved": self._sums["reserved_saved"],
+            "near_limit": self.near_limit,
+            "retried": self.retried,
+            "latency_by_max_tokens": {
+                k: {"count": int(v["count"]), "avg_latency_ms": round(v["latency_ms"] / v["count"], 1)}
+                for k, v in sorted(self._buckets.items())
+            },
+        }
+
+
+token_budget = TokenBudget(
+    prompt_budget=LLM_PROMPT_BUDGET,
+    default_cap=LLM_MAX_OUTPUT_TOKENS,
+    min_output=LLM_MIN_OUTPUT_TOKENS,
+    output_base=LLM_OUTPUT_BASE_TOKENS,
+    output_ratio=LLM_OUTPUT_RATIO,
+)
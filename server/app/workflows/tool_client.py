@@ -0,0 +1,77 @@
+from typing import Any, Dict, Optional, Protocol
+
+from app.workflows.config import (
+    MCP_SERVERS, MCP_TRANSPORT, MCP_POOL_SIZE, MCP_HEALTH_INTERVAL, MCP_CALL_TIMEOUT
+)
+from app.workflows.mcp_pool import MCPSessionPool
+
+
+def extract_mcp_text(response) -> str:
+    """提取 MCP 标准响应中的文本内容"""
+    if hasattr(response, 'content') and isinstance(response.content, list):
+        return "".join(item.text for item in response.content if hasattr(item, 'text'))
+    return str(response)
+
+
+class ToolClient(Protocol):
+    """图节点依赖的工具调用接口：无论走哪种传输，返回值都带有 MCP 风格的 content 列表"""
+
+    async def start(self) -> None: ...
+
+    async def close(self) -> None: ...
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any: ...
+
+    def stats(self) -> Dict[str, Any]: ...
+
+
+class InProcessToolClient:
+    """
+    进程内工具客户端。
+    API 服务与 mcp_server 部署在同一主机时，直接在当前事件循环里调用 FastMCP 实例上注册的工具，
+    跳过 JSON-RPC 序列化和 stdio 管道；mcp_server 本身不变，外部客户端（Cursor 等）仍走协议。
+    """
+
+    def __init__(self):
+        self._mcp = None
+        self._tools: Dict[str, Any] = {}
+        self.calls = 0
+
+    async def start(self) -> None:
+        if self._mcp is None:
+            # 延迟导入：只有 inproc 模式才在 API 进程里加载 fastmcp
+            from app.workflows.mcp_server import mcp
+            self._mcp = mcp
+
+    async def close(self) -> None:
+        self._tools.clear()
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        await self.start()
+        tool = self._tools.get(name)
+        if tool is None:
+            tool = await self._mcp.get_tool(name)
+            self._tools[name] = tool
+        self.calls += 1
+        return await tool.run(arguments)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": "inproc", "calls": self.calls}
+
+
+def build_tool_client(transport: Optional[str] = None) -> ToolClient:
+    transport = (transport or MCP_TRANSPORT).lower()
+    if transport == "inproc":
+        return InProcessToolClient()
+    if transport == "stdio":
+        return MCPSessionPool(
+            MCP_SERVERS,
+            "style_server",
+            size=MCP_POOL_SIZE,
+            health_interval=MCP_HEALTH_INTERVAL,
+            call_timeout=MCP_CALL_TIMEOUT,
+        )
+    raise ValueError(f"不支持的 MCP_TRANSPORT: {transport}（可选 stdio / inproc）")
+
+
+tool_client = build_tool_client()
@@ -1,96 +1,95 @@
 import json
-from typing import TypedDict
+import time
+from contextlib import aclosing
+from dataclasses import replace
+from typing import AsyncIterator, Optional, TypedDict
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END, START
-from langchain_core.output_parsers import JsonOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_mcp_adapters.client import MultiServerMCPClient
 
-from app.workflows.config import llm
-from app.workflows.scenario_manager import scenario_manager
+from app.workflows.plans import plan_cache
+from app.workflows.tool_client import tool_client, extract_mcp_text
+from app.workflows.json_stream import JsonFieldStreamer, IncrementalCleaner
+from app.workflows.admission import llm_admission, Priority
+from app.workflows.token_budget import token_budget
 
 class AgentState(TypedDict):
     scene_id: str
     intent_id: str
     tone_id: str
     input_text: str
+    scenario_version: str
+    use_rag: bool
     few_shot_context: str
     final_output: dict
 
-# 配置 MCP 客户端，通过 stdio 协议启动服务进程
-MCP_SERVERS = {
-    "style_server": {
-        "command": "python",
-        "args": ["-m", "app.workflows.mcp_server"],
-        "transport": "stdio"
-    }
-}
-
-def extract_mcp_text(response) -> str:
-    """提取 MCP 标准响应中的文本内容"""
-    if hasattr(response, 'content') and isinstance(response.content, list):
-        return "".join(item.text for item in response.content if hasattr(item, 'text'))
-    return str(response)
-
 async def analyze_node(state: AgentState):
+    """解析场景三元组，并确保对应的执行计划已编译（首次请求编译，之后直接命中）"""
+    s_id = state.get("scene_id", "reddit")
+    i_id = state.get("intent_id", "venting")
+    t_id = state.get("tone_id", "sarcastic")
+    plan = await plan_cache.get(s_id, i_id, t_id)
     return {
-        "scene_id": state.get("scene_id", "reddit"),
-        "intent_id": state.get("intent_id", "venting"),
-        "tone_id": state.get("tone_id", "sarcastic")
+        "scene_id": s_id,
+        "intent_id": i_id,
+        "tone_id": t_id,
+        "scenario_version": plan.version,
+        "use_rag": plan.rag_enabled
     }
 
 async def retrieve_node(state: AgentState):
-    """【修复点1】通过 session 调用工具"""
-    client = MultiServerMCPClient(MCP_SERVERS)
-
-    # 使用新版 API: 开启指定 server 的 session
-    async with client.session("style_server") as session:
-        # 使用 session.call_tool 替代 client.invoke_tool，参数名改为 arguments
-        response = await session.call_tool(
-            "fetch_reddit_context",
-            arguments={"scene_id": state["scene_id"], "intent_id": state["intent_id"]}
-        )
-        context = extract_mcp_text(response)
+    """通过工具客户端（常驻会话池 / 进程内直连）调用检索工具；示例按 Prompt 预算裁剪"""
+    plan = await plan_cache.get(
+        state["scene_id"], state["intent_id"], state["tone_id"], version=state.get("scenario_version")
+    )
+    input_text = state.get("input_text", "")
+    response = await tool_client.call_tool(
+        "fetch_reddit_context",
+        arguments={
+            "scene_id": state["scene_id"],
+            "intent_id": state["intent_id"],
+            "input_text": input_text,
+            "max_tokens": token_budget.examples_budget(plan.template_tokens, input_text),
+        }
+    )
+    context = extract_mcp_text(response)
 
     return {"few_shot_context": context}
 
-async def generate_node(state: AgentState):
-    """【修复点2】通过 session 调用工具获取 Prompt，并调度大模型生成结果"""
-    s_id, i_id, t_id = state["scene_id"], state["intent_id"], state["tone_id"]
-
-    # 1. IPC 通信获取提示词
-    client = MultiServerMCPClient(MCP_SERVERS)
-    async with client.session("style_server") as session:
-        response = await session.call_tool(
-            "build_prompt_template",
-            arguments={"scene_id": s_id, "intent_id": i_id, "tone_id": t_id}
-        )
-        prompt_data_str = extract_mcp_text(response)
-        prompts = json.loads(prompt_data_str)
-
-    # 2. 动态重组 LangChain Prompt
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", prompts["system"]),
-        ("human", prompts["human"])
-    ])
-
-    # 3. 绑定参数并执行大模型调用
-    tone_config = scenario_manager.get_tone(s_id, i_id, t_id)
-    bound_llm = llm.bind(**tone_config.get("llm_params", {}))
-    chain = prompt_template | bound_llm | JsonOutputParser()
-
-    result = await chain.ainvoke({
+async def generate_node(state: AgentState, config: RunnableConfig):
+    """
+    取出预编译的执行计划，只做变量替换和大模型调用；与 analyze 阶段使用同一配置版本。
+    大模型调用经过准入控制，优先级和排队截止时间由调用方通过 config["configurable"] 传入。
+    """
+    plan = await plan_cache.get(
+        state["scene_id"], state["intent_id"], state["tone_id"], version=state.get("scenario_version")
+    )
+
+    inputs = {
         "few_shot_context": state.get("few_shot_context", ""),
         "input_text": state["input_text"]
-    })
-
-    if "english" in result:
-        result["english"] = scenario_manager.post_clean(result["english"])
+    }
+    decision = token_budget.decide(
+        plan.template_tokens, inputs["input_text"], inputs["few_shot_context"], plan.max_output_tokens
+    )
+
+    configurable = config.get("configurable", {})
+    async with llm_admission.slot(configurable.get("priority", Priority.NORMAL), configurable.get("deadline")):
+        start = time.monotonic()
+        try:
+            result = await plan.sized_chain(decision.max_tokens).ainvoke(inputs)
+        except OutputParserException:
+            if decision.max_tokens >= decision.cap:
+                raise
+            # 按输入估算的 max_tokens 不够、JSON 被截断：按上限重试一次
+            token_budget.record_retry()
+            result = await plan.sized_chain(decision.cap).ainvoke(inputs)
+    token_budget.record(decision, time.monotonic() - start, json.dumps(result, ensure_ascii=False))
 
     return {"final_output": result}
 
 def route_by_rag(state: AgentState):
-    cfg = scenario_manager.get_rag_config(state["scene_id"], state["intent_id"])
-    return "retrieve" if cfg.get("enabled", False) else "generate"
+    return "retrieve" if state.get("use_rag") else "generate"
 
 # 构建图结构
 builder = StateGraph(AgentState)
@@ -103,4 +102,60 @@ builder.add_conditional_edges("analyze", route_by_rag, {"retrieve": "retrieve",
 builder.add_edge("retrieve", "generate")
 builder.add_edge("generate", END)
 
-app_graph = builder.compile()
\ No newline at end of file
+app_graph = builder.compile()
+
+
+# 流式接口：准备阶段（analyze / retrieve）复用同一组节点，生成阶段由 stream_generate 逐 token 输出
+prepare_builder = StateGraph(AgentState)
+prepare_builder.add_node("analyze", analyze_node)
+prepare_builder.add_node("retrieve", retrieve_node)
+
+prepare_builder.add_edge(START, "analyze")
+prepare_builder.add_conditional_edges("analyze", route_by_rag, {"retrieve": "retrieve", "generate": END})
+prepare_builder.add_edge("retrieve", END)
+
+prepare_graph = prepare_builder.compile()
+
+async def stream_generate(
+    state: AgentState, priority: int = Priority.NORMAL, deadline: Optional[float] = None
+) -> AsyncIterator[dict]:
+    """
+    generate_node 的流式版本。
+    产出 {"delta": str}（english 字段经增量 post_clean 后的新增文本），最后产出 {"final_output": dict}。
+    顶层 JSON 对象一闭合就关闭上游流，不再为尾部多余 token 付费。
+    """
+    plan = await plan_cache.get(
+        state["scene_id"], state["intent_id"], state["tone_id"], version=state.get("scenario_version")
+    )
+    streamer = JsonFieldStreamer("english")
+    cleaner = IncrementalCleaner()
+    inputs = {
+        "few_shot_context": state.get("few_shot_context", ""),
+        "input_text": state["input_text"]
+    }
+    # 已推给客户端的增量无法撤回，截断后不能像 generate_node 那样按上限重试，直接按上限生成；
+    # 顶层对象闭合即关闭上游流，实际输出长度不受影响
+    decision = token_budget.decide(
+        plan.template_tokens, inputs["input_text"], inputs["few_shot_context"], plan.max_output_tokens
+    )
+    decision = replace(decision, max_tokens=decision.cap)
+
+    # 流式调用在整个生成期间占用一个准入名额
+    async with llm_admission.slot(priority, deadline):
+        start = time.monotonic()
+        stream = plan.sized_chain(decision.max_tokens, streaming=True).astream(inputs)
+        async with aclosing(stream):
+            async for chunk in stream:
+                delta = cleaner.feed(streamer.feed(chunk))
+                if delta:
+                    yield {"delta": delta}
+                if streamer.done:
+                    break
+
+    token_budget.record(decision, time.monotonic() - start, streamer.text)
+
+    delta = cleaner.finish()
+    if delta:
+        yield {"delta": delta}
+
+    yield {"final_output": streamer.result()}
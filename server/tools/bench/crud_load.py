@@ -0,0 +1,217 @@
+# tools/bench/crud_load.py
+"""
+codegen CRUD 栈负载测试：用 specs/saas.spec.json 分别按 async_db=true / false 生成两套完整代码
+（service 基类、schema、model、路由）到临时目录，各自接一个 SQLite 库（异步版 aiosqlite + AsyncSession，
+同步版 sqlite3 + Session），用同样的并发压同一个实体的 save + paging 接口。
+
+对比吞吐、延迟分位数，以及压测期间事件循环的最大停顿（同步版每个请求都要进 Starlette 线程池，
+线程池占满后请求排队；异步版所有数据库访问都在事件循环里 await）。
+
+用法（在 server 目录下）：
+  python -m tools.bench.crud_load
+  python -m tools.bench.crud_load --requests 2000 --concurrency 64 --entity CntDefaultKeyword
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import statistics
+import sys
+import tempfile
+import textwrap
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import httpx
+from fastapi import FastAPI
+from jose import jwt
+
+from app.core.config import settings
+from tools.codegen.main import CodegenConfig, generate, guess_entity_file_stem, load_spec, snake_case
+
+SPEC = Path(__file__).resolve().parents[2] / "specs" / "saas.spec.json"
+TICK = 0.01
+
+_BASE = """
+from sqlalchemy.orm import DeclarativeBase
+
+
+class Base(DeclarativeBase):
+    pass
+"""
+
+# 鉴权沿用 app.deps，只把 get_db / service 注入换成各自的数据库连接
+_ASYNC_DEPS = """
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.deps import get_ctx, get_ctx_required, require_perm
+
+engine = create_async_engine("sqlite+aiosqlite:///{db}", connect_args={{"timeout": 30}})
+SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+
+
+async def get_db():
+    async with SessionLocal() as session:
+        yield session
+
+
+def provide_service(service_cls):
+    async def _dep(db=Depends(get_db), ctx=Depends(get_ctx_required)):
+        return service_cls(db, ctx)
+    return _dep
+
+
+def provide_service_optional(service_cls):
+    async def _dep(db=Depends(get_db), ctx=Depends(get_ctx)):
+        return service_cls(db, ctx)
+    return _dep
+
+
+async def create_all(metadata):
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.create_all)
+"""
+
+_SYNC_DEPS = """
+from fastapi import Depends
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.deps import get_ctx, get_ctx_required, require_perm
+
+engine = create_engine("sqlite:///{db}", connect_args={{"timeout": 30, "check_same_thread": False}})
+SessionLocal = sessionmaker(engine, expire_on_commit=False)
+
+
+def get_db():
+    with SessionLocal() as session:
+        yield session
+
+
+def provide_service(service_cls):
+    def _dep(db=Depends(get_db), ctx=Depends(get_ctx_required)):
+        return service_cls(db, ctx)
+    return _dep
+
+
+def provide_service_optional(service_cls):
+    def _dep(db=Depends(get_db), ctx=Depends(get_ctx)):
+        return service_cls(db, ctx)
+    return _dep
+
+
+async def create_all(metadata):
+    metadata.create_all(engine)
+"""
+
+
+async def build_app(root: Path, async_db: bool) -> FastAPI:
+    pkg = "crudbench_async" if async_db else "crudbench_sync"
+    pkg_dir = root / pkg
+    pkg_dir.mkdir(parents=True)
+    (pkg_dir / "__init__.py").write_text("", encoding="utf-8")
+    (pkg_dir / "base.py").write_text(textwrap.dedent(_BASE), encoding="utf-8")
+    deps = _ASYNC_DEPS if async_db else _SYNC_DEPS
+    (pkg_dir / "deps.py").write_text(deps.format(db=(root / f"{pkg}.db").as_posix()), encoding="utf-8")
+
+    cfg = CodegenConfig(app_dir=pkg, app_pkg=pkg, async_db=async_db)
+    cfg.imports = {
+        "base": f"{pkg}.base:Base",
+        "deps": f"{pkg}.deps:get_db,get_ctx,get_ctx_required,require_perm,provide_service,provide_service_optional",
+        "res": "app.common.res:Res",
+    }
+    generate(load_spec(SPEC), root, cfg, clean=False, spec_path=SPEC)
+
+    router = importlib.import_module(f"{pkg}.api.router")
+    base = importlib.import_module(f"{pkg}.base")
+    await importlib.import_module(f"{pkg}.deps").create_all(base.Base.metadata)
+
+    app = FastAPI()
+    app.include_router(router.api_router)
+    return app
+
+
+async def heartbeat(stop: asyncio.Event, gaps: List[float]) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        gaps.append(now - last - TICK)
+        last = now
+
+
+async def load(app: FastAPI, prefix: str, requests: int, concurrency: int) -> Tuple[float, List[float], float, int]:
+    """save / paging 交替；返回 (耗时 s, 各请求延迟 ms, 事件循环最大停顿 ms, 失败数)"""
+    token = jwt.encode({"sub": "bench", "perms": ["*"]}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: List[float] = []
+    failures = 0
+    counter = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", headers=headers) as client:
+
+        async def worker() -> None:
+            nonlocal failures
+            for i in counter:
+                if i % 2 == 0:
+                    path = f"{prefix}/save"
+                    body = {"keyword": f"kw{i}", "value": f"value {i}", "sort": i, "status": "ENABLE"}
+                else:
+                    path = f"{prefix}/paging"
+                    body = {"page": 1, "size": 20, "status": "ENABLE"}
+                t0 = time.perf_counter()
+                resp = await client.post(path, json=body)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                if resp.status_code != 200 or resp.json().get("status") != "ok":
+                    failures += 1
+
+        stop, gaps = asyncio.Event(), []
+        beat = asyncio.create_task(heartbeat(stop, gaps))
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await beat
+    return elapsed, latencies, max(gaps) * 1000 if gaps else 0.0, failures
+
+
+def pct(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    spec = load_spec(SPEC)
+    ent = next(e for e in spec.entities if e.class_name == args.entity)
+    stem = guess_entity_file_stem(ent.class_name, ent.module_name)
+    prefix = CodegenConfig().api_prefix_template.format(module=ent.module_name, entity=stem, className=ent.class_name)
+
+    with tempfile.TemporaryDirectory(prefix="crudbench-") as tmp:
+        root = Path(tmp)
+        sys.path.insert(0, tmp)
+        print(f"entity={ent.class_name} ({snake_case(ent.class_name)}) requests={args.requests} concurrency={args.concurrency}")
+        for async_db in (False, True):
+            app = await build_app(root, async_db)
+            await load(app, prefix, min(100, args.requests), args.concurrency)  # 预热
+            elapsed, latencies, stall_ms, failures = await load(app, prefix, args.requests, args.concurrency)
+            name = "async (AsyncSession)" if async_db else "sync (Session, threadpool)"
+            print(
+                f"  {name:<28} {len(latencies) / elapsed:7.1f} req/s  "
+                f"p50={statistics.median(latencies):6.1f}ms p95={pct(latencies, 0.95):6.1f}ms "
+                f"p99={pct(latencies, 0.99):6.1f}ms  max loop stall={stall_ms:6.1f}ms  failures={failures}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="codegen 同步 / 异步 CRUD 栈负载测试")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--entity", default="CntDefaultKeyword", help="spec 中带 save + paging 接口的实体")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
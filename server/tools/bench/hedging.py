@@ -0,0 +1,118 @@
+# tools/bench/hedging.py
+"""
+供应商池对冲效果基准：进程内启动两个 OpenAI 兼容桩服务（主供应商有长尾慢请求、偶发失败），
+对比「只用主供应商」与「供应商池 + 首 token 对冲」两种方式的端到端延迟分布和上游请求放大倍数。
+
+用法（在 server 目录下）：
+  python -m tools.bench.hedging --requests 300 --concurrency 8 --slow-rate 0.1 --slow-ms 2000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from langchain_openai import ChatOpenAI
+
+from app.workflows.providers import HedgedChatModel, Provider, ProviderPool, ProviderSpec
+from tools.stub_llm import StubBehavior, StubServer
+
+
+def build_model(servers: List[StubServer], hedge: bool, percentile: float) -> HedgedChatModel:
+    # 基准里固定主供应商（权重远大于备用），便于和单供应商对比
+    providers = [
+        Provider(
+            ProviderSpec(name=f"stub-{i}", base_url=s.base_url, model="stub", api_key="x", weight=1e6 if i == 0 else 1.0),
+            ChatOpenAI(model="stub", openai_api_key="x", openai_api_base=s.base_url, max_retries=0),
+        )
+        for i, s in enumerate(servers)
+    ]
+    return HedgedChatModel(pool=ProviderPool(providers, hedge_enabled=hedge, hedge_percentile=percentile))
+
+
+async def run(model: HedgedChatModel, n: int, concurrency: int) -> dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one() -> None:
+        nonlocal errors
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                await model.ainvoke("ping")
+                latencies.append((time.perf_counter() - t0) * 1000)
+            except Exception:
+                errors += 1
+
+    # 预热：积累首 token 延迟样本，分位数阈值生效后再计时
+    await asyncio.gather(*(one() for _ in range(30)))
+    latencies.clear()
+    errors = 0
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n)))
+    wall = time.perf_counter() - t0
+    latencies.sort()
+
+    def pct(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else float("nan")
+
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "p50": statistics.median(latencies) if latencies else float("nan"),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "max": latencies[-1] if latencies else float("nan"),
+        "rps": n / wall,
+        "pool": model.pool.stats(),
+    }
+
+
+def report(label: str, r: dict, upstream: int, n: int) -> None:
+    print(
+        f"{label:<10} ok={r['ok']:<4} err={r['errors']:<3} "
+        f"p50={r['p50']:7.1f}ms p95={r['p95']:7.1f}ms p99={r['p99']:7.1f}ms max={r['max']:7.1f}ms "
+        f"upstream={upstream} ({upstream / max(n + 30, 1):.2f}x)"
+    )
+
+
+async def main_async(args) -> None:
+    primary = StubServer(
+        StubBehavior(first_token_ms=args.first_token_ms, slow_rate=args.slow_rate, slow_ms=args.slow_ms,
+                     fail_rate=args.fail_rate),
+        name="primary",
+    ).start()
+    secondary = StubServer(StubBehavior(first_token_ms=args.first_token_ms * 1.5), name="secondary").start()
+    try:
+        base = primary.stats["requests"]
+        single = await run(build_model([primary], hedge=False, percentile=args.percentile), args.requests, args.concurrency)
+        report("single", single, primary.stats["requests"] - base, args.requests)
+
+        base = primary.stats["requests"] + secondary.stats["requests"]
+        hedged = await run(build_model([primary, secondary], hedge=True, percentile=args.percentile), args.requests, args.concurrency)
+        report("hedged", hedged, primary.stats["requests"] + secondary.stats["requests"] - base, args.requests)
+        for name, s in hedged["pool"]["providers"].items():
+            print(f"  {name}: wins={s['wins']} hedges={s['hedges']} cancelled={s['cancelled']} errors={s['errors']} "
+                  f"ttft_p90_ms={s['ttft_p90_ms']} hedge_delay_ms={s['hedge_delay_ms']}")
+    finally:
+        primary.stop()
+        secondary.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="供应商池首 token 对冲基准")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--first-token-ms", type=float, default=80.0)
+    parser.add_argument("--slow-rate", type=float, default=0.1)
+    parser.add_argument("--slow-ms", type=float, default=2000.0)
+    parser.add_argument("--fail-rate", type=float, default=0.02)
+    parser.add_argument("--percentile", type=float, default=0.9)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
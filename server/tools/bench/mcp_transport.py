@@ -0,0 +1,74 @@
+# tools/bench/mcp_transport.py
+"""
+对比 stdio（常驻 MCP 会话池）与 inproc（进程内直连 FastMCP）两种传输模式的单请求开销。
+每个"请求"等价于一次翻译调用中的工具部分：fetch_reddit_context + build_prompt_template。
+
+用法（在 server 目录下）：
+  python -m tools.bench.mcp_transport --requests 200 --concurrency 1
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.workflows.tool_client import build_tool_client
+
+
+async def one_request(client, scene_id: str, intent_id: str, tone_id: str) -> float:
+    t0 = time.perf_counter()
+    await client.call_tool(
+        "fetch_reddit_context", {"scene_id": scene_id, "intent_id": intent_id, "input_text": "老板又临时加需求"}
+    )
+    await client.call_tool("build_prompt_template", {"scene_id": scene_id, "intent_id": intent_id, "tone_id": tone_id})
+    return (time.perf_counter() - t0) * 1000
+
+
+async def bench(transport: str, n: int, concurrency: int, scene_id: str, intent_id: str, tone_id: str) -> List[float]:
+    client = build_tool_client(transport)
+    t0 = time.perf_counter()
+    await client.start()
+    startup_ms = (time.perf_counter() - t0) * 1000
+
+    # 预热，排除首次调用的懒加载开销
+    for _ in range(3):
+        await one_request(client, scene_id, intent_id, tone_id)
+
+    sem = asyncio.Semaphore(concurrency)
+
+    async def run() -> float:
+        async with sem:
+            return await one_request(client, scene_id, intent_id, tone_id)
+
+    t0 = time.perf_counter()
+    samples = await asyncio.gather(*(run() for _ in range(n)))
+    wall = time.perf_counter() - t0
+    await client.close()
+
+    samples = sorted(samples)
+    p = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    print(
+        f"{transport:>7} | startup {startup_ms:8.1f} ms | mean {statistics.mean(samples):7.3f} ms"
+        f" | p50 {p(0.50):7.3f} | p95 {p(0.95):7.3f} | p99 {p(0.99):7.3f} | {n / wall:8.1f} req/s"
+    )
+    return samples
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=1)
+    ap.add_argument("--transports", default="stdio,inproc")
+    ap.add_argument("--scene", default="reddit")
+    ap.add_argument("--intent", default="venting")
+    ap.add_argument("--tone", default="sarcastic")
+    args = ap.parse_args()
+
+    for transport in [t.strip() for t in args.transports.split(",") if t.strip()]:
+        await bench(transport, args.requests, args.concurrency, args.scene, args.intent, args.tone)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+# tools/bench/output_parser.py
+"""
+模型输出解析的语料校验 + 基准。语料 tools/bench/output_corpus.jsonl 收集线上见过的非标准输出
+（客套前缀、代码围栏、尾随逗号、弯引号、裸换行、未转义引号、缺少结尾括号、被截断……），
+每条给出期望结果；expected 为 null 表示应当解析失败（截断的输出交给上层按上限重试）。
+
+校验三项：完整解析结果、流式逐段喂入时的中间结果（不抛异常、最终与完整解析一致）、
+与旧实现（JsonOutputParser + post_clean）的成功率对比；然后给出单次解析耗时。
+有不符合期望的条目时以非零状态退出。
+
+用法（在 server 目录下）：
+  python -m tools.bench.output_parser
+  python -m tools.bench.output_parser --corpus my_outputs.jsonl --iterations 5000 --chunk 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+
+from langchain_core.exceptions import OutputParserException
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.outputs import Generation
+
+from app.workflows.output_parser import TolerantJsonOutputParser
+from app.workflows.scenario_manager import scenario_manager
+
+DEFAULT_CORPUS = Path(__file__).with_name("output_corpus.jsonl")
+
+
+def load_corpus(path: Path) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_parse(text: str) -> dict:
+    """改造前的实现：JsonOutputParser 解析后对 english 做 post_clean"""
+    result = JsonOutputParser().parse(text)
+    if "english" in result:
+        result["english"] = scenario_manager.post_clean(result["english"])
+    return result
+
+
+def try_parse(fn: Callable[[str], dict], text: str) -> Optional[dict]:
+    try:
+        return fn(text)
+    except OutputParserException:
+        return None
+
+
+def check_stream(parser: TolerantJsonOutputParser, raw: str, expected: Optional[dict], chunk: int) -> Optional[str]:
+    """按 chunk 个字符逐段喂入，返回错误描述（通过时返回 None）"""
+    last = None
+    for end in range(chunk, len(raw) + chunk, chunk):
+        try:
+            partial = parser.parse_result([Generation(text=raw[:end])], partial=True)
+        except Exception as e:
+            return f"partial parse raised at {end}: {e!r}"
+        if partial is not None and not isinstance(partial, dict):
+            return f"partial result is {type(partial).__name__}"
+        last = partial
+    if expected is not None and last is not None:
+        # 流式中间结果不做 post_clean，只比较键集合
+        if set(last) != set(expected):
+            return f"final partial keys {sorted(last)} != {sorted(expected)}"
+    return None
+
+
+def bench(fn: Callable[[str], dict], texts: List[str], iterations: int) -> float:
+    """平均单次解析耗时（us），失败的条目也计入"""
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            try_parse(fn, text)
+    return (time.perf_counter() - t0) / (iterations * len(texts)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="模型输出解析语料校验 / 基准")
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--chunk", type=int, default=3, help="流式校验时每段的字符数")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    tolerant = TolerantJsonOutputParser()
+    failures = []
+    legacy_ok = tolerant_ok = 0
+
+    for case in corpus:
+        raw, expected = case["raw"], case["expected"]
+        got = try_parse(tolerant.parse, raw)
+        legacy = try_parse(legacy_parse, raw)
+        tolerant_ok += got == expected
+        legacy_ok += legacy == expected
+        if got != expected:
+            failures.append(f"{case['name']}: expected {expected!r}, got {got!r}")
+        stream_error = check_stream(tolerant, raw, expected, args.chunk)
+        if stream_error:
+            failures.append(f"{case['name']} (stream): {stream_error}")
+        mark = "ok " if got == expected else "BAD"
+        print(f"  {mark} {case['name']:<28} legacy={'ok' if legacy == expected else 'fail'}")
+
+    texts = [case["raw"] for case in corpus]
+    legacy_us = bench(legacy_parse, texts, args.iterations)
+    tolerant_us = bench(tolerant.parse, texts, args.iterations)
+
+    n = len(corpus)
+    print(f"\ncases={n} tolerant={tolerant_ok}/{n} legacy={legacy_ok}/{n}")
+    print(f"per parse: legacy={legacy_us:.1f}us tolerant={tolerant_us:.1f}us")
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# tools/bench/password_hash.py
+"""
+密码哈希基准：
+1. 各工作因子（bcrypt rounds）下单次 hash / verify 的耗时，用于选择 BCRYPT_ROUNDS；
+2. 模拟登录洪峰：同时发起 --logins 次校验，对比直接在事件循环里同步调用与放到 PasswordHasher 线程池两种方式，
+   期间用一个每 10ms 醒一次的心跳任务测量事件循环的最大停顿（翻译流式输出同样依赖事件循环及时调度），
+   以及整批完成时间、被排队上限拒绝的次数。
+
+用法（在 server 目录下）：
+  python -m tools.bench.password_hash
+  python -m tools.bench.password_hash --rounds 10,11,12,13 --logins 40 --workers 2 --queue 16
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List, Tuple
+
+from app.common.exceptions import BizException
+from app.core.security import PasswordHasher, _hash, verify_password
+
+TICK = 0.01
+
+
+def time_rounds(rounds: int, samples: int) -> Tuple[float, float]:
+    hashed = _hash("correct horse battery staple", rounds)
+    hash_ms, verify_ms = [], []
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        _hash("correct horse battery staple", rounds)
+        hash_ms.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        verify_password("correct horse battery staple", hashed)
+        verify_ms.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(hash_ms), statistics.median(verify_ms)
+
+
+async def heartbeat(stop: asyncio.Event, gaps: List[float]) -> None:
+    last = time.perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(TICK)
+        now = time.perf_counter()
+        gaps.append(now - last - TICK)
+        last = now
+
+
+async def burst(login: Callable[[], Awaitable[bool]], count: int) -> Tuple[float, float, int]:
+    """返回 (整批耗时 s, 事件循环最大停顿 ms, 被拒绝次数)"""
+    stop, gaps = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, gaps))
+    await asyncio.sleep(TICK * 2)
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*(login() for _ in range(count)), return_exceptions=True)
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await beat
+    rejected = sum(isinstance(r, BizException) for r in results)
+    return elapsed, max(gaps) * 1000 if gaps else 0.0, rejected
+
+
+async def run_bursts(rounds: int, logins: int, workers: int, queue: int) -> None:
+    hashed = _hash("pw", rounds)
+
+    async def sync_login() -> bool:
+        return verify_password("pw", hashed)
+
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=queue)
+
+    async def pooled_login() -> bool:
+        return await hasher.verify("pw", hashed)
+
+    for name, login in (("sync (in loop)", sync_login), (f"pool w={workers} q={queue}", pooled_login)):
+        elapsed, stall_ms, rejected = await burst(login, logins)
+        print(f"  {name:<22} total={elapsed:6.2f}s  max loop stall={stall_ms:8.1f}ms  rejected={rejected}")
+    hasher.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="bcrypt 工作因子与线程池基准")
+    parser.add_argument("--rounds", default="10,11,12,13", help="要测试的工作因子，逗号分隔")
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--logins", type=int, default=30, help="登录洪峰的并发校验数")
+    parser.add_argument("--burst-rounds", type=int, default=12, help="登录洪峰使用的工作因子")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'hash':>9} {'verify':>9} {'logins/s/worker':>16}")
+    for rounds in (int(r) for r in args.rounds.split(",") if r.strip()):
+        hash_ms, verify_ms = time_rounds(rounds, args.samples)
+        print(f"{rounds:>6} {hash_ms:>7.1f}ms {verify_ms:>7.1f}ms {1000 / verify_ms:>16.1f}")
+
+    print(f"\nlogin burst: {args.logins} concurrent verifies at rounds={args.burst_rounds}")
+    asyncio.run(run_bursts(args.burst_rounds, args.logins, args.workers, args.queue))
+
+
+if __name__ == "__main__":
+    main()
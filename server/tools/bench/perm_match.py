@@ -0,0 +1,120 @@
+# tools/bench/perm_match.py
+"""
+权限匹配微基准：按 SysRolePermission 的形状（模块:资源:动作，夹杂少量 模块:* / 模块:资源:* 通配）
+生成几千条拥有的权限，对比改造前的字符串匹配（每次检查拆分 / 拼接前缀）与前缀树匹配。
+
+先校验两者在命中、通配命中、未命中的所需权限上结果完全一致（不一致时以非零状态退出），
+再给出单次检查耗时和编译前缀树的一次性开销（按 token 缓存，每个 token 只编译一次）。
+
+用法（在 server 目录下）：
+  python -m tools.bench.perm_match
+  python -m tools.bench.perm_match --sizes 100,2000,20000 --checks 20000 --wildcards 0.02
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from typing import List, Set, Tuple
+
+from app.core.permissions import PermissionMatcher, parse_perm
+
+ACTIONS = ["list", "get", "save", "update", "delete", "export", "import", "audit"]
+
+
+def legacy_match(required: str, owned: Set[str]) -> bool:
+    """改造前 app/deps.py 的 _perm_match"""
+    if required in owned:
+        return True
+    parts = required.split(":")
+    for i in range(len(parts), 0, -1):
+        prefix = ":".join(parts[:i]) + ":*"
+        if prefix in owned:
+            return True
+    if "*" in owned:
+        return True
+    return False
+
+
+def make_owned(size: int, wildcards: float, rng: random.Random) -> Set[str]:
+    owned: Set[str] = set()
+    modules = max(4, size // 200)
+    while len(owned) < size:
+        module, resource = f"m{rng.randrange(modules)}", f"r{rng.randrange(40)}"
+        roll = rng.random()
+        if roll < wildcards / 2:
+            owned.add(f"{module}:*")
+        elif roll < wildcards:
+            owned.add(f"{module}:{resource}:*")
+        else:
+            owned.add(f"{module}:{resource}:{rng.choice(ACTIONS)}")
+    return owned
+
+
+def make_required(owned: Set[str], count: int, rng: random.Random) -> List[str]:
+    """约一半取自拥有的具体权限（精确命中），其余随机生成（通配命中或未命中）"""
+    exact = sorted(p for p in owned if not p.endswith("*"))
+    modules = max(4, len(owned) // 200)
+    required = []
+    for _ in range(count):
+        if exact and rng.random() < 0.5:
+            required.append(rng.choice(exact))
+        else:
+            required.append(f"m{rng.randrange(modules * 2)}:r{rng.randrange(60)}:{rng.choice(ACTIONS)}")
+    return required
+
+
+def bench(size: int, checks: int, wildcards: float, seed: int) -> Tuple[float, float, float, float, List[str]]:
+    rng = random.Random(seed)
+    owned = make_owned(size, wildcards, rng)
+    required = make_required(owned, checks, rng)
+    parsed = [parse_perm(p) for p in required]
+
+    t0 = time.perf_counter()
+    matcher = PermissionMatcher(owned)
+    compile_ms = (time.perf_counter() - t0) * 1000
+
+    mismatches = [
+        f"size={size} {p}: legacy={legacy_match(p, owned)} compiled={matcher.allows(q)}"
+        for p, q in zip(required, parsed)
+        if legacy_match(p, owned) != matcher.allows(q)
+    ]
+    hit_rate = sum(matcher.allows(q) for q in parsed) / checks
+
+    t0 = time.perf_counter()
+    for p in required:
+        legacy_match(p, owned)
+    legacy_ns = (time.perf_counter() - t0) / checks * 1e9
+
+    t0 = time.perf_counter()
+    for q in parsed:
+        matcher.allows(q)
+    compiled_ns = (time.perf_counter() - t0) / checks * 1e9
+    return compile_ms, hit_rate, legacy_ns, compiled_ns, mismatches
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="权限匹配微基准")
+    parser.add_argument("--sizes", default="50,1000,5000,20000", help="拥有的权限条数，逗号分隔")
+    parser.add_argument("--checks", type=int, default=50000, help="每组检查次数")
+    parser.add_argument("--wildcards", type=float, default=0.01, help="拥有的权限中通配所占比例")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    failures: List[str] = []
+    print(f"{'owned':>7} {'compile':>10} {'allowed':>8} {'legacy':>10} {'compiled':>10} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        compile_ms, hit_rate, legacy_ns, compiled_ns, mismatches = bench(size, args.checks, args.wildcards, args.seed)
+        failures.extend(mismatches)
+        print(
+            f"{size:>7} {compile_ms:>8.2f}ms {hit_rate:>8.1%} {legacy_ns:>8.0f}ns "
+            f"{compiled_ns:>8.0f}ns {legacy_ns / compiled_ns:>7.1f}x"
+        )
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures[:20]), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# tools/bench/retrieval.py
+"""
+进程内混合检索（BM25 + 哈希向量 + RRF + MMR）的建索引耗时与单次查询延迟。
+语料为随机拼接的中文吐槽句子（约十万种组合），规模可调。
+
+用法（在 server 目录下）：
+  python -m tools.bench.retrieval --docs 50000 --queries 500
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from app.workflows.search_engine import HybridIndex
+
+_TIMES = ["今天", "昨晚", "周一早上", "刚刚", "这个月", "大半夜", "国庆前", "年底", "每次", "又一次"]
+_SUBJECTS = ["老板", "经理", "同事", "室友", "房东", "客户", "甲方", "产品经理", "外卖小哥", "邻居"]
+_EVENTS = [
+    "快下班了又临时加需求", "周末突然叫我回公司", "把锅甩给我", "开会开了三个小时", "半夜还在群里发消息",
+    "改了十几版方案", "又涨房租了", "外卖送错了", "凌晨装修吵得睡不着", "说这个很简单明天就要",
+]
+_FEELINGS = ["烦死了", "真的会谢", "心态崩了", "想辞职", "无语", "我太难了", "气得睡不着", "麻了", "离谱", "破防了"]
+
+
+def sentence(rng: random.Random) -> str:
+    return f"{rng.choice(_TIMES)}{rng.choice(_SUBJECTS)}{rng.choice(_EVENTS)}，{rng.choice(_FEELINGS)}{rng.choice(_FEELINGS)}。"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--fusion", default="rrf", choices=["rrf", "linear"])
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    texts = [sentence(rng) for _ in range(args.docs)]
+
+    t0 = time.perf_counter()
+    index = HybridIndex.from_texts(texts)
+    build_s = time.perf_counter() - t0
+
+    queries = [sentence(rng) for _ in range(args.queries)]
+    index.search(queries[0], top_k=args.top_k, fusion=args.fusion)  # 预热
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.search(q, top_k=args.top_k, fusion=args.fusion)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+
+    print(f"docs={args.docs} build={build_s:.2f}s")
+    print(
+        f"query ms: mean={statistics.mean(latencies):.2f} "
+        f"p50={latencies[len(latencies) // 2]:.2f} p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}"
+    )
+    q = queries[0]
+    print(f"sample query: {q}")
+    for i in index.search(q, top_k=args.top_k, fusion=args.fusion):
+        print(f"  -> {texts[i]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -105,6 +105,10 @@ class CodegenConfig:
     api_prefix_template: str = "/{module}/{entity}"
     api_tag_template: str = "{module}:{entity}"
 
+    # ✅ true: service 基类用 AsyncSession（await db.execute / commit），路由生成 async def；
+    #    false: 保留同步输出（sqlalchemy.orm.Session + def 路由，需要配同步的 get_db）
+    async_db: bool = True
+
     def __post_init__(self):
         if self.gen_paths is None:
             self.gen_paths = {
@@ -141,6 +145,9 @@ class CodegenConfig:
         if isinstance(im, dict):
             cfg.imports = {**cfg.imports, **im}
 
+        if "async_db" in raw:
+            cfg.async_db = bool(raw.get("async_db"))
+
         api = raw.get("api")
         if isinstance(api, dict):
             cfg.api_prefix_template = api.get("prefix_template", cfg.api_prefix_template)
@@ -491,7 +498,11 @@ def render_schema_common() -> str:
     ).strip() + "\n"
 
 
-def render_service_base() -> str:
+def render_service_base(async_db: bool = True) -> str:
+    return render_async_service_base() if async_db else render_sync_service_base()
+
+
+def render_sync_service_base() -> str:
     return textwrap.dedent(
         f"""
         {GEN_HEADER}
@@ -623,6 +634,131 @@ def render_service_base() -> str:
     ).strip() + "\n"
 
 
+def render_async_service_base() -> str:
+    """
+    AsyncSession 版本：所有数据库访问都 await，不经过 Starlette 线程池。
+    delete_many 一次查出全部 id（同步版逐个 get_by_id）。
+    """
+    return textwrap.dedent(
+        f"""
+        {GEN_HEADER}
+        from __future__ import annotations
+
+        import re
+        from typing import Any, Dict, List, Tuple, Type, Optional
+
+        from sqlalchemy import select, func
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+
+        class BaseService:
+            def __init__(self, db: AsyncSession, ctx: Any):
+                self.db = db
+                self.ctx = ctx
+
+
+        class CRUDService(BaseService):
+            model: Type[Any] = None
+
+            def _base_stmt(self):
+                stmt = select(self.model)
+
+                # soft delete
+                if hasattr(self.model, "deleted"):
+                    stmt = stmt.where(self.model.deleted.is_(False))
+
+                return stmt
+
+            def _apply_order_by(self, stmt, order_by: Optional[str]):
+                # 安全：只允许 "field" 或 "field asc/desc"
+                if not order_by:
+                    if hasattr(self.model, "created_at"):
+                        return stmt.order_by(getattr(self.model, "created_at").desc())
+                    return stmt
+
+                s = (order_by or "").strip()
+                if not s:
+                    return stmt
+
+                parts = s.split()
+                field = parts[0].strip()
+                direction = (parts[1].strip().lower() if len(parts) > 1 else "asc")
+
+                if not re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", field):
+                    return stmt
+                if not hasattr(self.model, field):
+                    return stmt
+
+                col = getattr(self.model, field)
+                if direction == "desc":
+                    return stmt.order_by(col.desc())
+                return stmt.order_by(col.asc())
+
+            def _apply_filters(self, stmt, filters: Optional[Dict[str, Any]]):
+                for k, v in (filters or {{}}).items():
+                    if v is None:
+                        continue
+                    if hasattr(self.model, k):
+                        stmt = stmt.where(getattr(self.model, k) == v)
+                return stmt
+
+            async def get_by_id(self, obj_id: str):
+                stmt = self._base_stmt().where(self.model.id == obj_id)
+                return (await self.db.scalars(stmt)).first()
+
+            async def create(self, data: Dict[str, Any]):
+                obj = self.model(**data)
+                self.db.add(obj)
+                await self.db.commit()
+                await self.db.refresh(obj)
+                return obj
+
+            async def update(self, obj_id: str, data: Dict[str, Any]):
+                obj = await self.get_by_id(obj_id)
+                if not obj:
+                    return None
+                for k, v in (data or {{}}).items():
+                    if v is None:
+                        continue
+                    if hasattr(obj, k):
+                        setattr(obj, k, v)
+                await self.db.commit()
+                await self.db.refresh(obj)
+                return obj
+
+            async def delete_many(self, ids: List[str]) -> int:
+                if not ids:
+                    return 0
+                objs = (await self.db.scalars(self._base_stmt().where(self.model.id.in_(ids)))).all()
+                for obj in objs:
+                    if hasattr(obj, "deleted"):
+                        setattr(obj, "deleted", True)
+                    else:
+                        await self.db.delete(obj)
+                await self.db.commit()
+                return len(objs)
+
+            async def list(self, filters: Optional[Dict[str, Any]] = None, order_by: Optional[str] = None) -> List[Any]:
+                stmt = self._apply_order_by(self._apply_filters(self._base_stmt(), filters), order_by)
+                return list((await self.db.scalars(stmt)).all())
+
+            async def paging(
+                self,
+                filters: Optional[Dict[str, Any]] = None,
+                page: int = 1,
+                size: int = 20,
+                order_by: Optional[str] = None,
+            ) -> Tuple[int, List[Any]]:
+                stmt = self._apply_order_by(self._apply_filters(self._base_stmt(), filters), order_by)
+
+                subq = stmt.subquery()
+                total = await self.db.scalar(select(func.count()).select_from(subq)) or 0
+                items = list((await self.db.scalars(stmt.offset((page - 1) * size).limit(size))).all())
+                return int(total), items
+        """
+    ).strip() + "\n"
+
+
 def render_model_file(
     ent: EntityDef,
     enums_module: str,
@@ -756,6 +892,7 @@ def render_service_file(ent: EntityDef, service_base_module: str, model_module:
     """
     ✅ Service 生成后自动尝试加载同目录下的 xxx_service_impl.py
        你的业务扩展逻辑放在 patch_service(ServiceClass) 里，不会被 codegen 覆盖
+       （async_db 模式下路由会 await svc.xxx(...)，扩展方法也要写成 async def）
     """
     return textwrap.dedent(
         f"""
@@ -807,10 +944,15 @@ def render_api_file(
     schema_common_module: str,
     deps_import: Tuple[str, List[str]],
     res_import: Tuple[str, str],
+    async_db: bool = True,
 ) -> str:
     deps_mod, deps_names = deps_import
     res_mod, res_name = res_import
 
+    # async_db：async def 路由 + await service 调用；否则 def 路由（FastAPI 放到线程池执行）
+    fn_def = "async def" if async_db else "def"
+    aw = "await " if async_db else ""
+
     def has(name: str) -> bool:
         return name in (deps_names or [])
 
@@ -944,10 +1086,10 @@ def render_api_file(
             content.append("")
 
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def {name}(req: {dto}, {svc_arg}):")
+            content.append(f"{fn_def} {name}(req: {dto}, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
-            content.append(f"    out = svc.{name}(req.model_dump())")
+            content.append(f"    out = {aw}svc.{name}(req.model_dump())")
             content.append(f"    return {res_name}.success(out)")
             content.append("")
             continue
@@ -955,20 +1097,20 @@ def render_api_file(
         # ENTITY save/update/list
         if a.param_mode == "ENTITY" and name == "save":
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def save(req: {ent.class_name}Create, {svc_arg}):")
+            content.append(f"{fn_def} save(req: {ent.class_name}Create, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
-            content.append("    obj = svc.create(req.model_dump())")
+            content.append(f"    obj = {aw}svc.create(req.model_dump())")
             content.append(f"    return {res_name}.success({ent.class_name}Read.model_validate(obj))")
             content.append("")
             continue
 
         if a.param_mode == "ENTITY" and name == "update":
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def update(req: {ent.class_name}Update, {svc_arg}):")
+            content.append(f"{fn_def} update(req: {ent.class_name}Update, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
-            content.append("    obj = svc.update(req.id, req.model_dump(exclude={'id'}))")
+            content.append(f"    obj = {aw}svc.update(req.id, req.model_dump(exclude={{'id'}}))")
             content.append("    if not obj:")
             content.append("        raise HTTPException(status_code=404, detail='not found')")
             content.append(f"    return {res_name}.success({ent.class_name}Read.model_validate(obj))")
@@ -977,11 +1119,11 @@ def render_api_file(
 
         if a.param_mode == "ENTITY" and name == "list":
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def list_(req: {ent.class_name}Query, {svc_arg}):")
+            content.append(f"{fn_def} list_(req: {ent.class_name}Query, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
             content.append("    filters = req.model_dump(exclude={'page','size','order_by'}, exclude_none=True)")
-            content.append("    items = svc.list(filters, order_by=req.order_by)")
+            content.append(f"    items = {aw}svc.list(filters, order_by=req.order_by)")
             content.append(f"    return {res_name}.success([{ent.class_name}Read.model_validate(x) for x in items])")
             content.append("")
             continue
@@ -989,10 +1131,10 @@ def render_api_file(
         # IDS delete
         if a.param_mode == "IDS":
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def delete(req: IdsReq, {svc_arg}):")
+            content.append(f"{fn_def} delete(req: IdsReq, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
-            content.append("    n = svc.delete_many(req.ids)")
+            content.append(f"    n = {aw}svc.delete_many(req.ids)")
             content.append(f"    return {res_name}.success({{'deleted': n}})")
             content.append("")
             continue
@@ -1000,11 +1142,11 @@ def render_api_file(
         # QUERY paging
         if a.param_mode == "QUERY":
             content.append(f'@router.post("{path}", summary="{py_str(summary)}"{dep_arg})')
-            content.append(f"def paging(req: {ent.class_name}Query, {svc_arg}):")
+            content.append(f"{fn_def} paging(req: {ent.class_name}Query, {svc_arg}):")
             for ln in ensure_svc_lines(a):
                 content.append(ln)
             content.append("    filters = req.model_dump(exclude={'page','size','order_by'}, exclude_none=True)")
-            content.append("    total, items = svc.paging(filters, page=req.page, size=req.size, order_by=req.order_by)")
+            content.append(f"    total, items = {aw}svc.paging(filters, page=req.page, size=req.size, order_by=req.order_by)")
             content.append(f"    return {res_name}.success({{")
             content.append("        'total': total,")
             content.append(f"        'items': [{ent.class_name}Read.model_validate(x) for x in items],")
@@ -1098,7 +1240,7 @@ def generate(spec: Spec, project_root: Path, cfg: CodegenConfig, clean: bool, sp
     write_text(enums_dir / "enums.py", render_enums_file(spec))
     write_text(models_dir / "_gen_mixins.py", render_mixins_file())
     write_text(schemas_dir / "_gen_common.py", render_schema_common())
-    write_text(services_dir / "_gen_base.py", render_service_base())
+    write_text(services_dir / "_gen_base.py", render_service_base(cfg.async_db))
 
     api_imports: List[str] = []
     api_includes: List[str] = []
@@ -1157,6 +1299,7 @@ def generate(spec: Spec, project_root: Path, cfg: CodegenConfig, clean: bool, sp
                 schema_common_module=schema_common_module,
                 deps_import=deps_import,
                 res_import=res_import,
+                async_db=cfg.async_db,
             ),
         )
 
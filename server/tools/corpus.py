@@ -0,0 +1,105 @@
+# tools/corpus.py
+"""
+few-shot 语料库导入工具：把 JSONL 语料流式写入 collection_name 对应的磁盘列式语料库（CORPUS_DIR/<collection>/）。
+每行一条：{"input": "...", "output": {"english": "...", "chinese": "..."}}
+
+用法（在 server 目录下）：
+  python -m tools.corpus ingest reddit_global_corpus data/reddit.jsonl [more.jsonl ...]   # 追加导入，"-" 表示 stdin
+  python -m tools.corpus seed                                                          # 把 scenarios.json 内联 mock_corpus 导入各自的 collection
+  python -m tools.corpus compact reddit_global_corpus                                  # 合并碎片 Segment
+  python -m tools.corpus info reddit_global_corpus
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, Iterator, List
+
+from app.workflows.corpus_store import CORPUS_DIR, CorpusStore
+
+
+def read_jsonl(paths: List[str]) -> Iterator[dict]:
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        try:
+            for lineno, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    if isinstance(record.get("input"), str) and isinstance(record.get("output"), dict):
+                        yield record
+                        continue
+                except ValueError:
+                    pass
+                print(f"⚠️ skip {path}:{lineno}: not a {{input, output}} record", file=sys.stderr)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def ingest(store: CorpusStore, records: Iterable[dict], segment_size: int) -> None:
+    t0 = time.perf_counter()
+    added, skipped = store.append(records, segment_size=segment_size)
+    print(f"✅ {store.path.name}: +{added} examples, {skipped} duplicates skipped ({time.perf_counter() - t0:.1f}s)")
+
+
+def seed(root: Path, segment_size: int) -> None:
+    # 延迟导入：只有 seed 需要读取场景配置
+    from app.workflows.scenario_manager import scenario_manager
+
+    done = set()
+    for intent in scenario_manager.snapshot.intent_index.values():
+        rag = intent.rag
+        if not rag.collection_name or rag.collection_name in done or not rag.corpus:
+            continue
+        done.add(rag.collection_name)
+        records = [{"input": e["input"], "output": dict(e["output"])} for e in rag.corpus]
+        ingest(CorpusStore(CorpusStore.path_for(rag.collection_name, root)), records, segment_size)
+
+
+def info(store: CorpusStore) -> None:
+    store.reload()
+    manifest = store.path / "manifest.json"
+    if not manifest.exists():
+        print(f"{store.path}: empty")
+        return
+    print(manifest.read_text("utf-8"))
+    print(f"docs={store.size} segments={len(store.index.segments)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="few-shot 语料库导入工具")
+    parser.add_argument("--root", type=Path, default=CORPUS_DIR, help=f"语料库根目录（默认 {CORPUS_DIR}）")
+    parser.add_argument("--segment-size", type=int, default=50000, help="每个 Segment 的最大条数")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("ingest", help="追加导入 JSONL")
+    p.add_argument("collection")
+    p.add_argument("files", nargs="+")
+    sub.add_parser("seed", help="导入 scenarios.json 中的内联 mock_corpus")
+    p = sub.add_parser("compact", help="合并全部 Segment")
+    p.add_argument("collection")
+    p = sub.add_parser("info", help="查看语料库概况")
+    p.add_argument("collection")
+
+    args = parser.parse_args()
+    if args.cmd == "seed":
+        seed(args.root, args.segment_size)
+        return
+
+    store = CorpusStore(CorpusStore.path_for(args.collection, args.root))
+    if args.cmd == "ingest":
+        ingest(store, read_jsonl(args.files), args.segment_size)
+    elif args.cmd == "compact":
+        print(f"✅ {args.collection}: compacted into 1 segment, {store.compact()} examples")
+    elif args.cmd == "info":
+        info(store)
+
+
+if __name__ == "__main__":
+    main()
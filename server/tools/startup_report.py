@@ -0,0 +1,161 @@
+# tools/startup_report.py
+"""
+启动开销报告：在干净的子进程里导入指定模块，按模块 / 顶层包拆分导入耗时（python -X importtime），
+并按阶段依次导入、记录每一阶段新增的常驻内存（RSS）。超出预算时以非零状态退出，便于在 CI 中发现回归。
+
+用法（在 server 目录下）：
+  python -m tools.startup_report                                   # 默认报告 app.main
+  python -m tools.startup_report --module app.workflows.mcp_server # MCP 子进程的启动开销
+  python -m tools.startup_report --budget-ms 1500 --budget-mb 150
+  python -m tools.startup_report --json > startup.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+# RSS 分阶段：按顺序导入，每阶段只统计新增部分；最后一阶段是完整 AI 栈（预热 / 首个请求时才加载）
+DEFAULT_STAGES = ["fastapi", "sqlalchemy.ext.asyncio", "app.main", "app.workflows.workflow"]
+
+_RSS_SCRIPT = r"""
+import importlib, json, sys, time
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+print(json.dumps({"stage": "<interpreter>", "rss_kb": rss_kb(), "ms": 0.0}), flush=True)
+for name in sys.argv[1:]:
+    t0 = time.perf_counter()
+    importlib.import_module(name)
+    print(json.dumps({"stage": name, "rss_kb": rss_kb(), "ms": (time.perf_counter() - t0) * 1000}), flush=True)
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_times(module: str) -> List[Tuple[str, int, int]]:
+    """返回 [(模块名, 自身耗时 us, 累计耗时 us)]，按导入完成顺序"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(),
+    )
+    if proc.returncode != 0:
+        sys.exit(f"❌ import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def rss_stages(stages: List[str]) -> List[dict]:
+    proc = subprocess.run(
+        [sys.executable, "-c", _RSS_SCRIPT, *stages],
+        capture_output=True, text=True, env=_env(),
+    )
+    if proc.returncode != 0:
+        sys.exit(f"❌ RSS stages failed:\n{proc.stderr[-2000:]}")
+    return [json.loads(line) for line in proc.stdout.splitlines() if line.startswith("{")]
+
+
+def build_report(module: str, stages: List[str], top: int) -> dict:
+    rows = import_times(module)
+    by_package: Dict[str, int] = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    total_us = next((cum for name, _, cum in rows if name == module), sum(by_package.values()))
+    app_modules = sorted((r for r in rows if r[0] == "app" or r[0].startswith("app.")), key=lambda r: -r[2])
+
+    stages_out = []
+    prev = None
+    for s in rss_stages(stages):
+        stages_out.append({
+            "stage": s["stage"],
+            "ms": round(s["ms"], 1),
+            "rss_mb": round(s["rss_kb"] / 1024, 1),
+            "delta_mb": round((s["rss_kb"] - prev) / 1024, 1) if prev is not None else None,
+        })
+        prev = s["rss_kb"]
+
+    return {
+        "module": module,
+        "import_ms": round(total_us / 1000, 1),
+        "modules_loaded": len(rows),
+        "packages": [
+            {"package": p, "self_ms": round(us / 1000, 1)}
+            for p, us in sorted(by_package.items(), key=lambda kv: -kv[1])[:top]
+        ],
+        "app_modules": [
+            {"module": name, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+            for name, s, c in app_modules[:top]
+        ],
+        "rss": stages_out,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"== import {report['module']}: {report['import_ms']:.0f} ms, {report['modules_loaded']} modules ==")
+    print("\n-- top packages by self time --")
+    for p in report["packages"]:
+        print(f"{p['self_ms']:>9.1f} ms  {p['package']}")
+    print("\n-- app modules by cumulative time --")
+    for m in report["app_modules"]:
+        print(f"{m['cumulative_ms']:>9.1f} ms  (self {m['self_ms']:>7.1f})  {m['module']}")
+    print("\n-- RSS by stage (imported in order, same process) --")
+    for s in report["rss"]:
+        delta = f"+{s['delta_mb']:.1f}" if s["delta_mb"] is not None else "    -"
+        print(f"{s['rss_mb']:>8.1f} MB  {delta:>8} MB  {s['ms']:>8.0f} ms  {s['stage']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="启动导入耗时 / 内存报告")
+    parser.add_argument("--module", default="app.main", help="报告导入耗时的模块")
+    parser.add_argument("--stage", action="append", help=f"RSS 分阶段导入的模块，可重复（默认 {DEFAULT_STAGES}）")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=0, help="导入耗时预算，超出则退出码为 1（0 表示不检查）")
+    parser.add_argument("--budget-mb", type=float, default=0, help="导入 --module 后的 RSS 预算(MB)（0 表示不检查）")
+    parser.add_argument("--json", action="store_true", help="输出 JSON")
+    args = parser.parse_args()
+
+    stages = args.stage or DEFAULT_STAGES
+    if args.module not in stages:
+        stages = stages + [args.module]
+    report = build_report(args.module, stages, args.top)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+    failures = []
+    if args.budget_ms and report["import_ms"] > args.budget_ms:
+        failures.append(f"import {report['import_ms']:.0f} ms > budget {args.budget_ms:.0f} ms")
+    module_rss = next(s["rss_mb"] for s in report["rss"] if s["stage"] == args.module)
+    if args.budget_mb and module_rss > args.budget_mb:
+        failures.append(f"RSS {module_rss:.1f} MB > budget {args.budget_mb:.0f} MB")
+    if failures:
+        print("❌ " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
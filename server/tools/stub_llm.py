@@ -0,0 +1,176 @@
+# tools/stub_llm.py
+"""
+本地 OpenAI 兼容桩服务：/v1/chat/completions（流式 / 非流式）、/v1/models。
+首 token 延迟、逐 token 间隔、慢请求比例、失败比例均可配置，用于在不访问真实上游的情况下验证供应商池的路由、对冲与故障切换。
+
+用法（在 server 目录下）：
+  python -m tools.stub_llm --port 9001 --first-token-ms 150 --slow-rate 0.1 --slow-ms 3000
+  python -m tools.stub_llm --port 9002 --first-token-ms 300 --fail-rate 0.2
+然后：
+  LLM_PROVIDERS='[{"name":"a","base_url":"http://127.0.0.1:9001/v1","model":"stub","api_key":"x"},
+                  {"name":"b","base_url":"http://127.0.0.1:9002/v1","model":"stub","api_key":"x"}]' uvicorn app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_REPLY = json.dumps({"english": "stub reply from the local server", "chinese": "本地桩服务的回复"}, ensure_ascii=False)
+
+
+@dataclass
+class StubBehavior:
+    first_token_ms: float = 100.0
+    token_ms: float = 5.0
+    slow_rate: float = 0.0
+    slow_ms: float = 3000.0
+    fail_rate: float = 0.0
+    fail_status: int = 503
+    reply: str = DEFAULT_REPLY
+    chunk_chars: int = 4
+
+
+def create_stub_app(behavior: StubBehavior, name: str = "stub") -> FastAPI:
+    app = FastAPI(title=f"stub-llm-{name}")
+    app.state.behavior = behavior
+    app.state.stats = {"requests": 0, "failed": 0, "slow": 0, "completed": 0, "cancelled": 0, "last_max_tokens": None}
+
+    def chunk(model: str, cid: str, delta: dict, finish: str | None = None) -> str:
+        body = {
+            "id": cid,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": name}]}
+
+    @app.head("/v1")
+    async def head():
+        return JSONResponse(None)
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        b: StubBehavior = app.state.behavior
+        stats = app.state.stats
+        payload = await request.json()
+        model = payload.get("model", "stub")
+        stats["requests"] += 1
+        stats["last_max_tokens"] = payload.get("max_tokens", payload.get("max_completion_tokens"))
+
+        if random.random() < b.fail_rate:
+            stats["failed"] += 1
+            return JSONResponse({"error": {"message": "stub failure", "type": "server_error"}}, status_code=b.fail_status)
+
+        delay = b.first_token_ms
+        if random.random() < b.slow_rate:
+            stats["slow"] += 1
+            delay = b.slow_ms
+        cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        pieces = [b.reply[i:i + b.chunk_chars] for i in range(0, len(b.reply), b.chunk_chars)]
+
+        if not payload.get("stream"):
+            await asyncio.sleep((delay + b.token_ms * len(pieces)) / 1000)
+            stats["completed"] += 1
+            return {
+                "id": cid,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": b.reply}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(pieces), "total_tokens": len(pieces)},
+            }
+
+        async def events():
+            try:
+                yield chunk(model, cid, {"role": "assistant", "content": ""})
+                await asyncio.sleep(delay / 1000)
+                for piece in pieces:
+                    yield chunk(model, cid, {"content": piece})
+                    await asyncio.sleep(b.token_ms / 1000)
+                yield chunk(model, cid, {}, "stop")
+                yield "data: [DONE]\n\n"
+                stats["completed"] += 1
+            except asyncio.CancelledError:
+                stats["cancelled"] += 1
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class StubServer:
+    """在后台线程里运行的桩服务，供基准脚本在进程内启动多个上游"""
+
+    def __init__(self, behavior: StubBehavior, name: str = "stub", port: int = 0):
+        import uvicorn
+
+        self.app = create_stub_app(behavior, name)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/v1"
+
+    @property
+    def stats(self) -> dict:
+        return self.app.state.stats
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI 兼容桩服务")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--name", default="stub")
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--token-ms", type=float, default=5.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢请求比例（0~1）")
+    parser.add_argument("--slow-ms", type=float, default=3000.0, help="慢请求的首 token 延迟")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="直接返回错误的比例（0~1）")
+    parser.add_argument("--fail-status", type=int, default=503)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    behavior = StubBehavior(
+        first_token_ms=args.first_token_ms,
+        token_ms=args.token_ms,
+        slow_rate=args.slow_rate,
+        slow_ms=args.slow_ms,
+        fail_rate=args.fail_rate,
+        fail_status=args.fail_status,
+    )
+    uvicorn.run(create_stub_app(behavior, args.name), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()